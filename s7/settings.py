@@ -40,8 +40,13 @@ SECURE_HSTS_INCLUDE_SUBDOMAINS = False
 SECURE_HSTS_PRELOAD = False
 
 # Application definition
+# daphne's app only swaps in its ASGI runserver, and importing it pulls in
+# Twisted (~0.4s of django.setup()). Deployments whose workers never use
+# `runserver` can set DAPHNE_RUNSERVER=False to start without it.
+DAPHNE_RUNSERVER = config('DAPHNE_RUNSERVER', default=True, cast=bool)
+
 INSTALLED_APPS = [
-    'daphne',          
+    *(['daphne'] if DAPHNE_RUNSERVER else []),
     'channels',
     'django.contrib.admin',
     'django.contrib.auth',
@@ -74,20 +79,51 @@ if REDIS_URL:
         }
     }
 
-    # Channel layers — use InMemoryChannelLayer on production too
-    # Upstash free tier times out with channels_redis persistent connections
-    CHANNEL_LAYERS = {
+else:
+    CACHES = {
         'default': {
-            'BACKEND': 'channels.layers.InMemoryChannelLayer',
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
         }
     }
 
-else:
-    CACHES = {
+# Channel layers — CHANNEL_LAYER picks how group_send reaches other workers:
+#   memory — InMemoryChannelLayer, one process only (default)
+#   local  — s7app.channel_layers: workers on one host share groups through a
+#            Unix-socket broker (`manage.py run_channel_broker`, or the first
+#            worker starts one). No extra services.
+#   redis  — channels_redis, for workers on several hosts. Upstash free tier
+#            times out with its persistent connections, so it is opt-in.
+CHANNEL_LAYER = config('CHANNEL_LAYER', default='memory')
+CHANNEL_REDIS_URL = config('CHANNEL_REDIS_URL', default=REDIS_URL)
+
+if CHANNEL_LAYER == 'redis' and not CHANNEL_REDIS_URL:
+    print("⚠️ CHANNEL_LAYER=redis but no CHANNEL_REDIS_URL/REDIS_URL — using 'local'")
+    CHANNEL_LAYER = 'local'
+if CHANNEL_LAYER == 'redis':
+    import importlib.util
+    if importlib.util.find_spec('channels_redis') is None:
+        print("⚠️ CHANNEL_LAYER=redis but channels_redis is not installed — using 'local'")
+        CHANNEL_LAYER = 'local'
+
+if CHANNEL_LAYER == 'redis':
+    CHANNEL_LAYERS = {
         'default': {
-            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'BACKEND': 'channels_redis.core.RedisChannelLayer',
+            'CONFIG': {
+                'hosts': [CHANNEL_REDIS_URL],
+            },
         }
     }
+elif CHANNEL_LAYER == 'local':
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 's7app.channel_layers.LocalBrokerChannelLayer',
+            'CONFIG': {
+                'socket_path': config('CHANNEL_SOCKET_PATH', default='/tmp/s7-channels.sock'),
+            },
+        }
+    }
+else:
     CHANNEL_LAYERS = {
         'default': {
             'BACKEND': 'channels.layers.InMemoryChannelLayer',
@@ -138,6 +174,28 @@ DATABASES = {
     )
 }
 
+# Write-behind for GameRoom.state (s7app/write_behind.py): a background thread
+# bulk-saves dirty rooms at most this many seconds after they change.
+# 0 saves inline in the request instead.
+# The queue lives in each worker and is only drained on a clean exit: a
+# killed worker loses up to this many seconds of DB saves (the cache still
+# has them for 3 hours). Lower it, or use 0, if that matters more than
+# request latency.
+STATE_FLUSH_INTERVAL = config('STATE_FLUSH_INTERVAL', default=1.0, cast=float)
+STATE_FLUSH_BATCH = config('STATE_FLUSH_BATCH', default=100, cast=int)
+
+# Precomputed round outcomes over the card catalog (s7app/matchups.py); one
+# .npy per catalog fingerprint, memory-mapped by every worker.
+MATCHUP_TABLE_DIR = config('MATCHUP_TABLE_DIR', default=str(BASE_DIR / 'matchup_tables'))
+
+# Load the single-player AI model when the app starts instead of on the first
+# computer turn (s7app/ai_model.py reloads it whenever the file changes).
+AI_MODEL_PRELOAD = config('AI_MODEL_PRELOAD', default=False, cast=bool)
+
+# Time the single-player computer may spend searching for its card per round
+# (s7app/opponent.py); 0 turns the search off and keeps the greedy picks.
+AI_SEARCH_BUDGET_MS = config('AI_SEARCH_BUDGET_MS', default=50, cast=int)
+
 
 
 # Password validation
@@ -19,4 +19,10 @@ from .models import UserPrizeCard
 class UserPrizeCardAdmin(admin.ModelAdmin):
     list_display  = ['user', 'player_card', 'deck', 'assigned_at']
     list_filter   = ['user']
-    search_fields = ['user__username', 'player_card__name']
\ No newline at end of file
+    search_fields = ['user__username', 'player_card__name']
+from .models import PlayerStats
+
+@admin.register(PlayerStats)
+class PlayerStatsAdmin(admin.ModelAdmin):
+    list_display  = ['user', 'wins', 'losses', 'draws', 'matches', 'updated_at']
+    search_fields = ['user__username']
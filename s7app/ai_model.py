@@ -1,4 +1,8 @@
+import fcntl
+import json
 import os
+import threading
+import time
 
 # Guard heavy ML imports so module import never raises
 HAS_ML_LIBS = True
@@ -19,70 +23,207 @@ except Exception:
     roc_auc_score = None
     joblib = None
 
+# Only best_assignment uses scipy; without it planning falls back to greedy.
+HAS_SCIPY = True
+try:
+    from scipy.optimize import linear_sum_assignment
+except Exception:
+    HAS_SCIPY = False
+    linear_sum_assignment = None
+
+from .round_log import HISTORY_FILE, complete_end, line_anchor
+
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-HISTORY_FILE = os.path.join(BASE_DIR, 'game_history.csv')
 MODEL_FILE = os.path.join(BASE_DIR, 'card_model.joblib')
 
-__all__ = ["build_dataset", "train_and_save", "load_model", "predict_best_card"]
+__all__ = ["build_dataset", "iter_dataset", "train_and_save", "train_incremental", "load_model", "get_model", "is_model_ready", "predict_best_card",
+           "score_matrix", "score_rounds", "best_assignment"]
+
+FEATURES = ['p_batting', 'p_bowling', 'p_runs', 'c_batting', 'c_bowling', 'c_runs', 'innings', 'round_number', 'wickets']
 
 def _ensure_ml_available():
     if not HAS_ML_LIBS:
         raise RuntimeError("ML libraries not available: install pandas, numpy, scikit-learn, joblib")
 
-def build_dataset():
+HISTORY_REQUIRED = ('player_card_id', 'computer_card_id', 'outcome', 'batting_team')
+# Optional context columns and the value used when a row (or the whole file) lacks them.
+HISTORY_DEFAULTS = {'innings': 1, 'round_number': 0, 'wickets': 0}
+DATASET_CHUNK = 200_000
+
+
+def _card_frame():
+    """Card stats indexed by card id, from the card catalog."""
+    from .card_catalog import get_catalog
+
+    cards = sorted(get_catalog().values(), key=lambda c: c.id)
+    return pd.DataFrame(
+        {
+            'batting': np.array([c.batting for c in cards], dtype=np.int16),
+            'bowling': np.array([c.bowling for c in cards], dtype=np.int16),
+            'runs': np.array([c.runs for c in cards], dtype=np.int16),
+        },
+        index=pd.Index([c.id for c in cards], dtype=np.int64, name='card_id'),
+    )
+
+
+def _history_features(chunk, cards):
+    """One chunk of history rows → feature columns + label, rows with unknown cards dropped."""
+    pid = pd.to_numeric(chunk['player_card_id'], errors='coerce')
+    cid = pd.to_numeric(chunk['computer_card_id'], errors='coerce')
+    keep = pid.notna() & cid.notna()
+    chunk = chunk[keep]
+    ids = pd.DataFrame({'pid': pid[keep].astype(np.int64), 'cid': cid[keep].astype(np.int64)},
+                       index=chunk.index)
+
+    p = cards.add_prefix('p_')
+    c = cards.add_prefix('c_')
+    out = ids.merge(p, left_on='pid', right_index=True, how='inner')
+    out = out.merge(c, left_on='cid', right_index=True, how='inner')
+    chunk = chunk.loc[out.index]
+
+    for col, default in HISTORY_DEFAULTS.items():
+        if col in chunk.columns:
+            out[col] = pd.to_numeric(chunk[col], errors='coerce').fillna(default).astype(np.int16)
+        else:
+            out[col] = np.int16(default)
+
+    # The computer's card did its job if it won while batting, or didn't lose while bowling.
+    won = chunk['outcome'].astype(str).str.lower() == 'win'
+    batting_team = chunk['batting_team'].astype(str)
+    out['label'] = np.where(won, batting_team == 'computer', batting_team == 'player').astype(np.int8)
+    return out[FEATURES + ['label']]
+
+
+class _ByteRange:
+    """Read-only view of bytes [start, end) of an open file, for pd.read_csv."""
+
+    def __init__(self, f, start, end):
+        f.seek(start)
+        self._f = f
+        self._left = end - start
+
+    def read(self, size=-1):
+        if size is None or size < 0 or size > self._left:
+            size = self._left
+        data = self._f.read(size)
+        self._left -= len(data)
+        return data
+
+
+def iter_dataset(path=None, chunksize=DATASET_CHUNK, start=0, end=None):
     """
-    Read HISTORY_FILE and build a pandas DataFrame of pairwise features.
-    Requires ML libs and access to PlayerCard model.
+    Yield feature frames for HISTORY_FILE, `chunksize` CSV rows at a time.
+    `start`/`end` limit it to a byte range of whole lines (start=0 includes the header).
     """
     _ensure_ml_available()
-    if not os.path.exists(HISTORY_FILE):
-        raise FileNotFoundError(HISTORY_FILE)
+    path = path or HISTORY_FILE
+    if not os.path.exists(path):
+        raise FileNotFoundError(path)
 
-    # import Django model here to avoid circular import at module load
-    from .models import PlayerCard
+    header = pd.read_csv(path, nrows=0).columns
+    missing = set(HISTORY_REQUIRED) - set(header)
+    if missing:
+        raise ValueError(f"History CSV missing required columns: {missing}")
+    usecols = [c for c in header if c in HISTORY_REQUIRED or c in HISTORY_DEFAULTS]
 
-    df = pd.read_csv(HISTORY_FILE)
-    required = {'player_card_id', 'computer_card_id', 'outcome', 'batting_team'}
-    if not required.issubset(set(df.columns)):
-        raise ValueError(f"History CSV missing required columns: {required - set(df.columns)}")
+    cards = _card_frame()
+    with open(path, 'rb') as f:
+        end = os.fstat(f.fileno()).st_size if end is None else end
+        if end <= start:
+            return
+        source = _ByteRange(f, start, end)
+        if start == 0:
+            reader = pd.read_csv(source, usecols=usecols, chunksize=chunksize)
+        else:
+            reader = pd.read_csv(source, header=None, names=list(header), usecols=usecols, chunksize=chunksize)
+        for chunk in reader:
+            frame = _history_features(chunk, cards)
+            if not frame.empty:
+                yield frame
 
-    cards_qs = PlayerCard.objects.all()
-    cards = {c.id: {'batting': c.batting, 'bowling': c.bowling, 'runs': c.runs} for c in cards_qs}
 
-    rows = []
-    for _, r in df.iterrows():
-        try:
-            pid = int(r['player_card_id']); cid = int(r['computer_card_id'])
-        except Exception:
-            continue
-        p = cards.get(pid); c = cards.get(cid)
-        if p is None or c is None:
-            continue
-
-        batting_team = str(r.get('batting_team'))
-        outcome = str(r.get('outcome')).lower()
-        if outcome == 'win':
-            comp_success = 1 if batting_team == 'computer' else 0
-        else:
-            comp_success = 1 if batting_team == 'player' else 0
-
-        rows.append({
-            'p_batting': p['batting'], 'p_bowling': p['bowling'], 'p_runs': p['runs'],
-            'c_batting': c['batting'], 'c_bowling': c['bowling'], 'c_runs': c['runs'],
-            'innings': int(r.get('innings', 1)) if 'innings' in r else 1,
-            'round_number': int(r.get('round_number', 0)) if 'round_number' in r else 0,
-            'wickets': int(r.get('wickets', 0)) if 'wickets' in r else 0,
-            'label': comp_success
-        })
-
-    dataset = pd.DataFrame(rows)
-    if dataset.empty:
+def build_dataset(path=None, chunksize=DATASET_CHUNK):
+    """
+    Read HISTORY_FILE and build a pandas DataFrame of pairwise features.
+    The CSV is streamed in chunks and only the compact feature columns are kept.
+    """
+    frames = list(iter_dataset(path, chunksize))
+    if not frames:
         raise ValueError("No training data after processing history.")
-    return dataset
+    return pd.concat(frames, ignore_index=True)
+
+# ── checkpoints ─────────────────────────────────────────────────────────────
+# Next to card_model.joblib, card_model.checkpoint.json records how far into
+# HISTORY_FILE the published model has been trained:
+#   {"offset": byte offset of the first untrained line, "anchor": sha1 of the
+#    line ending at offset, "rows": rows trained on, "trees": n_estimators}
+# The anchor catches a history file that was rewritten (round_log.ensure_header)
+# or truncated: the next update then retrains from scratch.
+
+INCREMENTAL_TREES = 20     # trees added per update
+MAX_TREES = 400            # oldest trees are dropped past this
+MIN_UPDATE_ROWS = 200      # fewer new rows than this wait for the next update
+
+
+def _checkpoint_file():
+    return os.path.splitext(MODEL_FILE)[0] + '.checkpoint.json'
+
+
+def read_checkpoint():
+    try:
+        with open(_checkpoint_file(), encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_json_atomic(path, data):
+    tmp = path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(data, f)
+    os.replace(tmp, path)
+
+
+def _publish(model, offset, anchor, rows):
+    """Swap in the model, then its checkpoint. A crash in between only means some rows get trained twice."""
+    # Write aside and swap in, so a worker reloading on the new mtime never reads half a file.
+    tmp_file = MODEL_FILE + '.tmp'
+    joblib.dump(model, tmp_file)
+    os.replace(tmp_file, MODEL_FILE)
+    _write_json_atomic(_checkpoint_file(), {
+        'offset': offset, 'anchor': anchor, 'rows': int(rows),
+        'trees': int(getattr(model, 'n_estimators', 0)),
+    })
+    print("Saved model to", MODEL_FILE)
+
+
+class _TrainingLock:
+    """One trainer at a time across processes (flock on a file next to the model)."""
+
+    def __enter__(self):
+        self._f = open(MODEL_FILE + '.lock', 'w')
+        fcntl.flock(self._f, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        fcntl.flock(self._f, fcntl.LOCK_UN)
+        self._f.close()
+
 
 def train_and_save(test_size=0.2, random_state=42):
     _ensure_ml_available()
-    df = build_dataset()
+    with _TrainingLock():
+        return _train_full(test_size, random_state)
+
+
+def _train_full(test_size, random_state):
+    with open(HISTORY_FILE, 'rb') as f:
+        offset = complete_end(f)
+        anchor = line_anchor(f, offset)
+    frames = list(iter_dataset(HISTORY_FILE, end=offset))
+    if not frames:
+        raise ValueError("No training data after processing history.")
+    df = pd.concat(frames, ignore_index=True)
     X = df.drop(columns=['label'])
     y = df['label']
     strat = y if len(y.unique()) > 1 else None
@@ -97,52 +238,251 @@ def train_and_save(test_size=0.2, random_state=42):
             print("AUC:", roc_auc_score(y_test, probs))
         except Exception:
             pass
-    joblib.dump(model, MODEL_FILE)
-    print("Saved model to", MODEL_FILE)
+    _publish(model, offset, anchor, len(df))
     return MODEL_FILE
 
+
+def train_incremental(min_rows=MIN_UPDATE_ROWS, trees=INCREMENTAL_TREES, max_trees=MAX_TREES):
+    """
+    Train on the history rows appended since the last checkpoint by growing
+    `trees` more trees on them (RandomForest warm_start), dropping the oldest
+    past `max_trees`. Falls back to train_and_save() when there is no usable
+    model or checkpoint. Returns a short status string.
+    """
+    _ensure_ml_available()
+    with _TrainingLock():
+        checkpoint = read_checkpoint()
+        if checkpoint is None or not os.path.exists(MODEL_FILE):
+            _train_full(0.2, 42)
+            return 'full retrain (no checkpoint)'
+
+        with open(HISTORY_FILE, 'rb') as f:
+            start = checkpoint.get('offset', 0)
+            end = complete_end(f)
+            if end < start or line_anchor(f, start) != checkpoint.get('anchor'):
+                rewritten = True
+            else:
+                rewritten = False
+                anchor = line_anchor(f, end)
+        if rewritten:
+            _train_full(0.2, 42)
+            return 'full retrain (history file was rewritten)'
+
+        frames = list(iter_dataset(HISTORY_FILE, start=start, end=end))
+        df = pd.concat(frames, ignore_index=True) if frames else None
+        if df is None or len(df) < min_rows:
+            return f'waiting: {0 if df is None else len(df)} new rows (< {min_rows})'
+        if df['label'].nunique() < 2:
+            # New trees must see both classes or their probabilities won't line up.
+            return f'waiting: {len(df)} new rows all share one label'
+
+        model = joblib.load(MODEL_FILE)   # a private copy; the served one stays untouched
+        model.set_params(warm_start=True, n_jobs=-1, n_estimators=model.n_estimators + trees)
+        _start = time.time()
+        model.fit(df[FEATURES], df['label'])
+        if len(model.estimators_) > max_trees:
+            model.estimators_ = model.estimators_[-max_trees:]
+            model.n_estimators = max_trees
+        _publish(model, end, anchor, checkpoint.get('rows', 0) + len(df))
+        return (f'+{trees} trees on {len(df)} new rows in {time.time() - _start:.1f}s '
+                f'({model.n_estimators} trees)')
+
+# ── model registry ──────────────────────────────────────────────────────────
+# One model per process. It is loaded on first use (or by warm_model() at
+# startup) and reloaded only when MODEL_FILE's mtime changes, so a prediction
+# costs an os.stat instead of a joblib.load.
+
+_model_lock = threading.Lock()
+_model = None
+_model_mtime = None
+
+
+def _model_file_mtime():
+    try:
+        return os.stat(MODEL_FILE).st_mtime_ns
+    except OSError:
+        return None
+
+
+def get_model():
+    """The current model, or None if ML libs or the model file are missing."""
+    global _model, _model_mtime
+    if not HAS_ML_LIBS:
+        return None
+    mtime = _model_file_mtime()
+    if mtime == _model_mtime:
+        return _model
+
+    with _model_lock:
+        if mtime == _model_mtime:
+            return _model
+        if mtime is None:
+            _model, _model_mtime = None, None
+            return None
+        _start = time.time()
+        try:
+            model = joblib.load(MODEL_FILE)
+        except Exception as e:
+            print(f"❌ AI MODEL LOAD FAILED: {e}")
+            return _model   # keep serving the previous one
+        # Predictions are a handful of rows: joblib's thread pool costs more than it saves.
+        if hasattr(model, 'n_jobs'):
+            model.n_jobs = 1
+        _model, _model_mtime = model, mtime
+        print(f"⏱️ AI MODEL loaded in {(time.time() - _start)*1000:.1f}ms")
+        return _model
+
+
+def is_model_ready():
+    return get_model() is not None
+
+
+def warm_model():
+    """Load the model on a background thread (called at startup when AI_MODEL_PRELOAD is on)."""
+    if HAS_ML_LIBS and _model_file_mtime() is not None:
+        threading.Thread(target=get_model, name='s7-ai-model-warm', daemon=True).start()
+
+
 def load_model():
     """Return loaded model or None (safe to call even if ML libs not present)."""
-    if not HAS_ML_LIBS:
+    return get_model()
+
+# ── batched scoring ─────────────────────────────────────────────────────────
+# Card stats live in one int array built from the card catalog (rebuilt when
+# the catalog reloads); features for every (player card, candidate[, round])
+# are broadcast from it and scored with a single predict_proba.
+
+_stats_lock = threading.Lock()
+_stats = None      # (catalog, {card_id: row}, int16 array of [batting, bowling, runs])
+
+
+def _card_stats():
+    global _stats
+    from .card_catalog import get_catalog
+
+    catalog = get_catalog()
+    stats = _stats
+    if stats is not None and stats[0] is catalog:
+        return stats
+    with _stats_lock:
+        if _stats is None or _stats[0] is not catalog:
+            cards = sorted(catalog.values(), key=lambda c: c.id)
+            _stats = (
+                catalog,
+                {c.id: row for row, c in enumerate(cards)},
+                np.array([[c.batting, c.bowling, c.runs] for c in cards], dtype=np.int16).reshape(-1, 3),
+            )
+        return _stats
+
+
+def _rows(index, card_ids):
+    return np.array([index[int(i)] for i in card_ids], dtype=np.intp)
+
+
+def _predict(model, X):
+    X = pd.DataFrame(X, columns=FEATURES)   # one frame per call, so the fitted feature names match
+    return model.predict_proba(X)[:, 1] if hasattr(model, "predict_proba") else model.predict(X)
+
+
+def score_rounds(player_card_ids, candidate_card_ids, round_numbers, innings=1, wickets=0, model=None):
+    """
+    Success probability of every candidate against every player card in every
+    round, in one model call: an array shaped (rounds, players, candidates).
+    Returns None if no model is available. Unknown card ids raise KeyError.
+    """
+    model = model or get_model()
+    if model is None:
         return None
-    if os.path.exists(MODEL_FILE):
-        return joblib.load(MODEL_FILE)
-    return None
+    _, index, stats = _card_stats()
+    p = stats[_rows(index, player_card_ids)]          # (P, 3)
+    c = stats[_rows(index, candidate_card_ids)]       # (C, 3)
+    rounds = np.asarray(round_numbers, dtype=np.int16).reshape(-1)
+    R, P, C = len(rounds), len(p), len(c)
+
+    X = np.empty((R, P, C, len(FEATURES)), dtype=np.int16)
+    X[..., 0:3] = p[None, :, None, :]
+    X[..., 3:6] = c[None, None, :, :]
+    X[..., 6] = innings
+    X[..., 7] = rounds[:, None, None]
+    X[..., 8] = wickets
+    return _predict(model, X.reshape(-1, len(FEATURES))).reshape(R, P, C)
+
+
+def score_matrix(player_card_ids, candidate_card_ids, innings=1, round_number=0, wickets=0, model=None):
+    """(players, candidates) success probabilities for one round, or None without a model."""
+    scores = score_rounds(player_card_ids, candidate_card_ids, [round_number], innings, wickets, model)
+    return None if scores is None else scores[0]
+
+
+def _greedy_assignment(value):
+    """(row indices, column indices) pairing rows to columns best-value first, rows in order."""
+    pairs = {}
+    used_cols = set()
+    for flat in np.argsort(-value, axis=None, kind='stable'):
+        r, c = divmod(int(flat), value.shape[1])
+        if r in pairs or c in used_cols:
+            continue
+        pairs[r] = c
+        used_cols.add(c)
+        if len(pairs) == min(value.shape):
+            break
+    rows = sorted(pairs)
+    return np.array(rows, dtype=np.intp), np.array([pairs[r] for r in rows], dtype=np.intp)
+
+
+def best_assignment(player_card_id, candidate_card_ids, player_hand_ids=(), innings=1,
+                    round_number=1, wickets=0, last_round=7):
+    """
+    Plan the computer's cards over the rest of the innings and return
+    (card for this round, its probability, {round: card_id}).
+
+    This round is scored against the card the player just picked; later rounds
+    against the average over the player's remaining hand. One batched model
+    call covers all of it, then the Hungarian method picks the assignment of
+    candidates to rounds with the highest total probability — so a card that
+    is only slightly better now is kept back if it is worth much more later.
+    Without scipy the assignment is greedy (best remaining pair first).
+    Returns (None, None, {}) if no model is available.
+    """
+    model = get_model()
+    candidates = [int(i) for i in candidate_card_ids]
+    if model is None or not candidates:
+        return None, None, {}
+
+    rounds = list(range(round_number, last_round + 1))
+    hand = [int(i) for i in player_hand_ids if int(i) != int(player_card_id)]
+    players = [int(player_card_id)] + hand
+    scores = score_rounds(players, candidates, rounds, innings, wickets, model)   # (R, P, C)
+
+    value = np.empty((len(rounds), len(candidates)))
+    value[0] = scores[0, 0]
+    if len(rounds) > 1:
+        value[1:] = scores[1:, 1:].mean(axis=1) if hand else scores[1:, 0]
+
+    if HAS_SCIPY:
+        round_idx, cand_idx = linear_sum_assignment(value, maximize=True)
+    else:
+        round_idx, cand_idx = _greedy_assignment(value)
+    plan = {rounds[r]: candidates[c] for r, c in zip(round_idx, cand_idx)}
+    now = int(cand_idx[list(round_idx).index(0)]) if 0 in round_idx else int(np.argmax(value[0]))
+    return candidates[now], float(value[0, now]), plan
+
 
 def predict_best_card(player_card_id, candidate_card_ids, innings=1, round_number=0, wickets=0):
     """
     Return (best_card_id, probability) or (None, None) if no model available.
-    Imports PlayerCard inside function to avoid circular imports.
     """
     if not HAS_ML_LIBS:
         return None, None
-    model = load_model()
-    if model is None:
+    _, index, _ = _card_stats()
+    ids = [int(i) for i in candidate_card_ids if int(i) in index]
+    if not ids:
         return None, None
-
-    from .models import PlayerCard
-
-    player = PlayerCard.objects.get(id=player_card_id)
-    candidates = PlayerCard.objects.filter(id__in=candidate_card_ids)
-    rows = []
-    ids = []
-    for c in candidates:
-        rows.append({
-            'p_batting': player.batting,
-            'p_bowling': player.bowling,
-            'p_runs': player.runs,
-            'c_batting': c.batting,
-            'c_bowling': c.bowling,
-            'c_runs': c.runs,
-            'innings': innings,
-            'round_number': round_number,
-            'wickets': wickets
-        })
-        ids.append(c.id)
-    X = pd.DataFrame(rows)
-    probs = model.predict_proba(X)[:,1] if hasattr(model, "predict_proba") else model.predict(X)
-    best_idx = int(np.argmax(probs))
-    return ids[best_idx], float(probs[best_idx])
+    probs = score_matrix([player_card_id], ids, innings, round_number, wickets)
+    if probs is None:
+        return None, None
+    best_idx = int(np.argmax(probs[0]))
+    return ids[best_idx], float(probs[0, best_idx])
 
 if __name__ == "__main__":
     import sys
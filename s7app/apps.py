@@ -4,3 +4,11 @@ from django.apps import AppConfig
 class S7AppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 's7app'
+
+    def ready(self):
+        from . import signals  # noqa: F401  (connects receivers)
+
+        from django.conf import settings
+        if getattr(settings, 'AI_MODEL_PRELOAD', False):
+            from .ai_model import warm_model
+            warm_model()
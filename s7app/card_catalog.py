@@ -0,0 +1,145 @@
+"""
+In-process PlayerCard catalog.
+
+Card stats change only when an admin edits a PlayerCard or Team, but the game
+engine looks cards up on every round and every timeline render. The catalog
+loads all cards once per worker into immutable records and keeps them until
+the shared version key in the Django cache moves on.
+
+    card = get_card(card_id)          # raises PlayerCard.DoesNotExist
+    cards = get_catalog()             # {id: CardRecord}
+
+`invalidate()` bumps the version key; it is wired to PlayerCard/Team saves
+and deletes in signals.py so every worker reloads on its next lookup. When
+the key is missing (first start, eviction, flush) it is re-seeded with a
+time_ns() token rather than a small counter, so it can never come back to a
+version some worker already holds.
+
+    deck_cards(deck_id)               # [CardRecord] for a UserDeck, by card id
+    deck_snapshot(deck_id)            # same, as plain lists for MatchState
+"""
+from collections import namedtuple
+import logging
+import threading
+import time
+
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+CATALOG_VERSION_KEY = 'card_catalog:version'
+
+_CardRecordBase = namedtuple('_CardRecordBase', [
+    'id', 'name', 'batting', 'bowling', 'runs', 'ability',
+    'is_spinner', 'weightage', 'image_url', 'team_id',
+])
+
+
+class CardRecord(_CardRecordBase):
+    """Immutable snapshot of one PlayerCard row."""
+    __slots__ = ()
+
+    @property
+    def ability_display(self):
+        from .models import PlayerCard
+        return dict(PlayerCard.ABILITY_CHOICES).get(self.ability, self.ability)
+
+
+_lock = threading.Lock()
+_cards = None
+_loaded_version = None
+
+
+def _current_version():
+    try:
+        version = cache.get(CATALOG_VERSION_KEY)
+        if version is None:
+            # First worker to get here seeds the key; the rest read it back.
+            cache.add(CATALOG_VERSION_KEY, time.time_ns(), None)
+            version = cache.get(CATALOG_VERSION_KEY)
+        return version
+    except Exception as e:
+        logger.warning(f'Card catalog version lookup failed: {e}')
+        return None
+
+
+def _load():
+    from .models import PlayerCard
+
+    cards = {}
+    for c in PlayerCard.objects.all():
+        cards[c.id] = CardRecord(
+            id=c.id,
+            name=c.name,
+            batting=c.batting,
+            bowling=c.bowling,
+            runs=c.runs,
+            ability=c.ability,
+            is_spinner=c.is_spinner,
+            weightage=c.weightage,
+            image_url=c.image.url if c.image else None,
+            team_id=c.team_id,
+        )
+    return cards
+
+
+def get_catalog():
+    """Return {card_id: CardRecord}, reloading only when the version key moved."""
+    global _cards, _loaded_version
+
+    version = _current_version()
+    # Cache unreachable: keep serving what we already have.
+    if _cards is not None and (version is None or version == _loaded_version):
+        return _cards
+
+    with _lock:
+        if _cards is None or version != _loaded_version:
+            _cards = _load()
+            _loaded_version = version
+        return _cards
+
+
+def get_card(card_id, catalog=None):
+    """
+    Look a card up by id. Raises PlayerCard.DoesNotExist like the ORM would.
+    Pass a `catalog` already loaded to look it up without touching the cache.
+    """
+    try:
+        return (catalog if catalog is not None else get_catalog())[int(card_id)]
+    except (KeyError, TypeError, ValueError):
+        from .models import PlayerCard
+        raise PlayerCard.DoesNotExist(f'PlayerCard {card_id} not in catalog')
+
+
+def invalidate():
+    """Tell every worker to reload the catalog on its next lookup."""
+    global _cards
+    try:
+        cache.incr(CATALOG_VERSION_KEY)
+    except ValueError:
+        # Key evicted: a fresh token, never a version any worker loaded.
+        try:
+            cache.set(CATALOG_VERSION_KEY, time.time_ns(), None)
+        except Exception as e:
+            logger.warning(f'Card catalog invalidate failed: {e}')
+    except Exception as e:
+        logger.warning(f'Card catalog invalidate failed: {e}')
+    # Drop our own copy regardless, in case the cache is unreachable.
+    with _lock:
+        _cards = None
+
+
+def deck_cards(deck_id):
+    """The CardRecords in a UserDeck, ordered by card id. One query."""
+    from .models import DeckCard
+
+    if deck_id is None:
+        return []
+    catalog = get_catalog()
+    ids = DeckCard.objects.filter(deck_id=deck_id).values_list('player_card_id', flat=True)
+    return [catalog[i] for i in sorted(ids) if i in catalog]
+
+
+def deck_snapshot(deck_id):
+    """deck_cards() as msgpack/JSON-friendly lists, for freezing into match state."""
+    return [list(card) for card in deck_cards(deck_id)]
@@ -0,0 +1,292 @@
+"""
+Channel layer for several ASGI workers on one host, with no extra services.
+
+InMemoryChannelLayer keeps groups inside one process, so a group_send from
+one daphne/gunicorn worker never reaches sockets held by another. This layer
+keeps InMemoryChannelLayer's local queues but routes group membership and
+cross-worker sends through a tiny broker listening on a Unix socket:
+
+  - every worker names its channels `specific.<worker id>!<random>`, so the
+    broker knows which worker owns a channel;
+  - group_add/group_discard are mirrored to the broker;
+  - group_send goes to the broker, which forwards one frame per worker that
+    has members in the group; each worker fans it out to its local queues.
+
+Frames are a 4-byte length followed by msgpack.
+
+The broker runs standalone (`python manage.py run_channel_broker`) or, if
+nothing is listening, the first worker to need it starts one on a background
+thread (an flock on `<socket>.lock` picks exactly one host). If the broker
+cannot be reached at all, group_send still reaches this worker's own sockets,
+which is how InMemoryChannelLayer behaves.
+
+Selected with CHANNEL_LAYER=local (see settings.py).
+"""
+import asyncio
+import fcntl
+import logging
+import os
+import struct
+import threading
+import uuid
+
+import msgpack
+from channels.exceptions import ChannelFull
+from channels.layers import InMemoryChannelLayer
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SOCKET_PATH = '/tmp/s7-channels.sock'
+
+_HEADER = struct.Struct('>I')
+
+
+def _frame(msg):
+    data = msgpack.packb(msg, use_bin_type=True)
+    return _HEADER.pack(len(data)) + data
+
+
+async def _read_frame(reader):
+    (size,) = _HEADER.unpack(await reader.readexactly(_HEADER.size))
+    return msgpack.unpackb(await reader.readexactly(size), raw=False)
+
+
+def channel_worker(channel):
+    """Worker id embedded in a channel name made by LocalBrokerChannelLayer."""
+    return channel.split('!', 1)[0].rsplit('.', 1)[-1]
+
+
+# ─── broker ──────────────────────────────────────────────────────────────────
+
+class Broker:
+    """Group membership for all workers, and routing of frames between them."""
+
+    def __init__(self, socket_path=DEFAULT_SOCKET_PATH):
+        self.socket_path = socket_path
+        self.workers = {}   # worker id -> [StreamWriter], newest last
+        self.groups = {}    # group -> {channel}
+
+    async def start(self):
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)   # stale socket from a dead broker
+        server = await asyncio.start_unix_server(self._handle, path=self.socket_path)
+        print(f"📡 Channel broker listening on {self.socket_path} (PID={os.getpid()})")
+        return server
+
+    async def _handle(self, reader, writer):
+        worker = None
+        try:
+            while True:
+                msg = await _read_frame(reader)
+                op = msg['op']
+                if op == 'hello':
+                    worker = msg['worker']
+                    self.workers.setdefault(worker, []).append(writer)
+                elif op == 'group_add':
+                    self.groups.setdefault(msg['group'], set()).add(msg['channel'])
+                elif op == 'group_discard':
+                    members = self.groups.get(msg['group'])
+                    if members:
+                        members.discard(msg['channel'])
+                        if not members:
+                            self.groups.pop(msg['group'], None)
+                elif op == 'send':
+                    await self._deliver([msg['channel']], msg['message'])
+                elif op == 'group_send':
+                    await self._deliver(list(self.groups.get(msg['group'], ())), msg['message'])
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            if worker is not None:
+                self._drop_writer(worker, writer)
+            writer.close()
+
+    def _drop_writer(self, worker, writer):
+        writers = self.workers.get(worker, [])
+        if writer in writers:
+            writers.remove(writer)
+        if writers:
+            return
+        # Worker gone — forget its channels.
+        self.workers.pop(worker, None)
+        for group, members in list(self.groups.items()):
+            members.difference_update({c for c in members if channel_worker(c) == worker})
+            if not members:
+                self.groups.pop(group, None)
+
+    async def _deliver(self, channels, message):
+        by_worker = {}
+        for channel in channels:
+            by_worker.setdefault(channel_worker(channel), []).append(channel)
+        for worker, worker_channels in by_worker.items():
+            writers = self.workers.get(worker)
+            if not writers:
+                continue
+            writer = writers[-1]
+            try:
+                writer.write(_frame({'channels': worker_channels, 'message': message}))
+                await writer.drain()
+            except ConnectionError:
+                self._drop_writer(worker, writer)
+
+
+def _acquire_host_lock(socket_path):
+    """flock on `<socket>.lock`; returns the open file while held, else None."""
+    lock_file = open(socket_path + '.lock', 'w')
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        lock_file.close()
+        return None
+    return lock_file
+
+
+def run_broker(socket_path=DEFAULT_SOCKET_PATH):
+    """Run a broker in the foreground until interrupted (management command)."""
+    lock = _acquire_host_lock(socket_path)
+    if lock is None:
+        raise RuntimeError(f'A channel broker already owns {socket_path}')
+
+    async def main():
+        server = await Broker(socket_path).start()
+        async with server:
+            await server.serve_forever()
+
+    try:
+        asyncio.run(main())
+    finally:
+        lock.close()
+
+
+_hosted = None   # (lock file, thread) when this process hosts the broker
+
+
+def _host_in_background(socket_path):
+    """Start a broker on a daemon thread unless some process already hosts one."""
+    global _hosted
+    if _hosted is not None:
+        return True
+    lock = _acquire_host_lock(socket_path)
+    if lock is None:
+        return False   # another process holds it; it is (re)starting the broker
+
+    started = threading.Event()
+
+    def serve():
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        loop.run_until_complete(Broker(socket_path).start())
+        started.set()
+        loop.run_forever()
+
+    thread = threading.Thread(target=serve, name='s7-channel-broker', daemon=True)
+    thread.start()
+    started.wait(5)
+    _hosted = (lock, thread)
+    return True
+
+
+# ─── layer ───────────────────────────────────────────────────────────────────
+
+class LocalBrokerChannelLayer(InMemoryChannelLayer):
+    """InMemoryChannelLayer whose groups span every worker on the host."""
+
+    def __init__(self, socket_path=DEFAULT_SOCKET_PATH, host_broker=True, **kwargs):
+        super().__init__(**kwargs)
+        self.socket_path = socket_path
+        self.host_broker = host_broker
+        self.worker_id = f'w{os.getpid()}x{uuid.uuid4().hex[:8]}'
+        # One broker connection per event loop (async_to_sync may use its own).
+        self._links = {}
+
+    async def new_channel(self, prefix='specific.'):
+        return f'{prefix}{self.worker_id}!{uuid.uuid4().hex[:12]}'
+
+    def _is_local(self, channel):
+        return channel_worker(channel) == self.worker_id
+
+    # ── broker link ──────────────────────────────────────────
+    async def _connect(self):
+        try:
+            return await asyncio.open_unix_connection(self.socket_path)
+        except OSError:
+            if not self.host_broker:
+                raise
+        # Nobody listening: host one ourselves (or wait for whoever holds the lock).
+        _host_in_background(self.socket_path)
+        for _ in range(20):
+            try:
+                return await asyncio.open_unix_connection(self.socket_path)
+            except OSError:
+                await asyncio.sleep(0.05)
+        return await asyncio.open_unix_connection(self.socket_path)
+
+    async def _link(self):
+        loop = asyncio.get_running_loop()
+        self._links = {l: v for l, v in self._links.items() if not l.is_closed()}
+        link = self._links.get(loop)
+        if link is not None and not link[0].is_closing():
+            return link[0]
+
+        reader, writer = await self._connect()
+        writer.write(_frame({'op': 'hello', 'worker': self.worker_id}))
+        # (Re)announce local memberships — the broker may have restarted.
+        for group, channels in self.groups.items():
+            for channel in channels:
+                writer.write(_frame({'op': 'group_add', 'group': group, 'channel': channel}))
+        pump = loop.create_task(self._pump(reader))
+        self._links[loop] = (writer, pump)
+        return writer
+
+    async def _pump(self, reader):
+        """Hand frames from the broker to our local queues."""
+        try:
+            while True:
+                msg = await _read_frame(reader)
+                for channel in msg['channels']:
+                    try:
+                        await InMemoryChannelLayer.send(self, channel, msg['message'])
+                    except ChannelFull:
+                        pass
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+
+    async def _to_broker(self, msg):
+        try:
+            writer = await self._link()
+            writer.write(_frame(msg))
+            await writer.drain()
+            return True
+        except OSError as e:
+            logger.warning(f'Channel broker unreachable at {self.socket_path}: {e}')
+            return False
+
+    # ── channel layer API ────────────────────────────────────
+    async def send(self, channel, message):
+        if self._is_local(channel):
+            return await super().send(channel, message)
+        assert isinstance(message, dict), "message is not a dict"
+        self.require_valid_channel_name(channel)
+        await self._to_broker({'op': 'send', 'channel': channel, 'message': message})
+
+    async def group_add(self, group, channel):
+        await super().group_add(group, channel)
+        await self._to_broker({'op': 'group_add', 'group': group, 'channel': channel})
+
+    async def group_discard(self, group, channel):
+        await super().group_discard(group, channel)
+        await self._to_broker({'op': 'group_discard', 'group': group, 'channel': channel})
+
+    async def group_send(self, group, message):
+        assert isinstance(message, dict), "Message is not a dict"
+        self.require_valid_group_name(group)
+        if not await self._to_broker({'op': 'group_send', 'group': group, 'message': message}):
+            # Broker down — at least reach the sockets this worker holds.
+            await super().group_send(group, message)
+
+    async def flush(self):
+        await super().flush()
+        for writer, pump in self._links.values():
+            pump.cancel()
+            writer.close()
+        self._links = {}
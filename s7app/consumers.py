@@ -3,6 +3,8 @@ from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
 import os
 
+from . import live_updates
+
 
        
 class GameConsumer(AsyncWebsocketConsumer):
@@ -10,9 +12,38 @@ class GameConsumer(AsyncWebsocketConsumer):
         self.room_name = self.scope['url_route']['kwargs']['room_code']
         self.room_group = f"s7app_{self.room_name}"
         self.user = self.scope["user"]
+        self.role = None
         print(f"🔌 WS CONNECT: user={self.user}, room={self.room_name}, PID={os.getpid()}")
         await self.channel_layer.group_add(self.room_group, self.channel_name)
         await self.accept()
+        # Bring a (re)connecting page up to date without waiting for the next push
+        self.role, delta = await self.load_role_and_delta()
+        await self.send_delta(delta)
+
+    @database_sync_to_async
+    def load_role_and_delta(self):
+        from .game_cache import get_game_state
+        from .models import GameRoom
+
+        room = GameRoom.objects.filter(code=self.room_name).only('player1_id', 'player2_id').first()
+        role = None
+        if room is not None and self.user.is_authenticated:
+            if self.user.id == room.player1_id:
+                role = 'player1'
+            elif self.user.id == room.player2_id:
+                role = 'player2'
+        if role is None:
+            return None, None
+        return role, live_updates.state_delta(get_game_state(self.room_name))
+
+    async def send_delta(self, delta, fragments=None):
+        if self.role is None:
+            return  # spectators don't sync
+        payload = live_updates.round_check(delta, self.role)
+        payload['type'] = 'state_delta'
+        if fragments and self.role in fragments:
+            payload['fragments'] = fragments[self.role]
+        await self.send(json.dumps(payload))
 
     async def disconnect(self, code):
         await self.channel_layer.group_discard(self.room_group, self.channel_name)
@@ -23,6 +54,10 @@ class GameConsumer(AsyncWebsocketConsumer):
         if action == "ping":
             await self.send(json.dumps({"type": "pong"}))
     
+    async def state_delta(self, event):
+        """Pushed after every committed state change — replaces the round_check poll"""
+        await self.send_delta(event['delta'], event.get('fragments'))
+
     async def innings_chosen(self, event):
         await self.send(json.dumps(event))
     # ── Broadcast handlers ──────────────────────────
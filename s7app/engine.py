@@ -0,0 +1,217 @@
+"""
+Round resolution with no I/O.
+
+Everything here is a plain function of card stats and a few numbers taken
+from the match: no ORM, no cache, no MatchState, no messages for players.
+views._resolve_round and views._recalculate_round_with_boost translate the
+results into state changes; simulations and bots can call it directly.
+
+    outcome = resolve(batter, bowler, RoundContext(round_number, batting_score,
+                                                   recent_runs, recent_wicket),
+                      batter_boost=True, bowler_support={'type': 'pace_support', ...})
+    s = score(eff_batting, eff_bowling, runs, runs_cutter_active)
+    status = match_status(innings, next_round, batting_team, batting_first,
+                          scores, wickets, target)
+
+Cards are anything with `batting`, `bowling`, `runs`, `ability` and
+`is_spinner` (CardRecord, PlayerCard, a namedtuple in a simulator).
+Supports are the dicts MatchState stores: {'type', 'from_round', 'until_round'}.
+"""
+import math
+from collections import namedtuple
+
+from .match_state import ROUNDS_PER_INNINGS
+
+MAX_WICKETS = 10
+
+# Every PlayerCard.ability value; the index is the compact code simulations use.
+ABILITIES = [
+    'none', 'opener', 'finisher', 'mid_over_hitter', 'spin_basher', 'saviour',
+    'powerplay_specialist', 'death_specialist', 'mid_over_specialist',
+    'runs_cutter', 'golden_arm', 'breakthrough',
+]
+ABILITY_CODE = {name: code for code, name in enumerate(ABILITIES)}
+
+ABILITY_BONUS = 10
+BOOST_BONUS = 10
+SUPPORT_BONUS = 2
+RUNS_CUT = 10
+
+# What the ability/boost checks need to know about the match so far.
+RoundContext = namedtuple('RoundContext', [
+    'round_number',     # 1..7
+    'batting_score',    # batting side's score before this round (Breakthrough)
+    'recent_runs',      # runs in the previous two rounds (Golden Arm)
+    'recent_wicket',    # a wicket fell in the previous two rounds (Saviour)
+])
+
+# kind is 'runs', 'tie' or 'wicket'
+Score = namedtuple('Score', ['kind', 'runs', 'wicket', 'runs_cut'])
+
+_RoundOutcomeBase = namedtuple('_RoundOutcomeBase', [
+    'kind', 'runs', 'wicket', 'runs_cut',
+    'eff_batting', 'eff_bowling', 'runs_cutter_active',
+    'batter_ability_bonus', 'bowler_ability_bonus',
+    'batter_boost_bonus', 'bowler_boost_bonus',
+    'batter_support_bonus', 'bowler_support_bonus',
+    'batter_support_type', 'bowler_support_type',
+    'boost_restored',   # Spin Basher fired instead of the batter's boost
+    'log',              # tuple of ability/boost/support lines, in order
+])
+
+
+class RoundOutcome(_RoundOutcomeBase):
+    """Result of one round; effective stats include abilities, boosts and supports."""
+    __slots__ = ()
+
+    @property
+    def batter_ability_triggered(self):
+        return self.batter_ability_bonus > 0
+
+    @property
+    def bowler_ability_triggered(self):
+        return self.bowler_ability_bonus > 0 or self.runs_cutter_active
+
+
+MatchStatus = namedtuple('MatchStatus', ['kind', 'winner', 'first_score'])
+# kind: None (play on), 'chased' (target reached — game over once confirmed),
+#       'innings_over' (first innings done, first_score set), 'match_over'
+
+
+def score(eff_batting, eff_bowling, runs, runs_cutter_active=False):
+    """Score a round from effective stats: full runs, a third on a tie, or a wicket."""
+    if eff_batting > eff_bowling:
+        if runs_cutter_active:
+            return Score('runs', max(0, runs - RUNS_CUT), False, min(RUNS_CUT, runs))
+        return Score('runs', runs, False, 0)
+    if eff_batting == eff_bowling:
+        return Score('tie', math.floor(runs / 3 + 0.5), False, 0)
+    return Score('wicket', 0, True, 0)
+
+
+def _support_active(support, round_number):
+    return bool(support) and support.get('from_round', 0) <= round_number <= support.get('until_round', 0)
+
+
+def resolve(batter, bowler, ctx, batter_boost=False, bowler_boost=False,
+            batter_support=None, bowler_support=None):
+    """Play `batter` against `bowler` and return a RoundOutcome."""
+    round_number = ctx.round_number
+    batting = batter.batting
+    bowling = bowler.bowling
+    log = []
+
+    spin_basher = batter.ability == 'spin_basher' and bowler.is_spinner
+
+    # ── batting abilities ────────────────────────────────
+    if batter.ability == 'opener' and round_number <= 2:
+        batting += ABILITY_BONUS
+        log.append("⚡ Opener: +10 batting!")
+    if batter.ability == 'finisher' and round_number >= 6:
+        batting += ABILITY_BONUS
+        log.append("💥 Finisher: +10 batting!")
+    if batter.ability == 'mid_over_hitter' and 3 <= round_number <= 5:
+        batting += ABILITY_BONUS
+        log.append("🏏 Mid Over Hitter: +10 batting!")
+    if spin_basher:
+        batting += ABILITY_BONUS
+        log.append("🌀 Spin Basher: +10 batting vs spinner!")
+    if batter.ability == 'saviour' and ctx.recent_wicket:
+        batting += ABILITY_BONUS
+        log.append("🛡️ Saviour: +10 batting after recent wicket!")
+
+    # ── bowling abilities ────────────────────────────────
+    if bowler.ability == 'powerplay_specialist' and round_number <= 2:
+        bowling += ABILITY_BONUS
+        log.append("🔥 Powerplay Specialist: +10 bowling!")
+    if bowler.ability == 'death_specialist' and round_number >= 6:
+        bowling += ABILITY_BONUS
+        log.append("💀 Death Specialist: +10 bowling!")
+    if bowler.ability == 'mid_over_specialist' and 3 <= round_number <= 5:
+        bowling += ABILITY_BONUS
+        log.append("🎯 Mid Over Specialist: +10 bowling!")
+    if bowler.ability == 'golden_arm' and ctx.recent_runs >= 30:
+        bowling += ABILITY_BONUS
+        log.append(f"💛 Golden Arm: +10 bowling ({ctx.recent_runs} runs in last 2 rounds)!")
+    if bowler.ability == 'breakthrough' and ctx.batting_score >= 60:
+        bowling += ABILITY_BONUS
+        log.append(f"🚨 Breakthrough: +10 bowling (opponent at {ctx.batting_score} runs)!")
+
+    runs_cutter_active = bowler.ability == 'runs_cutter' and batter.ability != 'spin_basher'
+    batter_ability_bonus = batting - batter.batting
+    bowler_ability_bonus = bowling - bowler.bowling
+
+    # ── boosts — a Spin Basher trigger replaces the batter's ──
+    batter_boost_bonus = BOOST_BONUS if batter_boost and not spin_basher else 0
+    bowler_boost_bonus = BOOST_BONUS if bowler_boost else 0
+    if batter_boost_bonus:
+        batting += batter_boost_bonus
+        log.append("🚀 Boost: +10 batting!")
+    if bowler_boost_bonus:
+        bowling += bowler_boost_bonus
+        log.append("🚀 Boost: +10 bowling!")
+
+    # ── supports ─────────────────────────────────────────
+    batter_support_bonus, batter_support_type = 0, None
+    if _support_active(batter_support, round_number) and batter_support.get('type') == 'batting_support':
+        batter_support_bonus, batter_support_type = SUPPORT_BONUS, 'Batting Support'
+        batting += SUPPORT_BONUS
+        log.append("🟢 Batting Support: +2 batting!")
+
+    bowler_support_bonus, bowler_support_type = 0, None
+    if _support_active(bowler_support, round_number):
+        support_type = bowler_support.get('type')
+        if support_type == 'pace_support' and not bowler.is_spinner:
+            bowler_support_bonus, bowler_support_type = SUPPORT_BONUS, 'Pace Support'
+            bowling += SUPPORT_BONUS
+            log.append("⚡ Pace Support: +2 bowling!")
+        elif support_type == 'spin_support' and bowler.is_spinner:
+            bowler_support_bonus, bowler_support_type = SUPPORT_BONUS, 'Spin Support'
+            bowling += SUPPORT_BONUS
+            log.append("🌀 Spin Support: +2 bowling!")
+
+    boost_restored = spin_basher and bool(batter_boost)
+    if boost_restored:
+        log.append("♻️ Boost restored: Spin Basher used instead!")
+
+    result = score(batting, bowling, batter.runs, runs_cutter_active)
+    if result.kind == 'runs' and runs_cutter_active:
+        log.append("✂️ Runs Cutter: -10 runs!")
+
+    return RoundOutcome(
+        result.kind, result.runs, result.wicket, result.runs_cut,
+        batting, bowling, runs_cutter_active,
+        batter_ability_bonus, bowler_ability_bonus,
+        batter_boost_bonus, bowler_boost_bonus,
+        batter_support_bonus, bowler_support_bonus,
+        batter_support_type, bowler_support_type,
+        boost_restored, tuple(log),
+    )
+
+
+def match_status(innings, next_round, batting_team, batting_first, scores, wickets, target):
+    """
+    Where the match stands after a round. `next_round` is the round that
+    would be played next (8 once all seven are done).
+    """
+    chasing_team = 'player2' if batting_first == 'player1' else 'player1'
+
+    if innings == 2 and target is not None and scores[batting_team] >= target:
+        return MatchStatus('chased', chasing_team, None)
+
+    if wickets[batting_team] < MAX_WICKETS and next_round <= ROUNDS_PER_INNINGS:
+        return MatchStatus(None, None, None)
+
+    if innings == 1:
+        return MatchStatus('innings_over', None, scores[batting_first])
+
+    # Second innings ran out before the target was reached
+    chasing_score   = scores[chasing_team]
+    defending_score = scores[batting_first]
+    if chasing_score == defending_score:
+        winner = 'Tie'
+    elif chasing_score >= (target or 0):
+        winner = chasing_team
+    else:
+        winner = batting_first
+    return MatchStatus('match_over', winner, None)
@@ -1,100 +1,391 @@
+from asgiref.sync import sync_to_async
+from django.conf import settings
 from django.core.cache import cache
+from django.db import transaction
+import asyncio
 import logging
+import threading
 import time
 
+from . import write_behind
+from .card_catalog import get_catalog
+from .match_state import MatchState, dumps, loads
+
 logger = logging.getLogger(__name__)
 
 # 3 hours TTL for game state
 GAME_TTL = 60 * 60 * 3
 
+# How many times aupdate_game_state re-applies a mutation after losing a race
+MAX_CAS_RETRIES = 10
+
+
 def redis_key(room_code):
     return f'game:{room_code}:state'
 
+
+# ─── stores ──────────────────────────────────────────────────────────────────
+# Each store keeps (revision, msgpack payload) per room and offers an atomic
+# compare-and-set: write only if the stored revision still equals the one the
+# caller read, otherwise hand back what is there now so the caller can retry
+# without another GET.
+#
+# Keys written before the hash layout hold a plain pickled dict, which HGET
+# rejects with WRONGTYPE. The Redis store takes such a value over once: it
+# reads and deletes it atomically, then CAS-seeds it as revision 1, so a match
+# that was live across the deploy keeps its cached state.
+
+# KEYS[1] = hash key; ARGV = expected rev, new rev, payload, ttl
+_CAS_SCRIPT = """
+local cur = redis.call('HGET', KEYS[1], 'rev') or '0'
+if cur ~= ARGV[1] then
+    local s = redis.call('HGET', KEYS[1], 'state')
+    if not s then return {0, '0'} end
+    return {0, cur, s}
+end
+redis.call('HSET', KEYS[1], 'rev', ARGV[2], 'state', ARGV[3])
+redis.call('EXPIRE', KEYS[1], ARGV[4])
+return {1, ARGV[2]}
+"""
+
+# KEYS[1] = key; returns the old plain value and deletes it, or nil if the key
+# is not a string (already a hash, or gone)
+_TAKE_LEGACY_SCRIPT = """
+if redis.call('TYPE', KEYS[1]).ok ~= 'string' then return false end
+local v = redis.call('GET', KEYS[1])
+redis.call('DEL', KEYS[1])
+return v
+"""
+
+
+def _wrongtype(exc):
+    return str(exc).startswith('WRONGTYPE')
+
+
+class _RedisStore:
+    """State as a Redis hash {rev, state}; CAS is a single Lua EVALSHA."""
+
+    def __init__(self):
+        from django_redis import get_redis_connection
+        self.client = get_redis_connection('default')
+        self.cas_script = self.client.register_script(_CAS_SCRIPT)
+        self.take_legacy_script = self.client.register_script(_TAKE_LEGACY_SCRIPT)
+        # redis.asyncio clients are bound to the loop that created them.
+        self._async_clients = {}
+
+    def _key(self, room_code):
+        return cache.make_key(redis_key(room_code))
+
+    def _adopt_legacy(self, room_code):
+        """Replace a pre-hash plain value with a revision-1 hash holding the same state."""
+        raw = self.take_legacy_script(keys=[self._key(room_code)])
+        if raw is None:
+            return
+        try:
+            legacy = cache.client.decode(raw)
+        except Exception as e:
+            # Undecodable: it is gone now, so the next read reloads from the DB.
+            logger.warning(f'Dropped unreadable legacy state for {room_code}: {e}')
+            return
+        # Loses only to a worker that already seeded this room, which is fine.
+        self.cas(room_code, 0, dumps(MatchState.from_json(legacy)))
+
+    def _hmget(self, room_code):
+        try:
+            return self.client.hmget(self._key(room_code), ['rev', 'state'])
+        except Exception as e:
+            if not _wrongtype(e):
+                raise
+        self._adopt_legacy(room_code)
+        return self.client.hmget(self._key(room_code), ['rev', 'state'])
+
+    def get(self, room_code):
+        rev, payload = self._hmget(room_code)
+        if payload is None:
+            return None
+        return int(rev or 0), payload
+
+    def cas(self, room_code, expected_rev, payload):
+        args = [expected_rev, expected_rev + 1, payload, GAME_TTL]
+        try:
+            result = self.cas_script(keys=[self._key(room_code)], args=args)
+        except Exception as e:
+            if not _wrongtype(e):
+                raise
+            self._adopt_legacy(room_code)
+            result = self.cas_script(keys=[self._key(room_code)], args=args)
+        ok, rev = int(result[0]), int(result[1])
+        current = result[2] if len(result) > 2 else None
+        return bool(ok), rev, current
+
+    def delete(self, room_code):
+        self.client.delete(self._key(room_code))
+
+    # ── async (views running on the ASGI event loop) ─────────
+    def _async_client(self):
+        loop = asyncio.get_running_loop()
+        self._async_clients = {l: c for l, c in self._async_clients.items() if not l.is_closed()}
+        entry = self._async_clients.get(loop)
+        if entry is None:
+            import redis.asyncio
+            options = settings.CACHES['default'].get('OPTIONS', {})
+            client = redis.asyncio.from_url(
+                settings.CACHES['default']['LOCATION'],
+                **options.get('CONNECTION_POOL_KWARGS', {}),
+            )
+            entry = self._async_clients[loop] = (client, client.register_script(_CAS_SCRIPT))
+        return entry
+
+    async def aget(self, room_code):
+        client, _ = self._async_client()
+        try:
+            rev, payload = await client.hmget(self._key(room_code), ['rev', 'state'])
+        except Exception as e:
+            if not _wrongtype(e):
+                raise
+            # Once per room that was live across the deploy.
+            await sync_to_async(self._adopt_legacy)(room_code)
+            rev, payload = await client.hmget(self._key(room_code), ['rev', 'state'])
+        if payload is None:
+            return None
+        return int(rev or 0), payload
+
+    async def acas(self, room_code, expected_rev, payload):
+        _, cas_script = self._async_client()
+        args = [expected_rev, expected_rev + 1, payload, GAME_TTL]
+        try:
+            result = await cas_script(keys=[self._key(room_code)], args=args)
+        except Exception as e:
+            if not _wrongtype(e):
+                raise
+            await sync_to_async(self._adopt_legacy)(room_code)
+            result = await cas_script(keys=[self._key(room_code)], args=args)
+        ok, rev = int(result[0]), int(result[1])
+        current = result[2] if len(result) > 2 else None
+        return bool(ok), rev, current
+
+
+class _LocalStore:
+    """
+    Django cache (LocMemCache in dev) guarded by a per-room lock.
+    LocMemCache is per-process anyway, so a process-local lock is enough.
+    """
+
+    def __init__(self):
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+
+    def _lock(self, room_code):
+        with self._locks_guard:
+            return self._locks.setdefault(room_code, threading.Lock())
+
+    def get(self, room_code):
+        return cache.get(redis_key(room_code))
+
+    def cas(self, room_code, expected_rev, payload):
+        with self._lock(room_code):
+            current = cache.get(redis_key(room_code))
+            current_rev = current[0] if current else 0
+            if current_rev != expected_rev:
+                return False, current_rev, current[1] if current else None
+            cache.set(redis_key(room_code), (expected_rev + 1, payload), GAME_TTL)
+            return True, expected_rev + 1, None
+
+    def delete(self, room_code):
+        cache.delete(redis_key(room_code))
+
+    # LocMemCache never leaves the process and the lock is only held for a
+    # dict lookup, so the async versions just run inline on the loop.
+    async def aget(self, room_code):
+        return self.get(room_code)
+
+    async def acas(self, room_code, expected_rev, payload):
+        return self.cas(room_code, expected_rev, payload)
+
+
+_store_instance = None
+
+
+def _store():
+    global _store_instance
+    if _store_instance is None:
+        try:
+            from django_redis.cache import RedisCache
+        except ImportError:
+            RedisCache = None
+        if RedisCache is not None and isinstance(cache, RedisCache):
+            _store_instance = _RedisStore()
+        else:
+            _store_instance = _LocalStore()
+    return _store_instance
+
+
+# ─── public API ──────────────────────────────────────────────────────────────
+
+def _load_from_db(room_code):
+    from .models import GameRoom
+    # A state still waiting in the write-behind queue is newer than the row.
+    queued = write_behind.pending(room_code)
+    if queued is not None:
+        return queued
+    _db_start = time.time()
+    try:
+        room = GameRoom.objects.get(code=room_code)
+    except GameRoom.DoesNotExist:
+        return MatchState()
+    _db_elapsed = time.time() - _db_start
+    print(f"⏱️ DB FALLBACK GET took {_db_elapsed*1000:.1f}ms for {room_code}")
+    return MatchState.from_json(room.state)
+
+
+def _save_to_db(room_code, state):
+    # Off the request path: the write-behind thread batches it into a bulk_update.
+    write_behind.enqueue(room_code, state)
+
+
 def get_game_state(room_code):
     """
-    Get game state from Redis.
+    Get game state (a MatchState) from Redis.
     If not in Redis, load from DB and cache it.
     """
-    key = redis_key(room_code)
-    
     _start = time.time()
     try:
-        state = cache.get(key)
+        stored = _store().get(room_code)
         _elapsed = time.time() - _start
         if _elapsed > 0.05:  # log anything over 50ms
             print(f"⏱️ REDIS GET took {_elapsed*1000:.1f}ms for {room_code}")
-        
-        if state is not None:
-            state.setdefault('scores', {'player1': 0, 'player2': 0})
-            state.setdefault('wickets', {'player1': 0, 'player2': 0})
+
+        if stored is not None:
+            rev, payload = stored
+            state = loads(payload)
+            state.revision = rev
             return state
     except Exception as e:
         logger.warning(f'Redis get failed: {e}')
         print(f"❌ REDIS GET FAILED for {room_code}: {e}")
-    
-    # Redis miss — load from DB
-    _db_start = time.time()
-    from .models import GameRoom
+
+    # Redis miss — load from DB and warm Redis up. Seeding is itself a CAS
+    # against "no key", so it never clobbers a state another worker just wrote.
+    state = _load_from_db(room_code)
     try:
-        room = GameRoom.objects.get(code=room_code)
-        _db_elapsed = time.time() - _db_start
-        print(f"⏱️ DB FALLBACK GET took {_db_elapsed*1000:.1f}ms for {room_code}")
-        
-        state = room.state or {}
-        state.setdefault('scores', {'player1': 0, 'player2': 0})
-        state.setdefault('wickets', {'player1': 0, 'player2': 0})
-        # Warm up Redis
-        try:
-            cache.set(key, state, GAME_TTL)
-        except Exception as e:
-            logger.warning(f'Redis set failed: {e}')
-        return state
-    except GameRoom.DoesNotExist:
-        return {
-            'scores':  {'player1': 0, 'player2': 0},
-            'wickets': {'player1': 0, 'player2': 0},
-        }
+        ok, rev, current = _store().cas(room_code, 0, dumps(state))
+        if ok:
+            state.revision = rev
+        elif current is not None:
+            state = loads(current)
+            state.revision = rev
+    except Exception as e:
+        logger.warning(f'Redis set failed: {e}')
+    return state
 
 
-def save_game_state(room_code, state, save_to_db=False):
-    """
-    Always save to Redis (fast).
-    Save to DB only at important moments.
-    """
-    key = redis_key(room_code)
-    
-    # Save to Redis
+async def aget_game_state(room_code):
+    """get_game_state() for async views: async cache client, DB fallback in a thread."""
     _start = time.time()
     try:
-        cache.set(key, state, GAME_TTL)
+        stored = await _store().aget(room_code)
         _elapsed = time.time() - _start
-        if _elapsed > 0.05:
-            print(f"⏱️ REDIS SET took {_elapsed*1000:.1f}ms for {room_code}")
+        if _elapsed > 0.05:  # log anything over 50ms
+            print(f"⏱️ REDIS GET took {_elapsed*1000:.1f}ms for {room_code}")
+
+        if stored is not None:
+            rev, payload = stored
+            state = loads(payload)
+            state.revision = rev
+            return state
+    except Exception as e:
+        logger.warning(f'Redis get failed: {e}')
+        print(f"❌ REDIS GET FAILED for {room_code}: {e}")
+
+    state = await sync_to_async(_load_from_db)(room_code)
+    try:
+        ok, rev, current = await _store().acas(room_code, 0, dumps(state))
+        if ok:
+            state.revision = rev
+        elif current is not None:
+            state = loads(current)
+            state.revision = rev
     except Exception as e:
-        logger.warning(f'Redis save failed: {e}')
-        print(f"❌ REDIS SET FAILED for {room_code}: {e}")
-        # If Redis fails, force DB save
-        save_to_db = True
-    
-    # Save to DB if requested
-    if save_to_db:
-        _db_start = time.time()
-        from .models import GameRoom
+        logger.warning(f'Redis set failed: {e}')
+    return state
+
+
+async def aupdate_game_state(room_code, mutate, state=None, save_to_db=False):
+    """
+    Atomically apply `mutate(state)` to the stored game state.
+
+    `mutate` may run more than once — if another request wrote in between,
+    it is re-applied to the fresh state — so it must only touch the state it
+    is given and leave notifications to the caller. Pass the `state` you
+    already read to skip the initial GET; the write is then a single
+    compare-and-set round-trip.
+
+    `mutate` runs on the event loop, so it must not touch the ORM or the
+    cache. state.card() reads the frozen decks; rooms started before decks
+    were frozen get a catalog snapshot, loaded in a thread before the first
+    attempt and reused on every retry.
+
+    `save_to_db` is a bool or a callable(state) -> bool evaluated on the
+    committed state. Returns (committed_state, mutate's return value).
+    """
+    store = _store()
+    if state is None:
+        state = await aget_game_state(room_code)
+    catalog = None if state.get('decks') else await sync_to_async(get_catalog)()
+    for _ in range(MAX_CAS_RETRIES):
+        state.catalog = catalog
+        result = mutate(state)
+        _start = time.time()
         try:
-            room = GameRoom.objects.get(code=room_code)
-            room.state = state
+            ok, rev, current = await store.acas(room_code, state.revision, dumps(state))
+        except Exception as e:
+            logger.warning(f'Redis update failed: {e}')
+            print(f"❌ REDIS UPDATE FAILED for {room_code}: {e}")
+            return await sync_to_async(_update_in_db)(room_code, mutate)
+        _elapsed = time.time() - _start
+        if _elapsed > 0.05:
+            print(f"⏱️ REDIS CAS took {_elapsed*1000:.1f}ms for {room_code}")
+        if ok:
+            state.revision = rev
+            break
+        if current is not None:
+            state = loads(current)
+            state.revision = rev
+        else:
+            state = await sync_to_async(_load_from_db)(room_code)
+            state.revision = 0
+    else:
+        raise RuntimeError(f'Too much contention on game state for {room_code}')
+
+    if save_to_db(state) if callable(save_to_db) else save_to_db:
+        # enqueue only touches an in-memory queue (unless write-behind is off).
+        if write_behind.is_inline():
+            await sync_to_async(_save_to_db)(room_code, state)
+        else:
+            _save_to_db(room_code, state)
+    return state, result
+
+
+def _update_in_db(room_code, mutate):
+    from .models import GameRoom
+    with transaction.atomic():
+        room = GameRoom.objects.select_for_update().filter(code=room_code).first()
+        state = write_behind.pending(room_code)
+        if state is None:
+            state = MatchState.from_json(room.state if room else None)
+        result = mutate(state)
+        if room is not None:
+            room.state = state.to_json()
             room.save(update_fields=['state'])
-            _db_elapsed = time.time() - _db_start
-            print(f"⏱️ DB SAVE took {_db_elapsed*1000:.1f}ms for {room_code}")
-        except GameRoom.DoesNotExist:
-            pass
+    # The row is now newer than anything still queued for it.
+    write_behind.discard(room_code)
+    return state, result
 
 
 def delete_game_state(room_code):
     """Clear Redis after match fully ends"""
-    key = redis_key(room_code)
     try:
-        cache.delete(key)
+        _store().delete(room_code)
     except Exception as e:
         logger.warning(f'Redis delete failed: {e}')
 
@@ -105,4 +396,4 @@ def delete_game_state(room_code):
 # 3. Both players played a round (resolve round)
 # NOT needed:
 # 1. One player picked a card (waiting for opponent)
-# 2. Support/boost activation
\ No newline at end of file
+# 2. Support/boost activation
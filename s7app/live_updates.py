@@ -0,0 +1,136 @@
+"""
+Push-based game sync over the room's WebSocket group.
+
+After every committed change to a match, views call `apush_state_delta()`.
+It broadcasts the handful of shared fields the client needs to decide what
+to refresh. GameConsumer turns that into the same per-player payload
+`?partial=round_check` returns, so the page can use one handler for both.
+The HTTP poll now only runs as a slow fallback when the socket goes quiet.
+
+When a round resolves (or a boost rescores one) the pushed event also carries
+the game page's partials, rendered once per state revision for each player
+and cached under (room, revision, role). The page swaps them in directly
+instead of fetching five ?partial= URLs. Fragments are rendered without a
+request, so `{% csrf_token %}` comes out as CSRF_PLACEHOLDER and the page
+substitutes its own token.
+
+The group_send is awaited on the loop; only fragment rendering (ORM +
+templates) goes to a thread, in one hop for both players.
+"""
+import logging
+
+from django.core.cache import cache
+from django.template.loader import render_to_string
+
+logger = logging.getLogger(__name__)
+
+# partial name -> template; the same names ?partial= accepts
+FRAGMENT_TEMPLATES = {
+    'scoreboard': 'partials/scoreboard.html',
+    'game_panel': 'partials/game_panel.html',
+    'last_round': 'partials/last_round_result.html',
+    'status_bar': 'partials/status_bar.html',
+    'timeline':   'partials/timeline_content.html',
+}
+
+CSRF_PLACEHOLDER = '__S7_CSRF_TOKEN__'
+
+# Fragments bake in the post-round boost countdown, so they go stale quickly.
+FRAGMENT_TTL = 5
+
+
+def state_delta(state):
+    """Role-neutral snapshot of the fields the game page syncs on."""
+    return {
+        'revision':         state.revision,
+        'round_number':     state.get('round_number', 1),
+        'innings':          state.get('innings', 1),
+        'boost_counter':    state.get('boost_update_counter', 0),
+        'game_over':        bool(state.get('game_over', False)),
+        'game_over_pending': bool(state.get('game_over_pending', False)),
+        'viewing_innings2': {
+            role: bool(state.get(f'{role}_viewing_innings2', False)) for role in ('player1', 'player2')
+        },
+        'viewing_result': {
+            role: bool(state.get(f'{role}_viewing_result', False)) for role in ('player1', 'player2')
+        },
+    }
+
+
+def round_check(delta, my_role):
+    """What one player's page needs from a delta (the round_check JSON)."""
+    my_viewing_innings2 = delta['viewing_innings2'].get(my_role, False)
+    my_viewing_result   = delta['viewing_result'].get(my_role, False)
+    shared_game_over    = delta['game_over']
+    shared_pending      = delta['game_over_pending']
+
+    i_still_need_innings_transition = (delta['innings'] == 2 and not my_viewing_innings2)
+    i_still_need_result_confirm     = ((shared_game_over or shared_pending) and not my_viewing_result)
+
+    return {
+        'revision':         delta['revision'],
+        'round_number':     delta['round_number'],
+        'innings':          delta['innings'],
+        'game_over':        bool(shared_game_over and my_viewing_result),  # only true once THIS player has confirmed
+        'boost_counter':    delta['boost_counter'],
+        'needs_transition': i_still_need_innings_transition or i_still_need_result_confirm,
+    }
+
+
+def fragment_key(room_code, revision, role):
+    return f'game:{room_code}:fragments:{revision}:{role}'
+
+
+def render_fragments(room, state, role):
+    """
+    {partial name: html} for `role`'s view of `state`, rendered at most once
+    per state revision. Contains CSRF_PLACEHOLDER where the token goes.
+    """
+    key = fragment_key(room.code, state.revision, role)
+    if state.revision:
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+
+    from .views import _build_game_context
+    memo = {}
+    fragments = {}
+    for name, template in FRAGMENT_TEMPLATES.items():
+        context = _build_game_context(room, state, role, name, memo)
+        context['csrf_token'] = CSRF_PLACEHOLDER
+        fragments[name] = render_to_string(template, context)
+    if state.revision:
+        cache.set(key, fragments, FRAGMENT_TTL)
+    return fragments
+
+
+async def acached_fragment(room_code, revision, role, name):
+    """One already-rendered fragment for this exact revision, or None."""
+    if not revision:
+        return None
+    fragments = await cache.aget(fragment_key(room_code, revision, role))
+    return fragments.get(name) if fragments else None
+
+
+def _render_both(room, state):
+    return {role: render_fragments(room, state, role) for role in ('player1', 'player2')}
+
+
+async def apush_state_delta(room_code, state, room=None):
+    """
+    Broadcast the committed state's delta to everyone in the room. Pass the
+    GameRoom to also push both players' rendered fragments.
+    """
+    try:
+        from asgiref.sync import sync_to_async
+        from channels.layers import get_channel_layer
+        event = {
+            "type":  "state_delta",
+            "delta": state_delta(state),
+        }
+        if room is not None:
+            event["fragments"] = await sync_to_async(_render_both)(room, state)
+        await get_channel_layer().group_send(f"s7app_{room_code}", event)
+    except Exception as e:
+        logger.warning(f'state_delta push failed: {e}')
+        print(f"❌ WebSocket state_delta push failed: {e}")
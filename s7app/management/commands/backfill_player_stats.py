@@ -0,0 +1,48 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from s7app import stats
+from s7app.models import GameRoom, PlayerStats
+
+
+class Command(BaseCommand):
+    help = (
+        'Rebuild every PlayerStats row (totals, per-team deck usage, recent matches) '
+        'from the counted GameRoom rows, first claiming completed rooms nothing has counted yet. '
+        'Migration 0017 already does this at deploy; this is for repairs and is safe to run live.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        batch = options['batch_size']
+        completed = GameRoom.objects.filter(status='completed')
+
+        with transaction.atomic():
+            # The same conditional UPDATE finalize_match() claims with: a room a
+            # finishing request already claimed is left to it, and one claimed
+            # here can't be claimed again.
+            claimed = completed.filter(winner_role__in=stats.RESULTS, stats_recorded=False) \
+                .update(stats_recorded=True)
+            # Wait out any finalize_match() still folding into a row, then keep
+            # the rest out until the rebuilt rows are written.
+            list(PlayerStats.objects.select_for_update().values_list('pk', flat=True))
+
+            rows = {user_id: PlayerStats(user_id=user_id) for user_id in User.objects.values_list('id', flat=True)}
+            rooms = (
+                completed.filter(winner_role__in=stats.RESULTS, stats_recorded=True)
+                .select_related('player1', 'player2', 'player1_deck__team', 'player2_deck__team')
+                .defer('state')
+                .order_by('created_at', 'id')   # oldest first, so `recent` ends newest first
+            )
+            counted = stats.fold_rooms(rows, rooms.iterator(chunk_size=batch))
+            PlayerStats.objects.bulk_create(
+                list(rows.values()), batch_size=batch,
+                update_conflicts=True, unique_fields=['user'], update_fields=stats.ROLLUP_FIELDS,
+            )
+
+        skipped = completed.exclude(winner_role__in=stats.RESULTS).count()
+        self.stdout.write(f'📊 {len(rows)} players rebuilt from {counted} matches, {claimed} newly claimed '
+                          f'({skipped} completed rooms without a result skipped)')
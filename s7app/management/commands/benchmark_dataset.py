@@ -0,0 +1,98 @@
+import os
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from s7app import ai_model
+from s7app.card_catalog import get_catalog
+
+
+def _iterrows_dataset(path):
+    """The original row-by-row builder, kept here as the baseline."""
+    pd = ai_model.pd
+    df = pd.read_csv(path)
+    cards = {c.id: {'batting': c.batting, 'bowling': c.bowling, 'runs': c.runs}
+             for c in get_catalog().values()}
+    rows = []
+    for _, r in df.iterrows():
+        try:
+            pid = int(r['player_card_id']); cid = int(r['computer_card_id'])
+        except Exception:
+            continue
+        p = cards.get(pid); c = cards.get(cid)
+        if p is None or c is None:
+            continue
+        batting_team = str(r.get('batting_team'))
+        outcome = str(r.get('outcome')).lower()
+        if outcome == 'win':
+            comp_success = 1 if batting_team == 'computer' else 0
+        else:
+            comp_success = 1 if batting_team == 'player' else 0
+        rows.append({
+            'p_batting': p['batting'], 'p_bowling': p['bowling'], 'p_runs': p['runs'],
+            'c_batting': c['batting'], 'c_bowling': c['bowling'], 'c_runs': c['runs'],
+            'innings': int(r.get('innings', 1)) if 'innings' in r else 1,
+            'round_number': int(r.get('round_number', 0)) if 'round_number' in r else 0,
+            'wickets': int(r.get('wickets', 0)) if 'wickets' in r else 0,
+            'label': comp_success
+        })
+    return pd.DataFrame(rows)
+
+
+class Command(BaseCommand):
+    help = (
+        'Write a synthetic game history CSV and time ai_model.build_dataset on it '
+        'against the old iterrows() builder (rows per second).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1_000_000, help='Synthetic history rows.')
+        parser.add_argument('--baseline-rows', type=int, default=50_000,
+                            help='Rows given to the iterrows() baseline (it is slow).')
+        parser.add_argument('--chunksize', type=int, default=ai_model.DATASET_CHUNK)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        if not ai_model.HAS_ML_LIBS:
+            raise CommandError('pandas / numpy / scikit-learn are not installed.')
+        ids = sorted(get_catalog())
+        if not ids:
+            raise CommandError('No cards in the catalog.')
+
+        with tempfile.TemporaryDirectory() as tmp:
+            big = os.path.join(tmp, 'history.csv')
+            small = os.path.join(tmp, 'history_small.csv')
+            self._write_history(big, options['rows'], ids, options['seed'])
+            self._write_history(small, min(options['baseline_rows'], options['rows']), ids, options['seed'])
+
+            _start = time.time()
+            old = _iterrows_dataset(small)
+            old_rate = len(old) / max(time.time() - _start, 1e-9)
+
+            new_small = ai_model.build_dataset(small, options['chunksize'])
+            same = (new_small.astype('int64').reset_index(drop=True)
+                    .equals(old[new_small.columns].astype('int64')))
+
+            _start = time.time()
+            rows = sum(len(frame) for frame in ai_model.iter_dataset(big, options['chunksize']))
+            new_rate = rows / max(time.time() - _start, 1e-9)
+
+        self.stdout.write(f'iterrows():   {old_rate:>12,.0f} rows/s  ({len(old):,} rows)')
+        self.stdout.write(f'vectorised:   {new_rate:>12,.0f} rows/s  ({rows:,} rows, '
+                          f'chunks of {options["chunksize"]:,})')
+        self.stdout.write(f'speed-up:     {new_rate / max(old_rate, 1e-9):>12,.1f}x')
+        self.stdout.write(f'same dataset: {"✅" if same else "❌"}')
+
+    def _write_history(self, path, n, ids, seed):
+        np, pd = ai_model.np, ai_model.pd
+        rng = np.random.default_rng(seed)
+        pd.DataFrame({
+            'round_number': rng.integers(1, 8, n),
+            'player_card_id': rng.choice(ids, n),
+            'computer_card_id': rng.choice(ids, n),
+            'outcome': rng.choice(['win', 'loss'], n),
+            'batting_team': rng.choice(['player', 'computer'], n),
+            'innings': rng.integers(1, 3, n),
+            'wickets': rng.integers(0, 10, n),
+        }).to_csv(path, index=False)
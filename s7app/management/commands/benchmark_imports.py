@@ -0,0 +1,78 @@
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+# Runs in a fresh interpreter: the worker's cold start up to a loaded views module.
+_SNIPPET = '''
+import os, time
+_start = time.perf_counter()
+import django
+django.setup()
+_setup = time.perf_counter()
+import {module}
+_end = time.perf_counter()
+print(f"TIMES {{_setup - _start}} {{_end - _setup}}")
+'''
+
+_IMPORTTIME = re.compile(r'import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)')
+
+
+class Command(BaseCommand):
+    help = (
+        'Time a cold import of s7app.views (django.setup() + import) in fresh interpreters, '
+        'list the slowest modules (python -X importtime) and check the import writes no files.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--module', default='s7app.views')
+        parser.add_argument('--runs', type=int, default=10)
+        parser.add_argument('--top', type=int, default=15, help='Slowest modules to list.')
+
+    def handle(self, *args, **options):
+        module = options['module']
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE=os.environ.get('DJANGO_SETTINGS_MODULE', 's7.settings'))
+        code = _SNIPPET.format(module=module)
+        cwd = str(settings.BASE_DIR)
+
+        before = self._app_files()
+        setups, imports = [], []
+        for _ in range(options['runs']):
+            out = subprocess.run([sys.executable, '-c', code], cwd=cwd, env=env,
+                                 capture_output=True, text=True, check=True).stdout
+            setup, imported = (float(v) for v in out.split('TIMES', 1)[1].split())
+            setups.append(setup * 1000)
+            imports.append(imported * 1000)
+        after = self._app_files()
+        touched = sorted(name for name, mtime in after.items() if before.get(name) != mtime)
+
+        self.stdout.write(f'⏱️ cold start over {options["runs"]} runs (median):')
+        self.stdout.write(f'  django.setup()   {statistics.median(setups):8.1f} ms')
+        self.stdout.write(f'  import {module:<10}{statistics.median(imports):8.1f} ms')
+        self.stdout.write(f'  total            {statistics.median(s + i for s, i in zip(setups, imports)):8.1f} ms')
+        if touched:
+            self.stdout.write(f'❌ import wrote: {", ".join(touched)}')
+        else:
+            self.stdout.write('✅ import wrote no files')
+
+        stderr = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], cwd=cwd, env=env,
+                                capture_output=True, text=True, check=True).stderr
+        rows = []
+        for line in stderr.splitlines():
+            m = _IMPORTTIME.match(line)
+            if m:
+                rows.append((int(m.group(2)), int(m.group(1)), m.group(4)))
+        self.stdout.write('\nSlowest modules (cumulative µs, self µs):')
+        for cumulative, own, name in sorted(rows, reverse=True)[:options['top']]:
+            self.stdout.write(f'  {cumulative:>9,} {own:>9,}  {name}')
+
+    def _app_files(self):
+        app_dir = os.path.join(str(settings.BASE_DIR), 's7app')
+        return {
+            name: os.stat(os.path.join(app_dir, name)).st_mtime_ns
+            for name in os.listdir(app_dir) if not name.startswith('__')
+        }
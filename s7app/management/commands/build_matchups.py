@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from s7app import matchups
+from s7app.card_catalog import get_catalog
+
+
+class Command(BaseCommand):
+    help = 'Build (or confirm) the matchup table for the current card catalog.'
+
+    def handle(self, *args, **options):
+        if not matchups.HAS_NUMPY:
+            raise CommandError('NumPy is not installed.')
+        catalog = get_catalog()
+        table = matchups.load_or_build(catalog)
+        size_mb = table.data.nbytes / 1e6
+        self.stdout.write(
+            f'Matchup table {table.fingerprint}: {len(table.ids)} cards, '
+            f'{table.data.shape[2]} rounds x {matchups.N_MODIFIERS} modifiers, {size_mb:.1f} MB '
+            f'→ {matchups.table_path(table.fingerprint)}'
+        )
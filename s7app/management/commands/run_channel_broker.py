@@ -0,0 +1,24 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from s7app.channel_layers import DEFAULT_SOCKET_PATH, run_broker
+
+
+class Command(BaseCommand):
+    help = 'Run the Unix-socket channel broker used by CHANNEL_LAYER=local.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--socket', default=None,
+                            help='Socket path (default: the one configured in CHANNEL_LAYERS).')
+
+    def handle(self, *args, **options):
+        socket_path = options['socket']
+        if socket_path is None:
+            config = settings.CHANNEL_LAYERS.get('default', {}).get('CONFIG', {})
+            socket_path = config.get('socket_path', DEFAULT_SOCKET_PATH)
+        try:
+            run_broker(socket_path)
+        except RuntimeError as e:
+            raise CommandError(str(e))
+        except KeyboardInterrupt:
+            self.stdout.write('Channel broker stopped.')
@@ -0,0 +1,109 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from s7app import simulator, tournament
+from s7app.card_catalog import deck_cards, get_catalog
+from s7app.models import Team, UserDeck
+
+
+class Command(BaseCommand):
+    help = (
+        'Round-robin tournament between every UserDeck, or every legal deck (7-9 cards, '
+        'weightage <= 32) per team, over a process pool. Prints deck and per-card win rates.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--source', choices=['legal', 'userdecks'], default='legal',
+                            help="'legal': every legal deck from each team's cards (default); "
+                                 "'userdecks': every UserDeck with 7+ cards.")
+        parser.add_argument('--team', action='append', default=[],
+                            help='Limit legal decks to this team (name or id). Repeatable.')
+        parser.add_argument('--max-weightage', type=int, default=tournament.MAX_WEIGHTAGE)
+        parser.add_argument('--matches', type=int, default=2_000, help='Matches per pairing.')
+        parser.add_argument('--workers', type=int, default=None, help='Processes (default: all cores).')
+        parser.add_argument('--seed', type=int, default=None)
+        parser.add_argument('--out', default='tournament.msgpack', help='Results file.')
+        parser.add_argument('--top', type=int, default=10, help='Best/worst decks to list.')
+
+    def handle(self, *args, **options):
+        if not simulator.HAS_NUMPY:
+            raise CommandError('NumPy is not installed.')
+
+        if options['source'] == 'userdecks':
+            decks = self._user_decks()
+        else:
+            decks = self._legal_decks(options['team'], options['max_weightage'])
+        if len(decks) < 2:
+            raise CommandError('Need at least two decks.')
+
+        workers = options['workers'] or os.cpu_count() or 1
+        pairings = len(decks) * (len(decks) - 1) // 2
+        self.stdout.write(
+            f'🏏 {len(decks)} decks, {pairings:,} pairings x {options["matches"]:,} matches '
+            f'on {workers} worker(s) → {options["out"]}'
+        )
+
+        def progress(done, total):
+            if done == total or done % max(1, total // 10) == 0:
+                self.stdout.write(f'  {done}/{total} batches')
+
+        pairings, elapsed = tournament.run(
+            decks, options['matches'], options['out'],
+            workers=workers, seed=options['seed'], progress=progress,
+        )
+        total = pairings * options['matches']
+        self.stdout.write(f'⏱️ {total:,} matches in {elapsed:.1f}s ({total / max(elapsed, 1e-9):,.0f}/s)\n')
+
+        header, columns = tournament.read_results(options['out'])
+        self._report(decks, tournament.deck_win_rates(header, columns), options['top'])
+
+    # ── deck sources ─────────────────────────────────────────
+    def _user_decks(self):
+        decks = []
+        for deck in UserDeck.objects.select_related('user').order_by('id'):
+            cards = deck_cards(deck.id)
+            if len(cards) >= simulator.ROUNDS_PER_INNINGS:
+                decks.append(tournament.TournamentDeck(f'{deck.user.username}/{deck.name}#{deck.id}', cards))
+        return decks
+
+    def _legal_decks(self, teams, max_weightage):
+        qs = Team.objects.all()
+        if teams:
+            ids = [int(t) for t in teams if t.isdigit()]
+            names = [t for t in teams if not t.isdigit()]
+            qs = qs.filter(id__in=ids) | qs.filter(name__in=names)
+        team_names = dict(qs.values_list('id', 'name'))
+        by_team = {}
+        for card in get_catalog().values():
+            if card.team_id in team_names:
+                by_team.setdefault(card.team_id, []).append(card)
+
+        decks = []
+        for team_id, cards in sorted(by_team.items()):
+            for combo in tournament.legal_decks(cards, max_weightage):
+                label = f'{team_names[team_id]} [{",".join(str(c.id) for c in combo)}]'
+                decks.append(tournament.TournamentDeck(label, list(combo)))
+        return decks
+
+    # ── report ───────────────────────────────────────────────
+    def _report(self, decks, rates, top):
+        order = sorted(range(len(decks)), key=lambda i: rates[i], reverse=True)
+        self.stdout.write(f'Top {min(top, len(order))} decks:')
+        for i in order[:top]:
+            self.stdout.write(f'  {rates[i] * 100:5.1f}%  {decks[i].label}')
+        self.stdout.write(f'Bottom {min(top, len(order))} decks:')
+        for i in order[-top:]:
+            self.stdout.write(f'  {rates[i] * 100:5.1f}%  {decks[i].label}')
+
+        # Per card: how decks that include it do, next to its weightage.
+        per_card = {}
+        for i, deck in enumerate(decks):
+            for card in deck.cards:
+                per_card.setdefault(card.id, (card, []))[1].append(rates[i])
+        self.stdout.write('\nCard balance (avg win rate of decks containing the card):')
+        self.stdout.write(f'  {"card":<28}{"w":>4}{"decks":>7}{"win %":>8}')
+        rows = sorted(per_card.values(), key=lambda v: sum(v[1]) / len(v[1]), reverse=True)
+        for card, card_rates in rows:
+            avg = sum(card_rates) / len(card_rates)
+            self.stdout.write(f'  {card.name[:27]:<28}{card.weightage:>4}{len(card_rates):>7}{avg * 100:>7.1f}%')
@@ -0,0 +1,99 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from s7app import matchups, simulator
+from s7app.card_catalog import get_catalog
+from s7app.models import Team
+
+
+def team_decks():
+    """{team name: [CardRecord]} — every team's cards, by id (each team is one legal deck)."""
+    names = dict(Team.objects.values_list('id', 'name'))
+    decks = {}
+    for card in sorted(get_catalog().values(), key=lambda c: c.id):
+        if card.team_id in names:
+            decks.setdefault(names[card.team_id], []).append(card)
+    return {name: cards for name, cards in decks.items() if len(cards) >= simulator.ROUNDS_PER_INNINGS}
+
+
+class Command(BaseCommand):
+    help = 'Simulate random matches between every pair of Team decks and print win rates.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--matches', type=int, default=100_000,
+                            help='Matches per pairing (default 100000).')
+        parser.add_argument('--seed', type=int, default=None)
+        parser.add_argument('--chunk', type=int, default=simulator.DEFAULT_CHUNK,
+                            help='Matches simulated per batch.')
+        parser.add_argument('--abilities', action='store_true',
+                            help='Also print how much each ability is worth to the decks that have it.')
+
+    def handle(self, *args, **options):
+        if not simulator.HAS_NUMPY:
+            raise CommandError('NumPy is not installed.')
+        decks = team_decks()
+        if len(decks) < 2:
+            raise CommandError('Need at least two Team decks with 7+ cards.')
+
+        n = options['matches']
+        seed = options['seed']
+        chunk = options['chunk']
+        names = list(decks)
+        table = matchups.get_table()
+        arrays = {name: simulator.deck_arrays(cards, table) for name, cards in decks.items()}
+
+        _start = time.time()
+        rates = self._matrix(names, arrays, n, seed, chunk, table)
+        elapsed = time.time() - _start
+        pairings = len(names) * (len(names) - 1) // 2
+
+        self.stdout.write(f'Win rate of row deck vs column deck ({n:,} matches per pairing, ties = ½):\n')
+        self._print_matrix(names, rates)
+        self.stdout.write(f'\n⏱️ {pairings * n:,} matches in {elapsed:.1f}s')
+
+        if options['abilities']:
+            self.stdout.write('\nAbility value (average win rate lost when the ability is removed):\n')
+            self._print_ability_values(names, decks, arrays, rates, n, seed, chunk)
+
+    def _matrix(self, names, arrays, n, seed, chunk, table):
+        rates = {}
+        for i, a in enumerate(names):
+            for b in names[i + 1:]:
+                result = simulator.simulate(arrays[a], arrays[b], n, seed=seed, chunk=chunk, table=table)
+                rates[a, b] = simulator.win_rate(result)
+                rates[b, a] = 1 - rates[a, b]
+        return rates
+
+    def _print_matrix(self, names, rates):
+        width = max(len(name) for name in names)
+        short = [name[:8] for name in names]
+        self.stdout.write(' ' * (width + 2) + ''.join(f'{s:>10}' for s in short) + f'{"avg":>10}')
+        for a in names:
+            cells = []
+            others = []
+            for b in names:
+                if a == b:
+                    cells.append(f'{"—":>10}')
+                else:
+                    cells.append(f'{rates[a, b] * 100:>9.1f}%')
+                    others.append(rates[a, b])
+            avg = sum(others) / len(others)
+            self.stdout.write(f'{a:<{width}}  ' + ''.join(cells) + f'{avg * 100:>9.1f}%')
+
+    def _print_ability_values(self, names, decks, arrays, rates, n, seed, chunk):
+        abilities = sorted({c.ability for cards in decks.values() for c in cards} - {'none'})
+        for ability in abilities:
+            deltas = []
+            for a in names:
+                if not any(c.ability == ability for c in decks[a]):
+                    continue
+                stripped = simulator.deck_arrays(simulator.without_ability(decks[a], ability))
+                for b in names:
+                    if b == a:
+                        continue
+                    result = simulator.simulate(stripped, arrays[b], n, seed=seed, chunk=chunk)
+                    deltas.append(rates[a, b] - simulator.win_rate(result))
+            if deltas:
+                value = sum(deltas) / len(deltas)
+                self.stdout.write(f'  {ability:<22} {value * 100:+6.2f} pts  ({len(deltas)} pairings)')
@@ -0,0 +1,36 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from s7app import ai_model
+
+
+class Command(BaseCommand):
+    help = (
+        'Train the computer opponent from game_history.csv. By default only rows appended '
+        'since the last checkpoint are learned (extra warm-started trees); --full retrains.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help='Retrain from the whole history.')
+        parser.add_argument('--min-rows', type=int, default=ai_model.MIN_UPDATE_ROWS,
+                            help='Skip the update until this many new rows are available.')
+        parser.add_argument('--trees', type=int, default=ai_model.INCREMENTAL_TREES,
+                            help='Trees added per incremental update.')
+        parser.add_argument('--max-trees', type=int, default=ai_model.MAX_TREES)
+        parser.add_argument('--watch', type=float, default=0,
+                            help='Keep running, checking for new rows every N seconds.')
+
+    def handle(self, *args, **options):
+        if not ai_model.HAS_ML_LIBS:
+            raise CommandError('pandas / numpy / scikit-learn are not installed.')
+        if options['full']:
+            ai_model.train_and_save()
+            return
+
+        while True:
+            status = ai_model.train_incremental(options['min_rows'], options['trees'], options['max_trees'])
+            self.stdout.write(f'🤖 {status}')
+            if options['watch'] <= 0:
+                return
+            time.sleep(options['watch'])
@@ -0,0 +1,227 @@
+"""
+Typed match state for multiplayer games.
+
+The original state was one flat dict with a key per player per round
+(`player1_played_round_{innings}_{round}`, `runs_in_round_*`, `round_snapshot_*`,
+`boost_window_*`, ...). MatchState keeps the match-level fields (scores,
+wickets, toss, boosts, flags) in a plain dict with the same names, and moves
+everything per-round into two fixed arrays of 7 RoundRecords, one per innings.
+
+Serialisation:
+  - to_json()/from_json() — what GameRoom.state stores. Match-level fields stay
+    top-level so JSON lookups like `state__winner` keep working.
+  - dumps()/loads()       — msgpack bytes, what the cache stores.
+
+Both players' decks (card ids and stats) are frozen into `fields['decks']`
+when innings are chosen, so the rest of the match never queries decks and a
+mid-match deck switch or card edit can't change a hand.
+
+from_json() also accepts the old flat dicts and migrates them on read, so rooms
+saved before this change load without a data migration.
+"""
+import re
+
+import msgpack
+
+STATE_VERSION = 2
+ROUNDS_PER_INNINGS = 7
+INNINGS_PER_MATCH = 2
+
+_LEGACY_PLAYED = re.compile(r'^(player[12])_played_round_([12])_(\d+)$')
+_LEGACY_ROUND = re.compile(
+    r'^(runs_in_round|wicket_in_round|round_snapshot|boost_window_open'
+    r'|boost_window_started|round_boost_clicks)_([12])_(\d+)$'
+)
+_LEGACY_ATTR = {
+    'runs_in_round':        'runs',
+    'wicket_in_round':      'wicket',
+    'round_snapshot':       'snapshot',
+    'boost_window_open':    'boost_window_open',
+    'boost_window_started': 'boost_window_started',
+    'round_boost_clicks':   'boost_clicks',
+}
+
+
+class RoundRecord:
+    """Everything recorded about one round of one innings."""
+    __slots__ = (
+        'player1_card', 'player2_card', 'runs', 'wicket', 'snapshot',
+        'boost_window_open', 'boost_window_started', 'boost_clicks',
+    )
+
+    def __init__(self):
+        self.player1_card = None
+        self.player2_card = None
+        self.runs = 0
+        self.wicket = False
+        self.snapshot = None
+        self.boost_window_open = False
+        self.boost_window_started = 0
+        self.boost_clicks = []
+
+    def played(self, role):
+        """Card id `role` played this round, or None."""
+        return self.player1_card if role == 'player1' else self.player2_card
+
+    def set_played(self, role, card_id):
+        if role == 'player1':
+            self.player1_card = card_id
+        else:
+            self.player2_card = card_id
+
+    def is_empty(self):
+        return self.player1_card is None and self.player2_card is None and self.snapshot is None
+
+    def to_list(self):
+        return [
+            self.player1_card, self.player2_card, self.runs, self.wicket, self.snapshot,
+            self.boost_window_open, self.boost_window_started, self.boost_clicks,
+        ]
+
+    @classmethod
+    def from_list(cls, values):
+        rec = cls()
+        (rec.player1_card, rec.player2_card, rec.runs, rec.wicket, rec.snapshot,
+         rec.boost_window_open, rec.boost_window_started, rec.boost_clicks) = values
+        return rec
+
+
+class MatchState:
+    """
+    Match-level fields behave like the old dict (`get`, `[]`, `pop`, `in`);
+    per-round data lives in `rounds[innings - 1][round_number - 1]`.
+
+    `revision` is the store's write counter at the time this state was read;
+    game_cache uses it for compare-and-set and never serialises it.
+    `catalog`, when set, is a get_catalog() snapshot card() reads instead of
+    the shared catalog, so it never does I/O (not serialised either).
+    """
+    __slots__ = ('fields', 'rounds', 'revision', 'catalog')
+
+    def __init__(self, fields=None, rounds=None, revision=0):
+        self.revision = revision
+        self.catalog = None
+        self.fields = fields if fields is not None else {}
+        self.rounds = rounds if rounds is not None else [
+            [RoundRecord() for _ in range(ROUNDS_PER_INNINGS)]
+            for _ in range(INNINGS_PER_MATCH)
+        ]
+        self.fields.setdefault('scores', {'player1': 0, 'player2': 0})
+        self.fields.setdefault('wickets', {'player1': 0, 'player2': 0})
+
+    # ── dict-style access to match-level fields ──────────────
+    def get(self, key, default=None):
+        return self.fields.get(key, default)
+
+    def __getitem__(self, key):
+        return self.fields[key]
+
+    def __setitem__(self, key, value):
+        self.fields[key] = value
+
+    def __contains__(self, key):
+        return key in self.fields
+
+    def pop(self, key, *default):
+        return self.fields.pop(key, *default)
+
+    def setdefault(self, key, default=None):
+        return self.fields.setdefault(key, default)
+
+    # ── rounds ───────────────────────────────────────────────
+    def round(self, innings, round_number):
+        """RoundRecord for (innings, round_number), or None when out of range."""
+        if 1 <= innings <= INNINGS_PER_MATCH and 1 <= round_number <= ROUNDS_PER_INNINGS:
+            return self.rounds[innings - 1][round_number - 1]
+        return None
+
+    def recent_rounds(self, innings, round_number, count=2):
+        """The up-to-`count` rounds played just before `round_number`."""
+        records = []
+        for r in range(round_number - 1, round_number - 1 - count, -1):
+            rec = self.round(innings, r)
+            if rec is not None:
+                records.append(rec)
+        return records
+
+    def innings_rounds(self, innings):
+        return self.rounds[innings - 1]
+
+    # ── frozen decks ─────────────────────────────────────────
+    def set_decks(self, player1_cards, player2_cards):
+        """Freeze both decks (lists from card_catalog.deck_snapshot)."""
+        self.fields['decks'] = {'player1': player1_cards, 'player2': player2_cards}
+
+    def deck(self, role):
+        """`role`'s frozen deck as CardRecords, or None for rooms started before snapshots."""
+        decks = self.fields.get('decks')
+        if not decks:
+            return None
+        from .card_catalog import CardRecord
+        return [CardRecord(*values) for values in decks.get(role, [])]
+
+    def card(self, card_id):
+        """A card's stats as frozen for this match, falling back to the catalog."""
+        from .card_catalog import CardRecord, get_card
+        for cards in (self.fields.get('decks') or {}).values():
+            for values in cards:
+                if values[0] == card_id:
+                    return CardRecord(*values)
+        return get_card(card_id, self.catalog)
+
+    # ── serialisation ────────────────────────────────────────
+    def to_json(self):
+        data = dict(self.fields)
+        data['v'] = STATE_VERSION
+        data['rounds'] = [
+            [None if rec.is_empty() else rec.to_list() for rec in innings]
+            for innings in self.rounds
+        ]
+        return data
+
+    @classmethod
+    def from_json(cls, data):
+        if isinstance(data, cls):
+            return data
+        data = dict(data or {})
+        if data.get('v') != STATE_VERSION:
+            return cls._from_legacy(data)
+
+        data.pop('v')
+        rounds = [
+            [RoundRecord() if values is None else RoundRecord.from_list(values) for values in innings]
+            for innings in data.pop('rounds')
+        ]
+        return cls(data, rounds)
+
+    @classmethod
+    def _from_legacy(cls, data):
+        """Migrate a flat key-per-round dict into a MatchState."""
+        state = cls()
+        for key, value in data.items():
+            m = _LEGACY_PLAYED.match(key)
+            if m:
+                rec = state.round(int(m.group(2)), int(m.group(3)))
+                if rec is not None:
+                    rec.set_played(m.group(1), value)
+                continue
+            m = _LEGACY_ROUND.match(key)
+            if m:
+                rec = state.round(int(m.group(2)), int(m.group(3)))
+                if rec is not None:
+                    setattr(rec, _LEGACY_ATTR[m.group(1)], value)
+                continue
+            state.fields[key] = value
+        return state
+
+
+def dumps(state):
+    """Compact msgpack encoding for the cache."""
+    return msgpack.packb(state.to_json(), use_bin_type=True)
+
+
+def loads(payload):
+    """Inverse of dumps(). Also accepts dicts cached before the msgpack switch."""
+    if isinstance(payload, (bytes, bytearray)):
+        payload = msgpack.unpackb(payload, raw=False, strict_map_key=False)
+    return MatchState.from_json(payload)
@@ -0,0 +1,299 @@
+"""
+Precomputed matchup table: every round outcome over the card catalog.
+
+A round's numbers depend only on the two cards, the round number and a
+handful of yes/no modifiers, so the table holds all of them:
+
+    data[batter row, bowler row, round - 1, modifier] = (eff_batting, eff_bowling, runs, flags)
+
+    modifier = index of (batter boost, bowler boost, batting support,
+                         bowler support: none/pace/spin, recent wicket,
+                         golden arm (30+ runs in last two rounds),
+                         breakthrough (batting side on 60+))
+    flags    = WICKET | TIE | RUNS_CUTTER | BOOST_RESTORED
+
+It is built from engine.resolve, so the two always agree: the ability,
+boost and support bonuses depend only on (batter ability, bowler ability,
+bowler is_spinner, round, modifier) and are worked out once per such
+profile; each card pair then adds its base stats and is scored.
+MatchupTableParityTests in tests.py check lookups against engine.resolve on
+seeded random rounds. The result is saved as a .npy named after a
+fingerprint of the catalog's stats (and TABLE_VERSION) and opened with
+mmap, so every worker shares the pages.
+
+    table = get_table()                 # None without NumPy
+    m = table.lookup(batter_id, bowler_id, round_number, batter_boost=True)
+    table.data[bat_rows, bowl_rows, rounds, mods]   # vectorised gather
+
+get_table() notices when the card catalog has been reloaded (admin edits
+bump the catalog version via signals) and switches to — or builds — the
+table for the new fingerprint. `manage.py build_matchups` builds it ahead
+of time.
+"""
+import fcntl
+import hashlib
+import logging
+import os
+import threading
+import time
+from collections import namedtuple
+
+import msgpack
+from django.conf import settings
+
+from . import engine
+from .card_catalog import get_catalog
+from .match_state import ROUNDS_PER_INNINGS
+
+HAS_NUMPY = True
+try:
+    import numpy as np
+except Exception:
+    HAS_NUMPY = False
+    np = None
+
+logger = logging.getLogger(__name__)
+
+# Bump when engine rules change so old tables are not reused.
+TABLE_VERSION = 1
+
+# (batter boost, bowler boost, batting support, bowler support, recent wicket, golden arm, breakthrough)
+MODIFIER_SHAPE = (2, 2, 2, 3, 2, 2, 2)
+N_MODIFIERS = 192
+BOWLER_SUPPORT = {None: 0, 'pace_support': 1, 'spin_support': 2}
+
+WICKET = 1
+TIE = 2
+RUNS_CUTTER = 4
+BOOST_RESTORED = 8
+
+Matchup = namedtuple('Matchup', [
+    'eff_batting', 'eff_bowling', 'runs', 'wicket', 'tie', 'runs_cutter_active', 'boost_restored',
+])
+
+_Profile = namedtuple('_Profile', ['batting', 'bowling', 'runs', 'ability', 'is_spinner'])
+
+
+def modifier_index(batter_boost=False, bowler_boost=False, batting_support=False,
+                   bowler_support=None, recent_wicket=False, golden_arm=False, breakthrough=False):
+    """Flat modifier index. bowler_support is None, 'pace_support' or 'spin_support'."""
+    return ((((((int(bool(batter_boost)) * 2 + int(bool(bowler_boost))) * 2
+                + int(bool(batting_support))) * 3 + BOWLER_SUPPORT.get(bowler_support, 0)) * 2
+              + int(bool(recent_wicket))) * 2 + int(bool(golden_arm))) * 2 + int(bool(breakthrough)))
+
+
+def modifiers_for(ctx, batter_boost=False, bowler_boost=False, batter_support=None, bowler_support=None):
+    """modifier_index() from an engine.RoundContext and the support dicts MatchState stores."""
+    rn = ctx.round_number
+
+    def active_type(support):
+        if support and support.get('from_round', 0) <= rn <= support.get('until_round', 0):
+            return support.get('type')
+        return None
+
+    bowl_type = active_type(bowler_support)
+    return modifier_index(
+        batter_boost, bowler_boost,
+        active_type(batter_support) == 'batting_support',
+        bowl_type if bowl_type in BOWLER_SUPPORT else None,
+        ctx.recent_wicket, ctx.recent_runs >= 30, ctx.batting_score >= 60,
+    )
+
+
+def fingerprint(catalog):
+    """Stable hash of every stat the rules read, plus TABLE_VERSION."""
+    rows = [
+        (c.id, c.batting, c.bowling, c.runs, c.ability, bool(c.is_spinner))
+        for c in sorted(catalog.values(), key=lambda c: c.id)
+    ]
+    payload = msgpack.packb([TABLE_VERSION, engine.ABILITIES, rows], use_bin_type=True)
+    return hashlib.sha1(payload).hexdigest()[:16]
+
+
+class MatchupTable:
+    def __init__(self, fingerprint, catalog, ids, data):
+        self.fingerprint = fingerprint
+        self.catalog = catalog        # the catalog dict this table was checked against
+        self.ids = ids
+        self.data = data
+        self._rows = {int(card_id): row for row, card_id in enumerate(ids)}
+
+    def row(self, card_id):
+        return self._rows[int(card_id)]
+
+    def rows(self, card_ids):
+        return np.array([self._rows[int(i)] for i in card_ids], dtype=np.int32)
+
+    def covers(self, cards):
+        """True if every card is in the catalog this table was built from, unchanged."""
+        return all(self.catalog.get(c.id) == c for c in cards)
+
+    def lookup(self, batter_id, bowler_id, round_number, **modifiers):
+        entry = self.data[self.row(batter_id), self.row(bowler_id), round_number - 1,
+                          modifier_index(**modifiers)]
+        eff_batting, eff_bowling, runs, flags = (int(v) for v in entry)
+        return Matchup(
+            eff_batting, eff_bowling, runs,
+            bool(flags & WICKET), bool(flags & TIE),
+            bool(flags & RUNS_CUTTER), bool(flags & BOOST_RESTORED),
+        )
+
+
+# ─── building ────────────────────────────────────────────────────────────────
+
+def _profile_bonuses():
+    """
+    For every (batter ability, bowler ability, bowler spinner, round, modifier):
+    the batting bonus, bowling bonus and the cutter/restored flags, via engine.resolve.
+    """
+    n_ab = len(engine.ABILITIES)
+    shape = (n_ab, n_ab, 2, ROUNDS_PER_INNINGS, N_MODIFIERS)
+    bat_bonus = np.zeros(shape, dtype=np.int16)
+    bowl_bonus = np.zeros(shape, dtype=np.int16)
+    flags = np.zeros(shape, dtype=np.uint8)
+
+    mods = [np.unravel_index(m, MODIFIER_SHAPE) for m in range(N_MODIFIERS)]
+    support_names = {v: k for k, v in BOWLER_SUPPORT.items()}
+    for ba, bat_ability in enumerate(engine.ABILITIES):
+        batter = _Profile(0, 0, 0, bat_ability, False)
+        for wa, bowl_ability in enumerate(engine.ABILITIES):
+            for spin in (0, 1):
+                bowler = _Profile(0, 0, 0, bowl_ability, bool(spin))
+                for r in range(ROUNDS_PER_INNINGS):
+                    rn = r + 1
+                    for m, (bb, wb, bs, ws, wkt, golden, brk) in enumerate(mods):
+                        ctx = engine.RoundContext(rn, 60 if brk else 0, 30 if golden else 0, bool(wkt))
+                        window = {'from_round': rn, 'until_round': rn}
+                        o = engine.resolve(
+                            batter, bowler, ctx, bool(bb), bool(wb),
+                            dict(window, type='batting_support') if bs else None,
+                            dict(window, type=support_names[int(ws)]) if ws else None,
+                        )
+                        bat_bonus[ba, wa, spin, r, m] = o.eff_batting
+                        bowl_bonus[ba, wa, spin, r, m] = o.eff_bowling
+                        flags[ba, wa, spin, r, m] = (
+                            (RUNS_CUTTER if o.runs_cutter_active else 0)
+                            | (BOOST_RESTORED if o.boost_restored else 0)
+                        )
+    return bat_bonus, bowl_bonus, flags
+
+
+def build(catalog, path):
+    """Write the table for `catalog` to `path` (.npy). Returns the card ids, by row."""
+    cards = sorted(catalog.values(), key=lambda c: c.id)
+    ids = np.array([c.id for c in cards], dtype=np.int64)
+    batting = np.array([c.batting for c in cards], dtype=np.int16)
+    bowling = np.array([c.bowling for c in cards], dtype=np.int16)
+    runs = np.array([c.runs for c in cards], dtype=np.int16)
+    ability = np.array([engine.ABILITY_CODE.get(c.ability, 0) for c in cards], dtype=np.intp)
+    spinner = np.array([bool(c.is_spinner) for c in cards], dtype=np.intp)
+    n = len(cards)
+
+    bat_bonus, bowl_bonus, profile_flags = _profile_bonuses()
+
+    tmp_path = path + '.part'
+    out = np.lib.format.open_memmap(
+        tmp_path, mode='w+', dtype=np.int16, shape=(n, n, ROUNDS_PER_INNINGS, N_MODIFIERS, 4)
+    )
+    cutter_flag = (profile_flags & RUNS_CUTTER) > 0
+    for i in range(n):   # one batter at a time keeps memory at O(cards)
+        prof = (ability[i], ability, spinner)                  # indexes (bowler,) + (round, mod)
+        eff_bat = batting[i] + bat_bonus[prof]                 # (n, 7, M)
+        eff_bowl = bowling[:, None, None] + bowl_bonus[prof]
+        cutter = cutter_flag[prof]
+        wins = eff_bat > eff_bowl
+        tie = eff_bat == eff_bowl
+        card_runs = int(runs[i])
+        scored = np.where(
+            wins,
+            np.where(cutter, max(0, card_runs - engine.RUNS_CUT), card_runs),
+            np.where(tie, engine.score(0, 0, card_runs).runs, 0),
+        )
+        out[i, ..., 0] = eff_bat
+        out[i, ..., 1] = eff_bowl
+        out[i, ..., 2] = scored
+        out[i, ..., 3] = (
+            profile_flags[prof]
+            | np.where(~wins & ~tie, WICKET, 0)
+            | np.where(tie, TIE, 0)
+        )
+    out.flush()
+    del out
+    np.save(path + '.ids.npy', ids)
+    os.replace(tmp_path, path)
+    return ids
+
+
+# ─── loading ─────────────────────────────────────────────────────────────────
+
+def table_dir():
+    return str(getattr(settings, 'MATCHUP_TABLE_DIR', os.path.join(settings.BASE_DIR, 'matchup_tables')))
+
+
+def table_path(fp):
+    return os.path.join(table_dir(), f'matchups-{fp}.npy')
+
+
+def _open(fp, catalog):
+    path = table_path(fp)
+    data = np.load(path, mmap_mode='r')
+    ids = np.load(path + '.ids.npy')
+    return MatchupTable(fp, catalog, ids, data)
+
+
+def _remove_stale(keep_fp):
+    for name in os.listdir(table_dir()):
+        if name.startswith('matchups-') and keep_fp not in name:
+            try:
+                os.remove(os.path.join(table_dir(), name))
+            except OSError:
+                pass
+
+
+def load_or_build(catalog=None):
+    """The table for `catalog` (default: the current one), building it if missing."""
+    catalog = get_catalog() if catalog is None else catalog
+    fp = fingerprint(catalog)
+    path = table_path(fp)
+    if not os.path.exists(path):
+        os.makedirs(table_dir(), exist_ok=True)
+        # One process builds; the others wait on the lock and then just open it.
+        with open(os.path.join(table_dir(), '.build.lock'), 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            if not os.path.exists(path):
+                _start = time.time()
+                build(catalog, path)
+                print(f"🧮 Matchup table {fp} built for {len(catalog)} cards "
+                      f"in {time.time() - _start:.1f}s")
+                _remove_stale(fp)
+    return _open(fp, catalog)
+
+
+_lock = threading.Lock()
+_table = None
+
+
+def get_table():
+    """Matchup table for the current card catalog, or None if it can't be had."""
+    global _table
+    if not HAS_NUMPY:
+        return None
+    catalog = get_catalog()
+    table = _table
+    if table is not None and table.catalog is catalog:
+        return table
+    with _lock:
+        if _table is not None and _table.catalog is catalog:
+            return _table
+        try:
+            fp = fingerprint(catalog)
+            if _table is not None and _table.fingerprint == fp:
+                # Catalog reloaded but no stat changed (e.g. a name edit).
+                _table.catalog = catalog
+            else:
+                _table = load_or_build(catalog)
+        except Exception as e:
+            logger.warning(f'Matchup table unavailable: {e}')
+            print(f"❌ MATCHUP TABLE UNAVAILABLE: {e}")
+            return None
+        return _table
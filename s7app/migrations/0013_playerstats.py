@@ -0,0 +1,64 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:27
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_stats(apps, schema_editor):
+    """Count every completed room once and give every existing user a stats row."""
+    User = apps.get_model('auth', 'User')
+    GameRoom = apps.get_model('s7app', 'GameRoom')
+    PlayerStats = apps.get_model('s7app', 'PlayerStats')
+
+    totals = {
+        user_id: {'wins': 0, 'losses': 0, 'draws': 0, 'matches': 0}
+        for user_id in User.objects.values_list('id', flat=True)
+    }
+    completed = GameRoom.objects.filter(status='completed')
+    for p1, p2, state in completed.values_list('player1_id', 'player2_id', 'state').iterator():
+        winner = (state or {}).get('winner')
+        if winner not in ('player1', 'player2', 'Tie'):
+            continue
+        for role, user_id in (('player1', p1), ('player2', p2)):
+            if user_id not in totals:
+                continue
+            field = 'draws' if winner == 'Tie' else 'wins' if winner == role else 'losses'
+            totals[user_id][field] += 1
+            totals[user_id]['matches'] += 1
+    PlayerStats.objects.bulk_create(
+        [PlayerStats(user_id=user_id, **counts) for user_id, counts in totals.items()],
+        batch_size=500,
+    )
+    completed.update(stats_recorded=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('s7app', '0012_gameroom_player1_deck_gameroom_player2_deck'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='gameroom',
+            name='stats_recorded',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.CreateModel(
+            name='PlayerStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('wins', models.PositiveIntegerField(default=0)),
+                ('losses', models.PositiveIntegerField(default=0)),
+                ('draws', models.PositiveIntegerField(default=0)),
+                ('matches', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['-wins', 'user'], name='playerstats_rank')],
+            },
+        ),
+        migrations.RunPython(backfill_stats, migrations.RunPython.noop),
+    ]
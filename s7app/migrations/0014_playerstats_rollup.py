@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('s7app', '0013_playerstats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='playerstats',
+            name='deck_usage',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name='playerstats',
+            name='recent',
+            field=models.JSONField(blank=True, default=list),
+        ),
+    ]
@@ -0,0 +1,72 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:30
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('s7app', '0014_playerstats_rollup'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='gameroom',
+            name='completed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='gameroom',
+            name='exit_by',
+            field=models.CharField(blank=True, default='', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='gameroom',
+            name='player1_score',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='gameroom',
+            name='player1_wickets',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='gameroom',
+            name='player2_score',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='gameroom',
+            name='player2_wickets',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='gameroom',
+            name='winner_role',
+            field=models.CharField(blank=True, choices=[('player1', 'Player 1'), ('player2', 'Player 2'), ('Tie', 'Tie')], default='', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='gameroom',
+            name='winner_user',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='rooms_won', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='gameroom',
+            index=models.Index(fields=['status', '-created_at'], name='gameroom_status_created'),
+        ),
+        migrations.AddIndex(
+            model_name='gameroom',
+            index=models.Index(fields=['player1', 'status'], name='gameroom_p1_status'),
+        ),
+        migrations.AddIndex(
+            model_name='gameroom',
+            index=models.Index(fields=['player2', 'status'], name='gameroom_p2_status'),
+        ),
+        migrations.AddIndex(
+            model_name='gameroom',
+            index=models.Index(fields=['-completed_at'], name='gameroom_completed'),
+        ),
+    ]
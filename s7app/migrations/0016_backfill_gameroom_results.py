@@ -0,0 +1,45 @@
+from django.db import migrations
+
+BATCH = 500
+
+
+def backfill_results(apps, schema_editor):
+    """Copy winner/scores/wickets/exit_by out of `state` for every room that has a result."""
+    GameRoom = apps.get_model('s7app', 'GameRoom')
+    rooms = GameRoom.objects.filter(state__has_key='winner').only(
+        'id', 'player1_id', 'player2_id', 'state', 'created_at',
+    )
+    fields = ['winner_role', 'winner_user', 'player1_score', 'player2_score',
+              'player1_wickets', 'player2_wickets', 'exit_by', 'completed_at']
+    pending = []
+    for room in rooms.iterator(chunk_size=BATCH):
+        state = room.state or {}
+        winner = state.get('winner')
+        scores = state.get('scores') or {}
+        wickets = state.get('wickets') or {}
+        room.winner_role = winner if winner in ('player1', 'player2', 'Tie') else ''
+        room.winner_user_id = {'player1': room.player1_id, 'player2': room.player2_id}.get(winner)
+        room.player1_score = scores.get('player1', 0)
+        room.player2_score = scores.get('player2', 0)
+        room.player1_wickets = wickets.get('player1', 0)
+        room.player2_wickets = wickets.get('player2', 0)
+        room.exit_by = state.get('exit_by') or ''
+        # The finish time was never stored; the start time is the closest we have.
+        room.completed_at = room.created_at
+        pending.append(room)
+        if len(pending) >= BATCH:
+            GameRoom.objects.bulk_update(pending, fields)
+            pending = []
+    if pending:
+        GameRoom.objects.bulk_update(pending, fields)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('s7app', '0015_gameroom_result_columns'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_results, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,39 @@
+from django.db import migrations
+
+from s7app.stats import RESULTS, ROLLUP_FIELDS, fold_rooms
+
+BATCH = 500
+
+
+def fold_history(apps, schema_editor):
+    """
+    0014 added deck_usage and recent empty. Rebuild every row from the rooms
+    already counted, so profiles show them straight after the deploy.
+    """
+    User = apps.get_model('auth', 'User')
+    GameRoom = apps.get_model('s7app', 'GameRoom')
+    PlayerStats = apps.get_model('s7app', 'PlayerStats')
+
+    rows = {user_id: PlayerStats(user_id=user_id) for user_id in User.objects.values_list('id', flat=True)}
+    rooms = (
+        GameRoom.objects.filter(stats_recorded=True, winner_role__in=RESULTS)
+        .select_related('player1', 'player2', 'player1_deck__team', 'player2_deck__team')
+        .defer('state')
+        .order_by('created_at', 'id')   # oldest first, so `recent` ends newest first
+    )
+    fold_rooms(rows, rooms.iterator(chunk_size=BATCH))
+    PlayerStats.objects.bulk_create(
+        list(rows.values()), batch_size=BATCH,
+        update_conflicts=True, unique_fields=['user'], update_fields=ROLLUP_FIELDS,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('s7app', '0016_backfill_gameroom_results'),
+    ]
+
+    operations = [
+        migrations.RunPython(fold_history, migrations.RunPython.noop),
+    ]
@@ -1,5 +1,6 @@
 from django.db import models
 from django.contrib.auth.models import User
+from django.utils import timezone
 
 
 class SupportCard(models.Model):
@@ -76,6 +77,11 @@ class GameRoom(models.Model):
         ('live', 'Live Match'),
         ('completed', 'Completed'),
     ]
+    RESULT_CHOICES = [
+        ('player1', 'Player 1'),
+        ('player2', 'Player 2'),
+        ('Tie', 'Tie'),
+    ]
     
     code = models.CharField(max_length=8, unique=True)
     player1 = models.ForeignKey(User, related_name='rooms_as_p1', on_delete=models.CASCADE)
@@ -89,6 +95,68 @@ class GameRoom(models.Model):
                                       related_name='used_as_p1', on_delete=models.SET_NULL)
     player2_deck = models.ForeignKey('UserDeck', null=True, blank=True, 
                                       related_name='used_as_p2', on_delete=models.SET_NULL)
+    # Set once the result is counted in PlayerStats (s7app/stats.py)
+    stats_recorded = models.BooleanField(default=False)
+
+    # Final result, copied out of `state` by record_result() when the match finishes
+    winner_role     = models.CharField(max_length=10, choices=RESULT_CHOICES, blank=True, default='')
+    winner_user     = models.ForeignKey(User, null=True, blank=True, related_name='rooms_won',
+                                        on_delete=models.SET_NULL)
+    player1_score   = models.PositiveIntegerField(null=True, blank=True)
+    player2_score   = models.PositiveIntegerField(null=True, blank=True)
+    player1_wickets = models.PositiveIntegerField(null=True, blank=True)
+    player2_wickets = models.PositiveIntegerField(null=True, blank=True)
+    exit_by         = models.CharField(max_length=10, blank=True, default='')
+    completed_at    = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # watch page lists, newest first
+            models.Index(fields=['status', '-created_at'], name='gameroom_status_created'),
+            # a player's finished matches
+            models.Index(fields=['player1', 'status'], name='gameroom_p1_status'),
+            models.Index(fields=['player2', 'status'], name='gameroom_p2_status'),
+            models.Index(fields=['-completed_at'], name='gameroom_completed'),
+        ]
+
+    RESULT_FIELDS = ['winner_role', 'winner_user', 'player1_score', 'player2_score',
+                     'player1_wickets', 'player2_wickets', 'exit_by', 'completed_at']
+
+    def record_result(self, state):
+        """Copy the finished match's result out of `state` into RESULT_FIELDS (not saved)."""
+        winner = state.get('winner')
+        scores = state.get('scores') or {}
+        wickets = state.get('wickets') or {}
+        self.winner_role = winner if winner in ('player1', 'player2', 'Tie') else ''
+        self.winner_user_id = {'player1': self.player1_id, 'player2': self.player2_id}.get(winner)
+        self.player1_score = scores.get('player1', 0)
+        self.player2_score = scores.get('player2', 0)
+        self.player1_wickets = wickets.get('player1', 0)
+        self.player2_wickets = wickets.get('player2', 0)
+        self.exit_by = state.get('exit_by') or ''
+        if self.completed_at is None:
+            self.completed_at = timezone.now()
+
+
+class PlayerStats(models.Model):
+    """Per-user match rollup, updated once per completed match by stats.finalize_match."""
+    user       = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='stats')
+    wins       = models.PositiveIntegerField(default=0)
+    losses     = models.PositiveIntegerField(default=0)
+    draws      = models.PositiveIntegerField(default=0)
+    matches    = models.PositiveIntegerField(default=0)
+    deck_usage = models.JSONField(default=dict, blank=True)   # {team name: matches played with it}
+    recent     = models.JSONField(default=list, blank=True)   # newest first, see stats.match_summary
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # leaderboard order, and the rank count for one user
+            models.Index(fields=['-wins', 'user'], name='playerstats_rank'),
+        ]
+
+    def __str__(self):
+        return f"{self.user.username}: {self.wins}W {self.losses}L {self.draws}D"
 
 class UserDeck(models.Model):
     """A user owns exactly 2 decks. One is chosen as active before a match."""
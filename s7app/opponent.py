@@ -0,0 +1,237 @@
+"""
+Lookahead opponent for single-player mode.
+
+game_start's computer sees the player's card and answers it. Instead of a
+greedy pick, choose_card() plays the rest of the match out many times for
+every card it could answer with and keeps the one that wins most often:
+
+    pick = choose_card(innings, round_number, batting_first, used_by_player,
+                       used_by_computer, scores, player_card_id, candidate_ids)
+    pick.card_id, pick.win_rate
+
+Rollouts use game_start's rules (batting > bowling scores the batter's
+runs, otherwise a wicket; 7 rounds per innings, fresh hands for the second
+innings, higher total wins). In them the player plays random unused cards
+and the computer plays greedily (best batting + runs when batting, best
+bowling when bowling). Every candidate is scored against the same random
+player sequences, in NumPy batches; candidates that are clearly behind stop
+getting rollouts. Equal win rates (a random player rarely beats the full
+catalog) are split by the average winning margin.
+
+The search stops when its time budget (AI_SEARCH_BUDGET_MS) would be
+exceeded by one more batch, so a move costs at most the budget plus one
+small first batch. Rollout counts are kept in a per-process transposition
+cache keyed on the used-card sets and scores, so a position this worker has
+seen before (a resubmitted form, a reload) starts from what it already
+learned. Other workers keep their own.
+"""
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+HAS_NUMPY = True
+try:
+    import numpy as np
+except Exception:
+    HAS_NUMPY = False
+    np = None
+
+from django.conf import settings
+
+from .card_catalog import get_catalog
+from .match_state import ROUNDS_PER_INNINGS
+
+DEFAULT_BUDGET_MS = 50
+BATCH = 128                 # rollouts per candidate per step
+MAX_ROLLOUTS = 8192         # per candidate; enough to separate anything that matters
+CACHE_SIZE = 2048
+
+SearchResult = namedtuple('SearchResult', ['card_id', 'win_rate', 'rollouts', 'elapsed_ms'])
+
+_Arrays = namedtuple('_Arrays', ['catalog', 'index', 'batting', 'bowling', 'runs'])
+
+_arrays_lock = threading.Lock()
+_arrays = None
+
+_cache_lock = threading.Lock()
+_cache = OrderedDict()      # this process only: position key -> (wins, margins, rollouts) per candidate
+
+
+def _card_arrays():
+    global _arrays
+    catalog = get_catalog()
+    arrays = _arrays
+    if arrays is not None and arrays.catalog is catalog:
+        return arrays
+    with _arrays_lock:
+        if _arrays is None or _arrays.catalog is not catalog:
+            cards = sorted(catalog.values(), key=lambda c: c.id)
+            _arrays = _Arrays(
+                catalog,
+                {c.id: row for row, c in enumerate(cards)},
+                np.array([c.batting for c in cards], dtype=np.int32),
+                np.array([c.bowling for c in cards], dtype=np.int32),
+                np.array([c.runs for c in cards], dtype=np.int32),
+            )
+            with _cache_lock:
+                _cache.clear()   # stats changed, old rollouts mean nothing
+        return _arrays
+
+
+def budget_ms():
+    return getattr(settings, 'AI_SEARCH_BUDGET_MS', DEFAULT_BUDGET_MS)
+
+
+# ── rollouts ────────────────────────────────────────────────────────────────
+
+def _greedy(a, rows, batting):
+    """Rows in the order the greedy computer plays them."""
+    key = a.batting[rows] + a.runs[rows] if batting else a.bowling[rows]
+    return rows[np.argsort(-key, kind='stable')]
+
+
+def _random_sequences(rng, rows, k, length):
+    """(k, length) random distinct picks from rows."""
+    if length <= 0 or len(rows) == 0:
+        return np.empty((k, 0), dtype=np.intp)
+    order = rng.random((k, len(rows))).argsort(axis=1)[:, :length]
+    return rows[order]
+
+
+def _innings_runs(a, bat_rows, bowl_rows):
+    """Runs from batter rows against bowler rows, summed over the last axis (broadcasts)."""
+    return np.where(a.batting[bat_rows] > a.bowling[bowl_rows], a.runs[bat_rows], 0).sum(axis=-1)
+
+
+class _Position:
+    """Everything a rollout needs that does not change between batches."""
+
+    def __init__(self, a, innings, round_number, batting_first, used_by_player, used_by_computer,
+                 scores, player_card_id, candidates):
+        self.a = a
+        self.innings = innings
+        self.batting_first = batting_first
+        self.computer_bats = (batting_first if innings == 1 else
+                              'computer' if batting_first == 'player' else 'player') == 'computer'
+        self.player_row = a.index[player_card_id]
+        self.cand_rows = np.array([a.index[c] for c in candidates], dtype=np.intp)
+        self.scores = (scores.get('player', 0), scores.get('computer', 0))
+
+        all_rows = np.arange(len(a.batting))
+        used_p = {a.index[i] for i in used_by_player if i in a.index} | {self.player_row}
+        used_c = {a.index[i] for i in used_by_computer if i in a.index}
+        self.player_left = np.array([r for r in all_rows if r not in used_p], dtype=np.intp)
+        computer_left = np.array([r for r in all_rows if r not in used_c], dtype=np.intp)
+        self.rounds_left = max(0, min(ROUNDS_PER_INNINGS - round_number,
+                                      len(self.player_left), len(computer_left) - 1))
+
+        # The computer's greedy sequence for the rest of this innings, per candidate.
+        order = _greedy(a, computer_left, self.computer_bats)
+        self.computer_seqs = np.array(
+            [order[order != c][:self.rounds_left] for c in self.cand_rows], dtype=np.intp,
+        ).reshape(len(self.cand_rows), self.rounds_left)
+
+        if innings == 1:
+            # Second innings: fresh hands, the other side bats, the computer plays greedily.
+            self.all_rows = all_rows
+            self.second_computer = _greedy(a, all_rows, not self.computer_bats)[:ROUNDS_PER_INNINGS]
+
+    def rollouts(self, rng, active, k):
+        """(results, margins), both (len(active), k): 1 win / 0.5 tie / 0 loss, and computer - player runs."""
+        a = self.a
+        cand = self.cand_rows[active]
+        comp_seq = self.computer_seqs[active][:, None, :]                          # (C, 1, r)
+        player_seq = _random_sequences(rng, self.player_left, k, self.rounds_left)[None]   # (1, k, r)
+
+        player_score = np.full((len(cand), k), self.scores[0], dtype=np.int64)
+        computer_score = np.full((len(cand), k), self.scores[1], dtype=np.int64)
+        p = self.player_row
+        if self.computer_bats:
+            computer_score += np.where(a.batting[cand] > a.bowling[p], a.runs[cand], 0)[:, None]
+            computer_score += _innings_runs(a, comp_seq, player_seq)
+        else:
+            player_score += np.where(a.batting[p] > a.bowling[cand], a.runs[p], 0)[:, None]
+            player_score += _innings_runs(a, player_seq, comp_seq)
+
+        if self.innings == 1:
+            second = _random_sequences(rng, self.all_rows, k, len(self.second_computer))     # (k, 7)
+            if self.computer_bats:
+                player_score += _innings_runs(a, second, self.second_computer[None, :])[None]
+            else:
+                computer_score += _innings_runs(a, self.second_computer[None, :], second)[None]
+
+        margin = computer_score - player_score
+        return np.where(margin > 0, 1.0, np.where(margin == 0, 0.5, 0.0)), margin
+
+
+# ── search ──────────────────────────────────────────────────────────────────
+
+def _best(wins, margins, n):
+    """Index of the highest win rate, ties broken by margin."""
+    n = np.maximum(n, 1)
+    return int(np.lexsort((margins / n, wins / n))[-1])
+
+
+def _contenders(wins, margins, n):
+    """Candidates whose upper bound still reaches the leader's lower bound."""
+    mean = wins / np.maximum(n, 1)
+    se = np.sqrt(np.maximum(mean * (1 - mean), 0.0625) / np.maximum(n, 1))
+    best = _best(wins, margins, n)
+    return np.flatnonzero(mean + 2 * se >= mean[best] - 2 * se[best])
+
+
+def choose_card(innings, round_number, batting_first, used_by_player, used_by_computer, scores,
+                player_card_id, candidate_ids, budget=None, seed=None):
+    """
+    Best answer to `player_card_id` from `candidate_ids`, as a SearchResult,
+    or None if NumPy is missing or the cards are unknown. `budget` is in ms
+    (default AI_SEARCH_BUDGET_MS).
+    """
+    if not HAS_NUMPY:
+        return None
+    _start = time.perf_counter()
+    budget = budget_ms() if budget is None else budget
+    deadline = _start + budget / 1000.0
+
+    a = _card_arrays()
+    candidates = sorted({int(i) for i in candidate_ids if int(i) in a.index})
+    if int(player_card_id) not in a.index or not candidates:
+        return None
+    if len(candidates) == 1:
+        return SearchResult(candidates[0], None, 0, 0.0)
+
+    key = (innings, round_number, batting_first, frozenset(used_by_player), frozenset(used_by_computer),
+           scores.get('player', 0), scores.get('computer', 0), int(player_card_id), tuple(candidates))
+    with _cache_lock:
+        cached = _cache.get(key)
+        if cached is not None:
+            _cache.move_to_end(key)
+    if cached:
+        wins, margins, n = (x.copy() for x in cached)
+    else:
+        wins, margins, n = np.zeros(len(candidates)), np.zeros(len(candidates)), np.zeros(len(candidates))
+
+    position = _Position(a, innings, round_number, batting_first, used_by_player, used_by_computer,
+                         scores, int(player_card_id), candidates)
+    rng = np.random.default_rng(seed)
+    active = _contenders(wins, margins, n) if n.any() else np.arange(len(candidates))
+    while len(active) > 1 and n[active].min() < MAX_ROLLOUTS:
+        step_start = time.perf_counter()
+        results, margin = position.rollouts(rng, active, BATCH)
+        wins[active] += results.sum(axis=1)
+        margins[active] += margin.sum(axis=1)
+        n[active] += BATCH
+        active = _contenders(wins, margins, n)
+        now = time.perf_counter()
+        if now + (now - step_start) > deadline:
+            break
+
+    with _cache_lock:
+        _cache[key] = (wins, margins, n)
+        _cache.move_to_end(key)
+        while len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+
+    best = _best(wins, margins, n)
+    return SearchResult(candidates[best], float(wins[best] / max(n[best], 1)), int(n.sum()),
+                        (time.perf_counter() - _start) * 1000)
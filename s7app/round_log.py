@@ -0,0 +1,213 @@
+"""
+Append-only log of single-player rounds: s7app/game_history.csv.
+
+    round_log.append({'round_number': 3, 'player_card_id': 7, ...})   # one write
+    round_log.tail(10)                      # last rows, read backwards from EOF
+    follower = round_log.Follower()
+    rows, reset = follower.poll()           # only rows appended since last poll
+
+The file stays a CSV because ai_model trains from it by byte offset. The
+header is checked (and repaired by ensure_header) once per file per
+process, not once per round; a rewrite replaces the file, so appenders and
+followers notice the new inode. Appends are a single O_APPEND write, so
+rows from several workers never interleave.
+
+complete_end() and line_anchor() are shared with ai_model's training
+checkpoints: a reader stops at the last complete line, and a hash of the
+line before its offset tells it whether the file was rewritten since.
+"""
+import csv
+import hashlib
+import io
+import os
+import threading
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+HISTORY_FILE = os.path.join(BASE_DIR, 'game_history.csv')
+
+FIELDS = [
+    'round_number', 'player_card_id', 'player_name', 'computer_card_id', 'computer_name',
+    'outcome', 'score', 'wickets', 'batting_team', 'innings', 'round_timestamp',
+]
+
+_BLOCK = 64 * 1024
+
+_lock = threading.Lock()
+_checked = None     # (st_dev, st_ino) of the file whose header was last checked
+_header = FIELDS    # that file's column order
+
+
+def _identity(st):
+    return (st.st_dev, st.st_ino)
+
+
+def complete_end(f):
+    """Offset just past the last newline in `f`: a line still being written is left out."""
+    pos = os.fstat(f.fileno()).st_size
+    while pos > 0:
+        step = min(_BLOCK, pos)
+        f.seek(pos - step)
+        i = f.read(step).rfind(b'\n')
+        if i >= 0:
+            return pos - step + i + 1
+        pos -= step
+    return 0
+
+
+def line_anchor(f, offset):
+    """sha1 of the line ending at `offset` (None at the start of the file)."""
+    if offset <= 0:
+        return None
+    pos = max(0, offset - 4096)
+    f.seek(pos)
+    block = f.read(offset - pos)
+    line = block[block.rfind(b'\n', 0, len(block) - 1) + 1:]
+    return hashlib.sha1(line).hexdigest()
+
+
+def _write_rows(rows, header):
+    tmp = HISTORY_FILE + '.tmp'
+    with open(tmp, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=header)
+        writer.writeheader()
+        for row in rows:
+            writer.writerow(row)
+    os.replace(tmp, HISTORY_FILE)
+
+
+def ensure_header():
+    """
+    Make sure HISTORY_FILE exists with every FIELDS column; remap an old
+    header (timestamp/timestamp1 → round_timestamp) by rewriting the file.
+    Returns the file's column order.
+    """
+    if not os.path.exists(HISTORY_FILE):
+        _write_rows([], FIELDS)
+        return FIELDS
+
+    try:
+        with open(HISTORY_FILE, newline='', encoding='utf-8') as f:
+            existing_header = next(csv.reader(f), [])
+    except Exception:
+        existing_header = []
+
+    if not existing_header:
+        _write_rows([], FIELDS)
+        return FIELDS
+    # if desired header is already present (subset), nothing to do
+    if set(FIELDS).issubset(existing_header):
+        return existing_header
+
+    try:
+        with open(HISTORY_FILE, newline='', encoding='utf-8') as f:
+            old_rows = list(csv.DictReader(f))
+    except Exception:
+        old_rows = []
+
+    new_rows = []
+    for r in old_rows:
+        new_r = {k: r.get(k, '') or '' for k in FIELDS}
+        # common mappings: 'timestamp' or 'timestamp1' => 'round_timestamp'
+        if not new_r['round_timestamp']:
+            new_r['round_timestamp'] = r.get('timestamp') or r.get('timestamp1') or ''
+        new_rows.append(new_r)
+    try:
+        _write_rows(new_rows, FIELDS)
+    except Exception:
+        # last-resort: start over with just the header
+        _write_rows([], FIELDS)
+    return FIELDS
+
+
+def _current_header():
+    """The header to write rows with, checking the file only when it is new to this process."""
+    global _checked, _header
+    try:
+        identity = _identity(os.stat(HISTORY_FILE))
+    except OSError:
+        identity = None
+    if identity is not None and identity == _checked:
+        return _header
+    _header = ensure_header()
+    _checked = _identity(os.stat(HISTORY_FILE))
+    return _header
+
+
+def append(row):
+    """Append one round (a dict keyed by FIELDS) with a single write."""
+    with _lock:
+        header = _current_header()
+        buf = io.StringIO()
+        csv.DictWriter(buf, fieldnames=header, extrasaction='ignore').writerow(
+            {k: '' if v is None else v for k, v in row.items()}
+        )
+        fd = os.open(HISTORY_FILE, os.O_WRONLY | os.O_APPEND)
+        try:
+            os.write(fd, buf.getvalue().encode('utf-8'))
+        finally:
+            os.close(fd)
+
+
+def tail(n=10):
+    """The last `n` rows as dicts, oldest first, reading only the end of the file."""
+    if n <= 0 or not os.path.exists(HISTORY_FILE):
+        return []
+    with open(HISTORY_FILE, 'rb') as f:
+        header_line = f.readline()
+        end = complete_end(f)
+        pos, data = end, b''
+        while pos > 0 and data.count(b'\n') <= n:
+            step = min(_BLOCK, pos)
+            pos -= step
+            f.seek(pos)
+            data = f.read(step) + data
+    lines = data.split(b'\n')[:-1]          # data ends with the last complete line's newline
+    if pos == 0:
+        lines = lines[1:]                   # the header
+    lines = lines[-n:]
+    header = next(csv.reader([header_line.decode('utf-8')]), [])
+    text = io.StringIO(b'\n'.join(lines).decode('utf-8'))
+    return list(csv.DictReader(text, fieldnames=header)) if lines else []
+
+
+class Follower:
+    """
+    Reads the rows appended since its last poll(). If the file was replaced
+    or rewritten in the meantime it starts over from the top and says so,
+    so incremental aggregates can reset.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or HISTORY_FILE
+        self._lock = threading.Lock()
+        self._identity = None
+        self._offset = 0
+        self._anchor = None
+
+    def poll(self):
+        """(rows since the last poll as dicts, reset) — reset means start the aggregates over."""
+        with self._lock:
+            if not os.path.exists(self.path):
+                reset = self._offset > 0
+                self._identity, self._offset, self._anchor = None, 0, None
+                return [], reset
+            with open(self.path, 'rb') as f:
+                identity = _identity(os.fstat(f.fileno()))
+                end = complete_end(f)
+                reset = (identity != self._identity or end < self._offset
+                         or line_anchor(f, self._offset) != self._anchor)
+                start = 0 if reset else self._offset
+                reset = reset and self._identity is not None
+                f.seek(0)
+                header_line = f.readline()
+                if start == 0:
+                    start = min(len(header_line), end)
+                f.seek(start)
+                data = f.read(end - start)
+                anchor = line_anchor(f, end)
+            self._identity, self._offset, self._anchor = identity, end, anchor
+
+        if not data:
+            return [], reset
+        header = next(csv.reader([header_line.decode('utf-8')]), [])
+        return list(csv.DictReader(io.StringIO(data.decode('utf-8')), fieldnames=header)), reset
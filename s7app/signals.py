@@ -0,0 +1,22 @@
+from django.contrib.auth.models import User
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import card_catalog
+from .models import PlayerCard, PlayerStats, Team
+
+
+@receiver(post_save, sender=PlayerCard)
+@receiver(post_delete, sender=PlayerCard)
+@receiver(post_save, sender=Team)
+@receiver(post_delete, sender=Team)
+def invalidate_card_catalog(sender, **kwargs):
+    """Card stats or team membership changed — workers must reload the catalog."""
+    card_catalog.invalidate()
+
+
+@receiver(post_save, sender=User)
+def create_player_stats(sender, instance, created, raw=False, **kwargs):
+    """Every account is on the leaderboard from the start, with zero wins."""
+    if created and not raw:
+        PlayerStats.objects.get_or_create(user=instance)
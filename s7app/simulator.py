@@ -0,0 +1,282 @@
+"""
+Vectorised match simulator for balance questions.
+
+Plays N whole matches between two decks at once, one NumPy array per
+quantity (score, wickets, last two rounds, boost/support schedule), using
+the same rules as engine.resolve: abilities, pre-round boosts (including
+Spin Basher handing the boost back), support windows, the tie partial-runs
+rule, Runs Cutter and the second innings stopping as soon as the target is
+reached.
+
+    result = simulate(deck_arrays(cards_a), deck_arrays(cards_b), 1_000_000, seed=7)
+    win_rate(result), result.ties / result.n
+
+Players are random but legal: each innings every player plays 7 distinct
+cards from their deck in random order, bats/bowls first on a coin flip,
+fires their one boost on a random round of the match and their one support
+on a random round (Batting Support when batting, Pace or Spin when bowling).
+Post-round boosts need a human reacting to the result and are not modelled.
+
+`draw_plan()` makes those random choices up front, so a plan can be replayed
+through engine.resolve match by match to check the two agree; the
+SimulatorParityTests in tests.py do exactly that on fixed seeds.
+
+Given a matchups.MatchupTable, deck_arrays() records each card's table row
+and play() scores rounds between such decks with one gather from the table
+instead of the ability/boost/support arithmetic.
+"""
+from collections import namedtuple
+
+HAS_NUMPY = True
+try:
+    import numpy as np
+except Exception:
+    HAS_NUMPY = False
+    np = None
+
+from . import engine, matchups
+from .engine import ABILITY_CODE
+from .match_state import INNINGS_PER_MATCH, ROUNDS_PER_INNINGS
+
+# support type codes in a plan
+SUPPORT_TYPES = [None, 'batting_support', 'pace_support', 'spin_support']
+SUPPORT_ROUNDS = 4          # from_round .. from_round + 3
+TOTAL_ROUNDS = INNINGS_PER_MATCH * ROUNDS_PER_INNINGS
+
+DEFAULT_CHUNK = 250_000     # matches per batch; bounds peak memory
+
+# rows: each card's row in a matchup table (None when not from the table's catalog)
+DeckArrays = namedtuple('DeckArrays', ['batting', 'bowling', 'runs', 'ability', 'spinner', 'rows'],
+                        defaults=(None,))
+
+# Random choices for n matches. orders: [innings][player] -> (n, 7) card indices.
+# boost_round / support_round: (2, n) global round index 0..13 (-1 = never).
+# support_pick: (2, n) 0 = pace, 1 = spin, used if that player is bowling.
+Plan = namedtuple('Plan', ['n', 'a_bats_first', 'orders', 'boost_round', 'support_round', 'support_pick'])
+
+SimResult = namedtuple('SimResult', ['n', 'wins_a', 'wins_b', 'ties', 'score_a', 'score_b'])
+
+
+def _ensure_numpy():
+    if not HAS_NUMPY:
+        raise RuntimeError("NumPy is not available: install numpy to run simulations")
+
+
+def deck_arrays(cards, table=None):
+    """Stat arrays for a deck (CardRecords/PlayerCards), in the given order."""
+    _ensure_numpy()
+    if len(cards) < ROUNDS_PER_INNINGS:
+        raise ValueError(f'A deck needs at least {ROUNDS_PER_INNINGS} cards, got {len(cards)}')
+    return DeckArrays(
+        batting=np.array([c.batting for c in cards], dtype=np.int32),
+        bowling=np.array([c.bowling for c in cards], dtype=np.int32),
+        runs=np.array([c.runs for c in cards], dtype=np.int32),
+        ability=np.array([ABILITY_CODE.get(c.ability, 0) for c in cards], dtype=np.int8),
+        spinner=np.array([bool(c.is_spinner) for c in cards], dtype=bool),
+        rows=table.rows([c.id for c in cards]) if table is not None and table.covers(cards) else None,
+    )
+
+
+def draw_plan(deck_a, deck_b, n, rng):
+    """Every random decision for n matches between deck_a and deck_b."""
+    _ensure_numpy()
+    sizes = (len(deck_a.batting), len(deck_b.batting))
+    orders = [
+        [np.argsort(rng.random((n, size)), axis=1)[:, :ROUNDS_PER_INNINGS] for size in sizes]
+        for _ in range(INNINGS_PER_MATCH)
+    ]
+    return Plan(
+        n=n,
+        a_bats_first=rng.random(n) < 0.5,
+        orders=orders,
+        boost_round=rng.integers(0, TOTAL_ROUNDS, size=(2, n)),
+        support_round=rng.integers(0, TOTAL_ROUNDS, size=(2, n)),
+        support_pick=rng.integers(0, 2, size=(2, n)),
+    )
+
+
+def _score_round(side, rn, prev_wkt, recent_runs, batting_score, bat_boost, bowl_boost, bat_sup, bowl_sup):
+    """engine.resolve for a whole array of rounds: (runs, wicket, boost restored)."""
+    B = engine.ABILITY_BONUS
+    code = ABILITY_CODE
+
+    bat_batting, _ = side('batting')
+    _, bowl_bowling = side('bowling')
+    bat_runs, _ = side('runs')
+    bat_ab, bowl_ab = side('ability')
+    _, bowl_spin = side('spinner')
+
+    batting = bat_batting.copy()
+    bowling = bowl_bowling.copy()
+
+    spin_basher = (bat_ab == code['spin_basher']) & bowl_spin
+    batting += B * (
+        ((bat_ab == code['opener']) & (rn <= 2))
+        | ((bat_ab == code['finisher']) & (rn >= 6))
+        | ((bat_ab == code['mid_over_hitter']) & (3 <= rn <= 5))
+    )
+    batting += B * spin_basher
+    batting += B * ((bat_ab == code['saviour']) & (prev_wkt[0] | prev_wkt[1]))
+
+    bowling += B * (
+        ((bowl_ab == code['powerplay_specialist']) & (rn <= 2))
+        | ((bowl_ab == code['death_specialist']) & (rn >= 6))
+        | ((bowl_ab == code['mid_over_specialist']) & (3 <= rn <= 5))
+    )
+    bowling += B * ((bowl_ab == code['golden_arm']) & (recent_runs >= 30))
+    bowling += B * ((bowl_ab == code['breakthrough']) & (batting_score >= 60))
+
+    runs_cutter = (bowl_ab == code['runs_cutter']) & (bat_ab != code['spin_basher'])
+
+    # ── boosts ──
+    batting += engine.BOOST_BONUS * (bat_boost & ~spin_basher)
+    bowling += engine.BOOST_BONUS * bowl_boost
+
+    # ── supports ──
+    batting += engine.SUPPORT_BONUS * (bat_sup == 1)
+    bowling += engine.SUPPORT_BONUS * (((bowl_sup == 2) & ~bowl_spin) | ((bowl_sup == 3) & bowl_spin))
+
+    # ── score (engine.score) ──
+    wins = batting > bowling
+    tie = batting == bowling
+    runs = np.where(runs_cutter, np.maximum(0, bat_runs - engine.RUNS_CUT), bat_runs)
+    runs = np.where(wins, runs, np.where(tie, np.floor(bat_runs / 3 + 0.5).astype(np.int32), 0))
+    return runs, ~wins & ~tie, bat_boost & spin_basher
+
+
+def _table_round(table, side, r, prev_wkt, recent_runs, batting_score, bat_boost, bowl_boost, bat_sup, bowl_sup):
+    """The same as _score_round, read from a matchup table."""
+    bat_row, bowl_row = side('rows')
+    mod = np.ravel_multi_index((
+        bat_boost.astype(np.intp), bowl_boost.astype(np.intp), (bat_sup == 1).astype(np.intp),
+        np.maximum(bowl_sup - 1, 0), (prev_wkt[0] | prev_wkt[1]).astype(np.intp),
+        (recent_runs >= 30).astype(np.intp), (batting_score >= 60).astype(np.intp),
+    ), matchups.MODIFIER_SHAPE)
+    entry = table.data[bat_row, bowl_row, r, mod]
+    flags = entry[:, 3]
+    return (
+        entry[:, 2].astype(np.int32),
+        (flags & matchups.WICKET) > 0,
+        (flags & matchups.BOOST_RESTORED) > 0,
+    )
+
+
+def play(deck_a, deck_b, plan, table=None):
+    """
+    Play out a plan. Returns SimResult (score_a/score_b are per-match arrays).
+    With a matchup table, decks that have table rows are scored by lookup.
+    """
+    _ensure_numpy()
+    if deck_a.rows is None or deck_b.rows is None:
+        table = None
+    n = plan.n
+    scores = np.zeros((2, n), dtype=np.int32)
+    wickets = np.zeros((2, n), dtype=np.int32)
+    boost_round = plan.boost_round.copy()     # moves on when Spin Basher hands a boost back
+    target = None
+    a_batting = plan.a_bats_first
+
+    for innings in range(1, INNINGS_PER_MATCH + 1):
+        if innings == 2:
+            target = np.where(plan.a_bats_first, scores[0], scores[1]) + 1
+            a_batting = ~plan.a_bats_first
+        bat_idx = np.where(a_batting, 0, 1)
+        bowl_idx = 1 - bat_idx
+        rows = np.arange(n)
+
+        # Support windows opening this innings, by player
+        first_global = (innings - 1) * ROUNDS_PER_INNINGS
+        sup_from = plan.support_round - first_global + 1     # round number, may be out of range
+        sup_here = (sup_from >= 1) & (sup_from <= ROUNDS_PER_INNINGS)
+        player_bats = np.stack([a_batting, ~a_batting])
+        # batting_support while batting; pace/spin (random) while bowling
+        sup_type = np.where(player_bats, 1, 2 + plan.support_pick)
+        sup_type = np.where(sup_here, sup_type, 0)
+
+        live = np.ones(n, dtype=bool)
+        prev_runs = [np.zeros(n, dtype=np.int32), np.zeros(n, dtype=np.int32)]
+        prev_wkt = [np.zeros(n, dtype=bool), np.zeros(n, dtype=bool)]
+
+        for r in range(ROUNDS_PER_INNINGS):
+            rn = r + 1
+            g = first_global + r
+            ca = plan.orders[innings - 1][0][:, r]
+            cb = plan.orders[innings - 1][1][:, r]
+
+            def side(field):
+                a = getattr(deck_a, field)[ca]
+                b = getattr(deck_b, field)[cb]
+                return np.where(a_batting, a, b), np.where(a_batting, b, a)
+
+            recent_runs = prev_runs[0] + prev_runs[1]
+            batting_score = scores[bat_idx, rows]
+            boosting = boost_round == g                   # (2, n) by player
+            bat_boost = boosting[bat_idx, rows]
+            bowl_boost = boosting[bowl_idx, rows]
+            in_window = (sup_from <= rn) & (rn < sup_from + SUPPORT_ROUNDS)
+            active_type = np.where(in_window, sup_type, 0)
+            bat_sup = active_type[bat_idx, rows]
+            bowl_sup = active_type[bowl_idx, rows]
+
+            if table is not None:
+                runs, wicket, restored = _table_round(
+                    table, side, r, prev_wkt, recent_runs, batting_score,
+                    bat_boost, bowl_boost, bat_sup, bowl_sup,
+                )
+            else:
+                runs, wicket, restored = _score_round(
+                    side, rn, prev_wkt, recent_runs, batting_score,
+                    bat_boost, bowl_boost, bat_sup, bowl_sup,
+                )
+            restored &= live
+            boost_round[bat_idx[restored], rows[restored]] = g + 1
+
+            runs = runs * live
+            wicket = wicket & live
+            scores[bat_idx, rows] += runs
+            wickets[bat_idx, rows] += wicket
+            prev_runs = [runs, prev_runs[0]]
+            prev_wkt = [wicket, prev_wkt[0]]
+
+            # ── early end: all out, or target chased ──
+            done = wickets[bat_idx, rows] >= engine.MAX_WICKETS
+            if innings == 2:
+                done |= scores[bat_idx, rows] >= target
+            live &= ~done
+
+    # A chase stops the moment it passes the target, so the higher score wins.
+    diff = scores[0] - scores[1]
+    return SimResult(
+        n=n,
+        wins_a=int((diff > 0).sum()),
+        wins_b=int((diff < 0).sum()),
+        ties=int((diff == 0).sum()),
+        score_a=scores[0],
+        score_b=scores[1],
+    )
+
+
+def simulate(deck_a, deck_b, n, seed=None, chunk=DEFAULT_CHUNK, table=None):
+    """Play n random matches, `chunk` at a time. Per-match scores are not kept."""
+    _ensure_numpy()
+    rng = np.random.default_rng(seed)
+    wins_a = wins_b = ties = 0
+    done = 0
+    while done < n:
+        size = min(chunk, n - done)
+        result = play(deck_a, deck_b, draw_plan(deck_a, deck_b, size, rng), table)
+        wins_a += result.wins_a
+        wins_b += result.wins_b
+        ties += result.ties
+        done += size
+    return SimResult(n, wins_a, wins_b, ties, None, None)
+
+
+def win_rate(result):
+    """A's win rate with ties counted as half a win."""
+    return (result.wins_a + 0.5 * result.ties) / result.n if result.n else 0.0
+
+
+def without_ability(cards, ability):
+    """Copy of a deck with every `ability` card turned into a plain card."""
+    return [c._replace(ability='none') if c.ability == ability else c for c in cards]
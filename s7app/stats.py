@@ -0,0 +1,142 @@
+"""
+Materialised per-user match rollup behind the leaderboard and profile pages.
+
+finalize_match() runs when mp_result marks a room completed (after a normal
+finish or an exit) and GameRoom.record_result() has copied the result into
+the room's columns; nothing here reads the state JSON. It claims the room by
+flipping GameRoom.stats_recorded with a conditional UPDATE, so however often
+either player reopens the result page a match is counted once, then folds it
+into both players' PlayerStats rows (totals, per-team deck usage, last
+RECENT_MATCHES summaries) under a row lock, so concurrent finishes never lose
+an update.
+
+    page = leaderboard_page(request.GET.get('page'))   # one paginated read
+    rank = rank_of(request.user)                         # one count
+    row  = PlayerStats.objects.get(user=user)            # the whole profile page
+
+The leaderboard reads PlayerStats in playerstats_rank (-wins, user) order,
+so a page and a rank are both indexed reads however many users there are.
+Every account has a row: migration 0013 created them for existing users and
+the post_save signal in signals.py adds one for each new user.
+
+Migration 0017 folded the match history into every row's deck usage and
+recent matches at deploy, with fold_rooms(). `manage.py backfill_player_stats`
+rebuilds every row the same way as a repair; it claims rooms with the same
+conditional UPDATE as finalize_match(), so it is safe to run while matches
+finish.
+"""
+from django.contrib.auth.models import User
+from django.core.paginator import Paginator
+from django.db import transaction
+from django.db.models import Q
+
+from .models import GameRoom, PlayerStats, UserDeck
+
+LEADERBOARD_PAGE_SIZE = 50
+RECENT_MATCHES = 5
+ROLLUP_FIELDS = ['wins', 'losses', 'draws', 'matches', 'deck_usage', 'recent']
+
+RESULTS = ('player1', 'player2', 'Tie')
+
+
+def outcome_field(winner, role):
+    """The PlayerStats counter a match with `winner` bumps for the player in `role`."""
+    if winner == 'Tie':
+        return 'draws'
+    return 'wins' if winner == role else 'losses'
+
+
+def match_summary(room, role, opponent, team):
+    """One recent-match entry for the player in `role`, as the profile page shows it."""
+    result = {'wins': 'Win', 'losses': 'Loss', 'draws': 'Draw'}[outcome_field(room.winner_role, role)]
+    scores = {'player1': room.player1_score or 0, 'player2': room.player2_score or 0}
+    opp_role = 'player2' if role == 'player1' else 'player1'
+    return {
+        'code': room.code,
+        'opponent': opponent or 'Unknown',
+        'result': result,
+        'result_class': result.lower(),
+        'my_score': scores[role],
+        'opp_score': scores[opp_role],
+        'deck_team': team or 'Unknown',
+        'date': room.created_at.isoformat(),
+        'exited': room.exit_by == role,
+    }
+
+
+def apply_match(row, room, role, opponent, team):
+    """Fold one finished match into `row` (a PlayerStats; the caller saves it)."""
+    field = outcome_field(room.winner_role, role)
+    setattr(row, field, getattr(row, field) + 1)
+    row.matches += 1
+    if team:
+        row.deck_usage[team] = row.deck_usage.get(team, 0) + 1
+    row.recent = [match_summary(room, role, opponent, team)] + row.recent[:RECENT_MATCHES - 1]
+
+
+def fold_rooms(rows, rooms):
+    """
+    apply_match() each room in `rooms` (oldest first, players and deck teams
+    selected) into `rows`, {user_id: PlayerStats}. Returns how many rooms.
+    """
+    counted = 0
+    for room in rooms:
+        seats = (
+            ('player1', room.player1, room.player2, room.player1_deck),
+            ('player2', room.player2, room.player1, room.player2_deck),
+        )
+        for role, user, opponent, deck in seats:
+            if user is None or user.pk not in rows:
+                continue
+            apply_match(rows[user.pk], room, role,
+                        opponent.username if opponent else None,
+                        deck.team.name if deck and deck.team else None)
+        counted += 1
+    return counted
+
+
+def finalize_match(room):
+    """Count a finished room (its result columns already set) once. True if this call counted it."""
+    winner = room.winner_role
+    if winner not in RESULTS:
+        return False
+    with transaction.atomic():
+        claimed = GameRoom.objects.filter(pk=room.pk, stats_recorded=False).update(stats_recorded=True)
+        if not claimed:
+            return False
+        names = dict(User.objects.filter(pk__in=[room.player1_id, room.player2_id])
+                     .values_list('pk', 'username'))
+        teams = dict(UserDeck.objects.filter(pk__in=[room.player1_deck_id, room.player2_deck_id])
+                     .values_list('pk', 'team__name'))
+        seats = (
+            ('player1', room.player1_id, room.player2_id, room.player1_deck_id),
+            ('player2', room.player2_id, room.player1_id, room.player2_deck_id),
+        )
+        for role, user_id, opponent_id, deck_id in seats:
+            if user_id is None:
+                continue
+            PlayerStats.objects.get_or_create(user_id=user_id)
+            row = PlayerStats.objects.select_for_update().get(user_id=user_id)
+            apply_match(row, room, role, names.get(opponent_id), teams.get(deck_id))
+            row.save()
+    room.stats_recorded = True
+    print(f"🏆 Stats recorded for room {room.code}: {winner}")
+    return True
+
+
+# ── reads ───────────────────────────────────────────────────────────────────
+
+def ranking():
+    """Every player, leaderboard order (most wins first, then oldest account)."""
+    return PlayerStats.objects.select_related('user').order_by('-wins', 'user')
+
+
+def leaderboard_page(number, per_page=LEADERBOARD_PAGE_SIZE):
+    return Paginator(ranking(), per_page).get_page(number)
+
+
+def rank_of(user):
+    """1-based leaderboard position of `user`."""
+    wins = PlayerStats.objects.filter(user_id=user.pk).values_list('wins', flat=True).first() or 0
+    ahead = PlayerStats.objects.filter(Q(wins__gt=wins) | Q(wins=wins, user_id__lt=user.pk)).count()
+    return ahead + 1
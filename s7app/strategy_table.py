@@ -0,0 +1,192 @@
+"""
+Single-player counter strategies: which counter the computer falls back on
+against each player profile, kept in s7app/strategies.csv.
+
+Nothing is read or written at import. get() returns the table, loading it
+on first use (creating the file with DEFAULT_STRATEGIES when it is missing).
+
+record_round() is called as each round is logged. It bumps that round's
+win/loss counter in the cache (atomic incr, so every worker shares them)
+and re-picks the counter for that round's profile only. strategies.csv is
+rewritten only when the pick actually changes. The counters are seeded
+from the round log whenever the cache has lost any of them (first start,
+flush, eviction). A seed writes every counter, zeros included, so the
+counters are their own "seeded" flag: a missing key always means the cache
+dropped it, and a single evicted key is enough to trigger a reseed.
+"""
+import csv
+import logging
+import os
+import threading
+from urllib.parse import quote
+
+from django.core.cache import cache
+
+from . import round_log
+
+logger = logging.getLogger(__name__)
+
+STRATEGIES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'strategies.csv')
+
+DEFAULT_STRATEGIES = {'high_batting': 'high_bowling', 'high_bowling': 'high_batting', 'balanced': 'balanced'}
+
+OPTIMAL_COUNTERS = {
+    'high_bowling': lambda cards: max(cards, key=lambda x: x.batting + x.runs),
+    'high_batting': lambda cards: max(cards, key=lambda x: x.bowling),
+    'balanced': lambda cards: max(cards, key=lambda x: (x.bowling + x.batting + x.runs) / 3),
+}
+
+TABLE_KEY = 'strategy:table'
+
+_lock = threading.RLock()
+_strategies = None
+
+
+def _counter_key(outcome, profile, strategy):
+    return f'strategy:{outcome}:{profile}:{quote(strategy)}'
+
+
+def _profile(player_card_id):
+    try:
+        return 'high_batting' if int(player_card_id) % 2 == 0 else 'balanced'
+    except (TypeError, ValueError):
+        return None
+
+
+def best_counter(current, wins, losses):
+    """The counter to use next, given {strategy: count} wins and losses for one profile."""
+    if losses.get(current, 0) > wins.get(current, 0) and losses.get(current, 0) > 2:
+        alt_strategies = [s for s in OPTIMAL_COUNTERS.keys() if s != current]
+        return min(alt_strategies, key=lambda s: losses.get(s, 0), default=current)
+    return current
+
+
+# ── table ───────────────────────────────────────────────────────────────────
+
+def _write(table):
+    tmp = STRATEGIES_FILE + '.tmp'
+    with open(tmp, 'w', newline='', encoding='utf-8') as csvfile:
+        writer = csv.DictWriter(csvfile, fieldnames=['player_profile', 'best_counter'])
+        writer.writeheader()
+        for profile, counter in table.items():
+            writer.writerow({'player_profile': profile, 'best_counter': counter})
+    os.replace(tmp, STRATEGIES_FILE)
+
+
+def _load_file():
+    table = {}
+    if os.path.exists(STRATEGIES_FILE):
+        with open(STRATEGIES_FILE, newline='', encoding='utf-8') as csvfile:
+            for row in csv.DictReader(csvfile):
+                table[row['player_profile']] = row['best_counter']
+    else:
+        # default strategies file creation
+        table = dict(DEFAULT_STRATEGIES)
+        _write(table)
+    return table
+
+
+def get():
+    """{player profile: counter strategy}. One cache read; another worker's flip shows up here."""
+    global _strategies
+    try:
+        table = cache.get(TABLE_KEY)
+    except Exception as e:
+        logger.warning(f'Strategy table lookup failed: {e}')
+        table = None
+    if table is not None:
+        _strategies = table
+        return table
+    with _lock:
+        if _strategies is None:
+            _strategies = _load_file()
+        try:
+            cache.add(TABLE_KEY, _strategies, None)
+        except Exception as e:
+            logger.warning(f'Strategy table store failed: {e}')
+        return _strategies
+
+
+def _flip(profile, counter):
+    global _strategies
+    with _lock:
+        table = dict(get())
+        table[profile] = counter
+        _strategies = table
+        try:
+            cache.set(TABLE_KEY, table, None)
+        except Exception as e:
+            logger.warning(f'Strategy table store failed: {e}')
+        _write(table)
+    print(f"🧠 Strategy for {profile} → {counter}")
+
+
+# ── counters ────────────────────────────────────────────────────────────────
+
+def _tracked(table, profile):
+    """Strategies whose counts can change the pick for `profile`."""
+    return set(OPTIMAL_COUNTERS) | {table[profile]}
+
+
+def _profile_keys(table, profile):
+    """{counter key: (outcome, strategy)} for every counter of one profile."""
+    return {
+        _counter_key(outcome, profile, strategy): (outcome, strategy)
+        for outcome in ('win', 'loss') for strategy in sorted(_tracked(table, profile))
+    }
+
+
+def _seed():
+    """Rebuild every counter from the round log."""
+    table = get()
+    totals = {key: 0 for profile in table for key in _profile_keys(table, profile)}
+    rows, _ = round_log.Follower().poll()
+    for row in rows:
+        profile = _profile(row.get('player_card_id'))
+        strategy = row.get('computer_name') or 'N/A'
+        if profile in table and strategy in _tracked(table, profile):
+            key = _counter_key('win' if row.get('outcome') == 'win' else 'loss', profile, strategy)
+            totals[key] = totals.get(key, 0) + 1
+    # Absolute values, so seeding again after an eviction can't double count.
+    cache.set_many(totals, None)
+
+
+def counts(profile):
+    """({strategy: wins}, {strategy: losses}) for one profile."""
+    keys = _profile_keys(get(), profile)
+    found = cache.get_many(list(keys))
+    if len(found) < len(keys):
+        # Some counter was evicted: the rest can't be trusted on their own.
+        _seed()
+        found = cache.get_many(list(keys))
+    wins, losses = {}, {}
+    for key, n in found.items():
+        outcome, strategy = keys[key]
+        (wins if outcome == 'win' else losses)[strategy] = n
+    return wins, losses
+
+
+def record_round(player_card_id, computer_name, outcome):
+    """Count one logged round and persist a new counter for its profile if the pick flips."""
+    try:
+        table = get()
+        profile = _profile(player_card_id)
+        strategy = computer_name or 'N/A'
+        if profile not in table or strategy not in _tracked(table, profile):
+            return
+        try:
+            cache.incr(_counter_key('win' if outcome == 'win' else 'loss', profile, strategy))
+            profiles = [profile]
+        except ValueError:
+            # Counter missing (never seeded, or evicted). The seed reads this
+            # round from the log too, so check every profile once.
+            _seed()
+            profiles = list(table)
+        for profile in profiles:
+            wins, losses = counts(profile)
+            current = get()[profile]
+            counter = best_counter(current, wins, losses)
+            if counter != current:
+                _flip(profile, counter)
+    except Exception as e:
+        logger.warning(f'Strategy counters update failed: {e}')
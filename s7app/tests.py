@@ -1,3 +1,914 @@
-from django.test import TestCase
+import csv
+import importlib
+import io
+import math
+import os
+import random
+import tempfile
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.apps import apps as django_apps
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from . import (
+    ai_model, card_catalog, engine, game_cache, matchups, round_log, simulator, stats, strategy_table, views,
+    write_behind,
+)
+from .card_catalog import CardRecord
+from .match_state import INNINGS_PER_MATCH, ROUNDS_PER_INNINGS, MatchState, dumps, loads
+from .models import GameRoom, PlayerCard, PlayerStats, Team, UserDeck
+
+
+def _user(username):
+    return User.objects.create(username=username)
+
+
+def _card(name, batting=50, bowling=50, runs=4):
+    return PlayerCard.objects.create(name=name, batting=batting, bowling=bowling, runs=runs)
+
+
+class CardCatalogTests(TestCase):
+    """Each worker keeps its own catalog copy; these swap module state to play two workers."""
+
+    def setUp(self):
+        cache.clear()
+        card_catalog._cards = None
+        card_catalog._loaded_version = None
+
+    def _worker_copy(self):
+        return card_catalog._cards, card_catalog._loaded_version
+
+    def _as_worker(self, copy):
+        card_catalog._cards, card_catalog._loaded_version = copy
+
+    def test_other_worker_reloads_after_invalidate(self):
+        card = _card('Opener')
+        other = (card_catalog.get_catalog(), card_catalog._loaded_version)
+        self.assertEqual(card_catalog.get_card(card.id).batting, 50)
+
+        # update() skips signals; call invalidate() as the post_save receiver would.
+        PlayerCard.objects.filter(pk=card.pk).update(batting=90)
+        card_catalog.invalidate()
+
+        self._as_worker(other)
+        self.assertEqual(card_catalog.get_card(card.id).batting, 90)
+
+    def test_other_worker_reloads_after_invalidate_on_evicted_key(self):
+        card = _card('Finisher')
+        card_catalog.get_catalog()
+        other = self._worker_copy()
+
+        cache.delete(card_catalog.CATALOG_VERSION_KEY)
+        PlayerCard.objects.filter(pk=card.pk).update(runs=6)
+        card_catalog.invalidate()
+
+        self._as_worker(other)
+        self.assertEqual(card_catalog.get_card(card.id).runs, 6)
+
+    def test_reseeded_key_is_not_an_old_version(self):
+        card_catalog.get_catalog()
+        loaded = card_catalog._loaded_version
+        cache.delete(card_catalog.CATALOG_VERSION_KEY)
+        self.assertNotEqual(card_catalog._current_version(), loaded)
+
+    def test_unknown_card_raises_does_not_exist(self):
+        with self.assertRaises(PlayerCard.DoesNotExist):
+            card_catalog.get_card(999999)
+
+    @override_settings(ALLOWED_HOSTS=['testserver'])
+    def test_watch_timeline_reads_the_version_key_once(self):
+        user = _user('watcher')
+        bat, ball = _card('Bat'), _card('Ball')
+        state = MatchState({'innings': 2, 'round_number': ROUNDS_PER_INNINGS, 'batting_first': 'player1'})
+        for innings in range(1, INNINGS_PER_MATCH + 1):
+            for rec in state.innings_rounds(innings):
+                rec.player1_card, rec.player2_card = bat.id, ball.id
+        GameRoom.objects.create(code='WATCH1', player1=user, status='live', state=state.to_json())
+        client = Client()
+        client.force_login(user)
+
+        with mock.patch.object(card_catalog, '_current_version',
+                               wraps=card_catalog._current_version) as version:
+            response = client.get(reverse('watch_match_detail', args=['WATCH1']))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['innings1_rounds']), ROUNDS_PER_INNINGS)
+        self.assertEqual(version.call_count, 1)
+
+
+class MatchStateTests(SimpleTestCase):
+
+    legacy = {
+        'innings': 1, 'round_number': 3, 'batting_first': 'player2',
+        'scores': {'player1': 0, 'player2': 10}, 'wickets': {'player1': 0, 'player2': 1},
+        'player1_played_round_1_1': 11, 'player2_played_round_1_1': 22,
+        'runs_in_round_1_1': 4, 'wicket_in_round_1_1': False,
+        'player1_played_round_1_2': 12, 'player2_played_round_1_2': 23,
+        'runs_in_round_1_2': 6, 'wicket_in_round_1_2': True,
+        'round_snapshot_1_2': {'batter': 'x'}, 'round_boost_clicks_1_2': ['player1'],
+        'player2_played_round_1_3': 24,
+    }
+
+    def test_legacy_flat_dict_migrates_into_rounds(self):
+        state = MatchState.from_json(self.legacy)
+
+        self.assertEqual(state['scores'], {'player1': 0, 'player2': 10})
+        self.assertEqual(state['batting_first'], 'player2')
+        first, second, third = state.innings_rounds(1)[:3]
+        self.assertEqual((first.player1_card, first.player2_card, first.runs, first.wicket), (11, 22, 4, False))
+        self.assertEqual((second.runs, second.wicket, second.snapshot), (6, True, {'batter': 'x'}))
+        self.assertEqual(second.boost_clicks, ['player1'])
+        self.assertEqual((third.played('player1'), third.played('player2')), (None, 24))
+        self.assertFalse(any(key.startswith(('player1_played', 'runs_in')) for key in state.fields))
+
+    def test_msgpack_round_trip(self):
+        state = MatchState.from_json(self.legacy)
+        state.set_decks([list(_random_card(random.Random(1), 11))], [list(_random_card(random.Random(2), 22))])
+        last = state.round(2, 7)
+        last.player1_card, last.player2_card, last.boost_window_open = 11, 22, True
+
+        again = loads(dumps(state))
+
+        self.assertEqual(again.to_json(), state.to_json())
+        self.assertEqual(again.card(22), state.card(22))
+        self.assertTrue(again.round(2, 7).boost_window_open)
+        self.assertEqual(dumps(again), dumps(state))
+
+    def test_loads_accepts_a_dict_cached_before_msgpack(self):
+        self.assertEqual(loads(self.legacy).to_json(), MatchState.from_json(self.legacy).to_json())
+
+
+class RedisStoreLegacyKeyTests(SimpleTestCase):
+    """A key still holding a pre-hash plain value is taken over, not left failing with WRONGTYPE."""
+
+    def _store(self, decoded):
+        seeded = []
+
+        def hmget(key, fields):
+            if not seeded and not self.taken:
+                raise Exception('WRONGTYPE Operation against a key holding the wrong kind of value')
+            return [b'1', seeded[0]] if seeded else [None, None]
+
+        def take_legacy(keys):
+            self.taken = True
+            return b'pickled'
+
+        self.taken = False
+        store = object.__new__(game_cache._RedisStore)
+        store.client = mock.Mock(hmget=hmget)
+        store.take_legacy_script = mock.Mock(side_effect=take_legacy)
+        store.cas = mock.Mock(side_effect=lambda code, rev, payload: seeded.append(payload) or (True, 1, None))
+        fake_cache = mock.Mock(make_key=lambda key: key)
+        fake_cache.client.decode.side_effect = [decoded]
+        return store, fake_cache
+
+    def test_old_value_is_reseeded_as_revision_one(self):
+        store, fake_cache = self._store(MatchStateTests.legacy)
+
+        with mock.patch.object(game_cache, 'cache', fake_cache):
+            rev, payload = store.get('OLD1')
+
+        self.assertEqual(rev, 1)
+        self.assertEqual(loads(payload).to_json(), MatchState.from_json(MatchStateTests.legacy).to_json())
+        store.take_legacy_script.assert_called_once_with(keys=['game:OLD1:state'])
+        store.cas.assert_called_once_with('OLD1', 0, payload)
+
+    def test_unreadable_old_value_is_dropped_for_a_db_reload(self):
+        store, fake_cache = self._store(ValueError('bad pickle'))
+
+        with mock.patch.object(game_cache, 'cache', fake_cache):
+            self.assertIsNone(store.get('OLD2'))
+
+        store.cas.assert_not_called()
+
+
+class CompareAndSetTests(TestCase):
+    """aupdate_game_state re-applies its mutation when another writer got in first."""
+
+    code = 'CASTEST'
+
+    def setUp(self):
+        cache.clear()
+        card_catalog._cards = None
+        card_catalog._loaded_version = None
+
+    def _update(self, mutate, **kwargs):
+        return async_to_sync(game_cache.aupdate_game_state)(self.code, mutate, **kwargs)
+
+    def _write_behind_their_back(self, key, value):
+        """Another worker's committed write: bump the stored revision under the caller."""
+        state = game_cache.get_game_state(self.code)
+        state[key] = value
+        self.assertTrue(game_cache._store().cas(self.code, state.revision, dumps(state))[0])
+
+    def test_lost_race_reapplies_mutation_on_fresh_state(self):
+        calls = []
+
+        def mine(st):
+            calls.append(st.revision)
+            if len(calls) == 1:
+                self._write_behind_their_back('message', 'theirs')
+            st['scores'] = {'player1': 4, 'player2': 0}
+            return 'mine'
+
+        state, result = self._update(mine)
+
+        self.assertEqual(result, 'mine')
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(calls[1], calls[0] + 1)     # retried on the other worker's revision
+        stored = game_cache.get_game_state(self.code)
+        self.assertEqual(stored['message'], 'theirs')
+        self.assertEqual(stored['scores'], {'player1': 4, 'player2': 0})
+        self.assertEqual(stored.revision, state.revision)
+
+    def test_stale_state_passed_in_is_retried(self):
+        stale = game_cache.get_game_state(self.code)
+        self._write_behind_their_back('toss_done', True)
+
+        def mine(st):
+            st['innings'] = 2
+
+        state, _ = self._update(mine, state=stale)
+
+        self.assertTrue(state['toss_done'])
+        self.assertEqual(state['innings'], 2)
+
+    def test_endless_contention_gives_up(self):
+        def mine(st):
+            self._write_behind_their_back('message', str(st.revision))
+
+        with self.assertRaises(RuntimeError):
+            self._update(mine)
+
+    def test_seed_from_db_does_not_clobber_a_newer_write(self):
+        self._write_behind_their_back('message', 'live')
+        ok, _, current = game_cache._store().cas(self.code, 0, dumps(MatchState()))
+        self.assertFalse(ok)
+        self.assertIsNotNone(current)
+        self.assertEqual(game_cache.get_game_state(self.code)['message'], 'live')
+
+    def test_async_mutate_looks_cards_up_without_io(self):
+        card = _card('Spinner', bowling=80)
+        looked_up = []
+
+        def mine(st):
+            with mock.patch.object(card_catalog, 'get_catalog', side_effect=AssertionError('I/O in mutate')):
+                looked_up.append(st.card(card.id).bowling)
+            if len(looked_up) == 1:
+                self._write_behind_their_back('message', 'theirs')
+
+        self._update(mine)
+
+        self.assertEqual(looked_up, [80, 80])
+
+
+@override_settings(STATE_FLUSH_INTERVAL=60)
+class WriteBehindTests(TestCase):
+
+    def setUp(self):
+        write_behind._dirty.clear()
+        self.room = GameRoom.objects.create(code='WBTEST', player1=_user('wb'))
+
+    def tearDown(self):
+        write_behind._dirty.clear()
+
+    def _state(self, revision, message):
+        state = MatchState({'message': message})
+        state.revision = revision
+        return state
+
+    def test_room_stays_pending_until_written(self):
+        write_behind.enqueue('WBTEST', self._state(3, 'queued'))
+        seen = []
+        real_write = write_behind._write
+
+        def write(batch):
+            seen.append(write_behind.pending('WBTEST'))
+            # A newer move lands while the old one is being saved.
+            write_behind.enqueue('WBTEST', self._state(4, 'newer'))
+            return real_write(batch)
+
+        with mock.patch.object(write_behind, '_write', side_effect=write):
+            self.assertEqual(write_behind.flush(), 1)
+
+        self.assertEqual(seen[0]['message'], 'queued')
+        self.room.refresh_from_db()
+        self.assertEqual(self.room.state['message'], 'queued')
+        self.assertEqual(write_behind.pending('WBTEST')['message'], 'newer')
+
+    def test_failed_write_keeps_the_room_queued(self):
+        write_behind.enqueue('WBTEST', self._state(1, 'queued'))
+        with mock.patch.object(write_behind, '_write', return_value=False):
+            self.assertEqual(write_behind.flush(), 0)
+        self.assertEqual(write_behind.pending('WBTEST')['message'], 'queued')
+        write_behind.flush()
+        self.assertIsNone(write_behind.pending('WBTEST'))
+
+    def test_older_revision_never_replaces_newer(self):
+        write_behind.enqueue('WBTEST', self._state(5, 'newer'))
+        write_behind.enqueue('WBTEST', self._state(4, 'older'))
+        self.assertEqual(write_behind.pending('WBTEST')['message'], 'newer')
+
+
+def _record(card_id, batting, bowling, runs, ability='none', is_spinner=False):
+    return CardRecord(card_id, f'Card {card_id}', batting, bowling, runs, ability, is_spinner, 1, None, None)
+
+
+def _random_card(rng, card_id):
+    return _record(card_id, rng.randint(30, 95), rng.randint(30, 95), rng.choice([0, 2, 4, 6, 12, 18, 24]),
+                   rng.choice(engine.ABILITIES), rng.random() < 0.4)
+
+
+def _random_support(rng):
+    if rng.random() < 0.5:
+        return None
+    start = rng.randint(1, 7)
+    return {'type': rng.choice(['batting_support', 'pace_support', 'spin_support']),
+            'from_round': start, 'until_round': start + 3}
+
+
+def _legacy_round(batter, bowler, rn, batting_score, recent_runs, recent_wicket,
+                  bat_boost, bowl_boost, bat_sup, bowl_sup):
+    """The scoring views._resolve_round / _apply_abilities did before engine.py, minus the state writes."""
+    batting, bowling, runs, log = batter.batting, bowler.bowling, batter.runs, []
+    spin = batter.ability == 'spin_basher' and bowler.is_spinner
+    if batter.ability == 'opener' and rn <= 2:
+        batting += 10; log.append("⚡ Opener: +10 batting!")
+    if batter.ability == 'finisher' and rn >= 6:
+        batting += 10; log.append("💥 Finisher: +10 batting!")
+    if batter.ability == 'mid_over_hitter' and 3 <= rn <= 5:
+        batting += 10; log.append("🏏 Mid Over Hitter: +10 batting!")
+    if batter.ability == 'spin_basher' and bowler.is_spinner:
+        batting += 10; log.append("🌀 Spin Basher: +10 batting vs spinner!")
+    if batter.ability == 'saviour' and recent_wicket:
+        batting += 10; log.append("🛡️ Saviour: +10 batting after recent wicket!")
+    if bowler.ability == 'powerplay_specialist' and rn <= 2:
+        bowling += 10; log.append("🔥 Powerplay Specialist: +10 bowling!")
+    if bowler.ability == 'death_specialist' and rn >= 6:
+        bowling += 10; log.append("💀 Death Specialist: +10 bowling!")
+    if bowler.ability == 'mid_over_specialist' and 3 <= rn <= 5:
+        bowling += 10; log.append("🎯 Mid Over Specialist: +10 bowling!")
+    if bowler.ability == 'golden_arm' and recent_runs >= 30:
+        bowling += 10; log.append(f"💛 Golden Arm: +10 bowling ({recent_runs} runs in last 2 rounds)!")
+    if bowler.ability == 'breakthrough' and batting_score >= 60:
+        bowling += 10; log.append(f"🚨 Breakthrough: +10 bowling (opponent at {batting_score} runs)!")
+    cutter = bowler.ability == 'runs_cutter' and batter.ability != 'spin_basher'
+    if bat_boost and not spin:
+        batting += 10; log.append("🚀 Boost: +10 batting!")
+    if bowl_boost:
+        bowling += 10; log.append("🚀 Boost: +10 bowling!")
+    bat_sup_bonus = bowl_sup_bonus = 0
+    bat_sup_type = bowl_sup_type = None
+    if bat_sup and bat_sup['from_round'] <= rn <= bat_sup['until_round'] and bat_sup['type'] == 'batting_support':
+        batting += 2; log.append("🟢 Batting Support: +2 batting!")
+        bat_sup_bonus, bat_sup_type = 2, 'Batting Support'
+    if bowl_sup and bowl_sup['from_round'] <= rn <= bowl_sup['until_round']:
+        if bowl_sup['type'] == 'pace_support' and not bowler.is_spinner:
+            bowling += 2; log.append("⚡ Pace Support: +2 bowling!")
+            bowl_sup_bonus, bowl_sup_type = 2, 'Pace Support'
+        elif bowl_sup['type'] == 'spin_support' and bowler.is_spinner:
+            bowling += 2; log.append("🌀 Spin Support: +2 bowling!")
+            bowl_sup_bonus, bowl_sup_type = 2, 'Spin Support'
+    restored = spin and bat_boost
+    if restored:
+        log.append("♻️ Boost restored: Spin Basher used instead!")
+    bat_boost_bonus = 10 if bat_boost and not spin else 0
+    bowl_boost_bonus = 10 if bowl_boost else 0
+    cut = 0
+    if batting > bowling:
+        if cutter:
+            cut = min(10, runs); runs = max(0, runs - 10); log.append("✂️ Runs Cutter: -10 runs!")
+        wicket = False
+    elif batting == bowling:
+        runs, wicket = math.floor(runs / 3 + 0.5), False
+    else:
+        runs, wicket = 0, True
+    return {
+        'runs': runs, 'wicket': wicket, 'runs_cut': cut, 'log': tuple(log),
+        'eff_batting': batting, 'eff_bowling': bowling, 'runs_cutter_active': cutter,
+        'batter_ability_bonus': batting - batter.batting - bat_sup_bonus - bat_boost_bonus,
+        'bowler_ability_bonus': bowling - bowler.bowling - bowl_sup_bonus - bowl_boost_bonus,
+        'batter_boost_bonus': bat_boost_bonus, 'bowler_boost_bonus': bowl_boost_bonus,
+        'batter_support_bonus': bat_sup_bonus, 'bowler_support_bonus': bowl_sup_bonus,
+        'batter_support_type': bat_sup_type, 'bowler_support_type': bowl_sup_type,
+        'boost_restored': restored,
+    }
+
+
+class EngineParityTests(SimpleTestCase):
+    """engine.resolve scores every round exactly like the code it replaced."""
+
+    def test_resolve_matches_legacy_round_resolution(self):
+        rng = random.Random(11)
+        for i in range(3000):
+            batter, bowler = _random_card(rng, 2 * i), _random_card(rng, 2 * i + 1)
+            rn = rng.randint(1, 7)
+            batting_score, recent_runs = rng.randint(0, 120), rng.randint(0, 48)
+            recent_wicket = rng.random() < 0.3
+            bat_boost, bowl_boost = rng.random() < 0.3, rng.random() < 0.3
+            bat_sup, bowl_sup = _random_support(rng), _random_support(rng)
+
+            outcome = engine.resolve(
+                batter, bowler, engine.RoundContext(rn, batting_score, recent_runs, recent_wicket),
+                batter_boost=bat_boost, bowler_boost=bowl_boost,
+                batter_support=bat_sup, bowler_support=bowl_sup,
+            )
+            expected = _legacy_round(batter, bowler, rn, batting_score, recent_runs, recent_wicket,
+                                     bat_boost, bowl_boost, bat_sup, bowl_sup)
+            self.assertEqual({k: getattr(outcome, k) for k in expected}, expected, f'round {i}')
+
+    def test_score_rules(self):
+        self.assertEqual(engine.score(60, 50, 12), engine.Score('runs', 12, False, 0))
+        self.assertEqual(engine.score(60, 50, 6, runs_cutter_active=True), engine.Score('runs', 0, False, 6))
+        self.assertEqual(engine.score(50, 50, 4), engine.Score('tie', 1, False, 0))
+        self.assertEqual(engine.score(40, 50, 12), engine.Score('wicket', 0, True, 0))
+
+
+def _replay(cards_a, cards_b, plan, i):
+    """Match `i` of a simulator plan, played round by round through engine.resolve."""
+    scores, wickets = [0, 0], [0, 0]
+    boost_round = [int(plan.boost_round[0, i]), int(plan.boost_round[1, i])]
+    a_first = bool(plan.a_bats_first[i])
+    for innings in range(1, INNINGS_PER_MATCH + 1):
+        a_batting = a_first if innings == 1 else not a_first
+        bat, bowl = (0, 1) if a_batting else (1, 0)
+        target = scores[0 if a_first else 1] + 1
+        first_global = (innings - 1) * ROUNDS_PER_INNINGS
+        supports = []
+        for player in (0, 1):
+            start = int(plan.support_round[player, i]) - first_global + 1
+            if not 1 <= start <= ROUNDS_PER_INNINGS:
+                supports.append(None)
+                continue
+            kind = ('batting_support' if player == bat else
+                    ('pace_support', 'spin_support')[int(plan.support_pick[player, i])])
+            supports.append({'type': kind, 'from_round': start,
+                             'until_round': start + simulator.SUPPORT_ROUNDS - 1})
+        recent = []
+        for r in range(ROUNDS_PER_INNINGS):
+            g = first_global + r
+            card_a = cards_a[plan.orders[innings - 1][0][i, r]]
+            card_b = cards_b[plan.orders[innings - 1][1][i, r]]
+            batter, bowler = (card_a, card_b) if a_batting else (card_b, card_a)
+            ctx = engine.RoundContext(r + 1, scores[bat], sum(runs for runs, _ in recent),
+                                      any(wicket for _, wicket in recent))
+            outcome = engine.resolve(batter, bowler, ctx,
+                                     batter_boost=boost_round[bat] == g, bowler_boost=boost_round[bowl] == g,
+                                     batter_support=supports[bat], bowler_support=supports[bowl])
+            if outcome.boost_restored:
+                boost_round[bat] = g + 1
+            scores[bat] += outcome.runs
+            wickets[bat] += outcome.wicket
+            recent = [(outcome.runs, outcome.wicket)] + recent[:1]
+            if wickets[bat] >= engine.MAX_WICKETS or (innings == 2 and scores[bat] >= target):
+                break
+    return scores
+
+
+@skipUnless(simulator.HAS_NUMPY, 'NumPy is not installed')
+class SimulatorParityTests(SimpleTestCase):
+    """The vectorised simulator plays each planned match exactly like engine.resolve would."""
+
+    def _decks(self, seed):
+        rng = random.Random(seed)
+        return ([_random_card(rng, i) for i in range(10)],
+                [_random_card(rng, 100 + i) for i in range(9)])
+
+    def test_play_matches_engine_replay(self):
+        import numpy as np
+        for seed in (1, 2, 3):
+            cards_a, cards_b = self._decks(seed)
+            deck_a, deck_b = simulator.deck_arrays(cards_a), simulator.deck_arrays(cards_b)
+            plan = simulator.draw_plan(deck_a, deck_b, 400, np.random.default_rng(seed))
+            result = simulator.play(deck_a, deck_b, plan)
+            for i in range(plan.n):
+                self.assertEqual([int(result.score_a[i]), int(result.score_b[i])],
+                                 _replay(cards_a, cards_b, plan, i), f'seed {seed}, match {i}')
+
+
+@skipUnless(matchups.HAS_NUMPY, 'numpy is not installed')
+class MatchupTableParityTests(SimpleTestCase):
+    """Every table entry is what engine.resolve says for that round."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        import numpy as np
+        rng = random.Random(14)
+        cls.catalog = {i: _random_card(rng, i) for i in range(1, 21)}
+        tmp = tempfile.TemporaryDirectory()
+        cls.addClassCleanup(tmp.cleanup)
+        path = os.path.join(tmp.name, 'matchups-test.npy')
+        ids = matchups.build(cls.catalog, path)
+        cls.table = matchups.MatchupTable('test', cls.catalog, ids, np.load(path, mmap_mode='r'))
+
+    def test_lookup_matches_engine_resolve(self):
+        rng = random.Random(14)
+        cards = list(self.catalog.values())
+        for i in range(5000):
+            batter, bowler = rng.choice(cards), rng.choice(cards)
+            ctx = engine.RoundContext(rng.randint(1, 7), rng.randint(0, 120), rng.randint(0, 48), rng.random() < 0.3)
+            bat_boost, bowl_boost = rng.random() < 0.3, rng.random() < 0.3
+            bat_sup, bowl_sup = _random_support(rng), _random_support(rng)
+
+            outcome = engine.resolve(batter, bowler, ctx, bat_boost, bowl_boost, bat_sup, bowl_sup)
+            entry = self.table.data[self.table.row(batter.id), self.table.row(bowler.id), ctx.round_number - 1,
+                                    matchups.modifiers_for(ctx, bat_boost, bowl_boost, bat_sup, bowl_sup)]
+            flags = int(entry[3])
+            self.assertEqual(
+                ([int(v) for v in entry[:3]], bool(flags & matchups.WICKET), bool(flags & matchups.TIE),
+                 bool(flags & matchups.RUNS_CUTTER), bool(flags & matchups.BOOST_RESTORED)),
+                ([outcome.eff_batting, outcome.eff_bowling, outcome.runs], outcome.wicket, outcome.kind == 'tie',
+                 outcome.runs_cutter_active, outcome.boost_restored),
+                f'round {i}',
+            )
+
+    def test_lookup_by_keyword_modifiers(self):
+        batter, bowler = self.catalog[1], self.catalog[2]
+        ctx = engine.RoundContext(6, 70, 30, True)
+        outcome = engine.resolve(batter, bowler, ctx, batter_boost=True)
+        m = self.table.lookup(batter.id, bowler.id, 6, batter_boost=True, recent_wicket=True,
+                              golden_arm=True, breakthrough=True)
+        self.assertEqual((m.eff_batting, m.eff_bowling, m.runs, m.wicket),
+                         (outcome.eff_batting, outcome.eff_bowling, outcome.runs, outcome.wicket))
+
+    def test_simulator_with_table_matches_engine_replay(self):
+        import numpy as np
+        for seed in (1, 2):
+            rng = random.Random(seed)
+            cards_a, cards_b = rng.sample(list(self.catalog.values()), 9), rng.sample(list(self.catalog.values()), 8)
+            deck_a = simulator.deck_arrays(cards_a, self.table)
+            deck_b = simulator.deck_arrays(cards_b, self.table)
+            self.assertIsNotNone(deck_a.rows)
+            plan = simulator.draw_plan(deck_a, deck_b, 300, np.random.default_rng(seed))
+            result = simulator.play(deck_a, deck_b, plan, self.table)
+            for i in range(plan.n):
+                self.assertEqual([int(result.score_a[i]), int(result.score_b[i])],
+                                 _replay(cards_a, cards_b, plan, i), f'seed {seed}, match {i}')
+
+
+@skipUnless(ai_model.HAS_ML_LIBS, 'pandas / numpy / scikit-learn are not installed')
+class IncrementalTrainingTests(SimpleTestCase):
+    """train_incremental against a synthetic history file and a throwaway model file."""
+
+    def setUp(self):
+        import pandas as pd
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.history = os.path.join(tmp.name, 'game_history.csv')
+        cards = pd.DataFrame({'batting': [40, 60, 80, 50], 'bowling': [70, 50, 30, 60], 'runs': [2, 4, 6, 12]},
+                             index=pd.Index([1, 2, 3, 4], name='card_id'))
+        for patcher in (mock.patch.object(ai_model, 'HISTORY_FILE', self.history),
+                        mock.patch.object(ai_model, 'MODEL_FILE', os.path.join(tmp.name, 'card_model.joblib')),
+                        mock.patch.object(ai_model, '_card_frame', return_value=cards),
+                        mock.patch('builtins.print')):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.rng = random.Random(17)
+        self._append(300, header=True)
+
+    def _append(self, n, header=False, newline=True):
+        lines = [','.join(round_log.FIELDS)] if header else []
+        for _ in range(n):
+            row = {'round_number': self.rng.randint(1, 7), 'player_card_id': self.rng.randint(1, 4),
+                   'computer_card_id': self.rng.randint(1, 4), 'outcome': self.rng.choice(['win', 'loss']),
+                   'batting_team': self.rng.choice(['player', 'computer']), 'innings': self.rng.randint(1, 2),
+                   'wickets': self.rng.randint(0, 3)}
+            lines.append(','.join(str(row.get(field, '')) for field in round_log.FIELDS))
+        with open(self.history, 'a') as f:
+            f.write('\n'.join(lines) + ('\n' if newline else ''))
+
+    def _checkpoint(self):
+        return ai_model.read_checkpoint()
+
+    def test_first_run_trains_everything_and_checkpoints_the_end(self):
+        self.assertEqual(ai_model.train_incremental(), 'full retrain (no checkpoint)')
+        checkpoint = self._checkpoint()
+        self.assertEqual((checkpoint['offset'], checkpoint['rows']), (os.path.getsize(self.history), 300))
+
+    def test_too_few_new_rows_wait(self):
+        ai_model.train_incremental()
+        before = self._checkpoint()
+        self._append(50)
+        self.assertEqual(ai_model.train_incremental(min_rows=200), 'waiting: 50 new rows (< 200)')
+        self.assertEqual(self._checkpoint(), before)
+
+    def test_new_rows_grow_trees_and_move_the_checkpoint(self):
+        ai_model.train_incremental()
+        self._append(250)
+        self._append(1, newline=False)       # a row still being written is left for next time
+        status = ai_model.train_incremental(min_rows=200, trees=20)
+
+        self.assertTrue(status.startswith('+20 trees on 250 new rows'), status)
+        checkpoint = self._checkpoint()
+        self.assertEqual((checkpoint['rows'], checkpoint['trees']), (550, 220))
+        with open(self.history, 'rb') as f:
+            self.assertEqual(checkpoint['offset'], round_log.complete_end(f))
+            self.assertLess(checkpoint['offset'], os.path.getsize(self.history))
+            self.assertEqual(checkpoint['anchor'], round_log.line_anchor(f, checkpoint['offset']))
+
+    def test_oldest_trees_are_dropped_past_max_trees(self):
+        ai_model.train_incremental()
+        self._append(250)
+        ai_model.train_incremental(min_rows=200, trees=20, max_trees=210)
+
+        model = ai_model.joblib.load(ai_model.MODEL_FILE)
+        self.assertEqual((model.n_estimators, len(model.estimators_)), (210, 210))
+        self.assertEqual(self._checkpoint()['trees'], 210)
+
+    def test_rewritten_history_retrains_from_scratch(self):
+        ai_model.train_incremental()
+        with open(self.history, 'r+b') as f:          # same length, different last line
+            f.seek(-2, os.SEEK_END)
+            f.write(b'9\n')
+        self._append(250)
+        self.assertEqual(ai_model.train_incremental(), 'full retrain (history file was rewritten)')
+        self.assertEqual(self._checkpoint()['rows'], 550)
+
+    def test_truncated_history_retrains_from_scratch(self):
+        ai_model.train_incremental()
+        with open(self.history, 'r+b') as f:
+            f.truncate(os.path.getsize(self.history) // 2)
+        self.assertEqual(ai_model.train_incremental(), 'full retrain (history file was rewritten)')
+
+
+@skipUnless(ai_model.HAS_ML_LIBS, 'pandas / numpy / scikit-learn are not installed')
+class BestAssignmentTests(SimpleTestCase):
+
+    def _plan(self, scores):
+        import numpy as np
+        scores = np.array(scores, dtype=float)     # (rounds, candidates), player's card only
+        with mock.patch.object(ai_model, 'get_model', return_value=object()), \
+                mock.patch.object(ai_model, 'score_rounds', return_value=scores[:, None, :]):
+            return ai_model.best_assignment(1, [10, 20, 30], innings=1, round_number=5, last_round=7)
+
+    def test_keeps_a_card_back_for_a_later_round(self):
+        # Card 20 is a little better now but far better in round 6.
+        card, prob, plan = self._plan([[0.6, 0.7, 0.1], [0.1, 0.9, 0.2], [0.1, 0.1, 0.5]])
+        self.assertEqual((card, plan), (10, {5: 10, 6: 20, 7: 30}))
+        self.assertAlmostEqual(prob, 0.6)
+
+    def test_greedy_fallback_without_scipy(self):
+        with mock.patch.object(ai_model, 'HAS_SCIPY', False):
+            card, prob, plan = self._plan([[0.6, 0.7, 0.1], [0.1, 0.9, 0.2], [0.1, 0.1, 0.5]])
+        self.assertEqual((card, plan), (10, {5: 10, 6: 20, 7: 30}))
+        self.assertEqual(sorted(plan.values()), [10, 20, 30])
+
+
+class RoundLogTests(SimpleTestCase):
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = os.path.join(tmp.name, 'game_history.csv')
+        patcher = mock.patch.object(round_log, 'HISTORY_FILE', self.path)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        round_log._checked = None
+
+    def _row(self, n, outcome='win'):
+        return {'round_number': n, 'player_card_id': n, 'computer_card_id': 100 + n, 'outcome': outcome}
+
+    def _rewrite(self, rows):
+        """Replace the file the way ensure_header does (new inode)."""
+        round_log._write_rows(rows, round_log.FIELDS)
+
+    def test_append_creates_header_and_tail_reads_last_rows(self):
+        for n in range(1, 6):
+            round_log.append(self._row(n))
+        with open(self.path, encoding='utf-8') as f:
+            self.assertEqual(f.readline().strip().split(','), round_log.FIELDS)
+        self.assertEqual([r['round_number'] for r in round_log.tail(2)], ['4', '5'])
+        self.assertEqual(len(round_log.tail(50)), 5)
+
+    def test_follower_reads_only_new_rows(self):
+        follower = round_log.Follower(self.path)
+        round_log.append(self._row(1))
+        rows, reset = follower.poll()
+        self.assertEqual(([r['round_number'] for r in rows], reset), (['1'], False))
+
+        round_log.append(self._row(2))
+        round_log.append(self._row(3))
+        rows, reset = follower.poll()
+        self.assertEqual(([r['round_number'] for r in rows], reset), (['2', '3'], False))
+        self.assertEqual(follower.poll(), ([], False))
+
+    def test_follower_resets_when_file_is_replaced(self):
+        follower = round_log.Follower(self.path)
+        round_log.append(self._row(1))
+        round_log.append(self._row(2))
+        follower.poll()
+
+        self._rewrite([self._row(7, 'loss')])
+        rows, reset = follower.poll()
+        self.assertTrue(reset)
+        self.assertEqual([(r['round_number'], r['outcome']) for r in rows], [('7', 'loss')])
+
+    def test_follower_resets_when_rewritten_in_place(self):
+        follower = round_log.Follower(self.path)
+        round_log.append(self._row(1))
+        round_log.append(self._row(2))
+        follower.poll()
+
+        # Same inode, same length, different last line: only the anchor hash can tell.
+        with open(self.path, 'r+b') as f:
+            data = f.read()
+            f.seek(0)
+            f.write(data.replace(b',win,', b',wix,'))
+        rows, reset = follower.poll()
+        self.assertTrue(reset)
+        self.assertEqual([r['outcome'] for r in rows], ['wix', 'wix'])
+
+    def test_follower_ignores_a_partly_written_line(self):
+        follower = round_log.Follower(self.path)
+        round_log.append(self._row(1))
+        with open(self.path, 'ab') as f:
+            f.write(b'2,2,,102')
+        rows, _ = follower.poll()
+        self.assertEqual([r['round_number'] for r in rows], ['1'])
+        with open(self.path, 'ab') as f:
+            f.write(b',,win,,,,,\n')
+        rows, reset = follower.poll()
+        self.assertEqual(([r['round_number'] for r in rows], reset), (['2'], False))
+
+
+class StrategyTableTests(SimpleTestCase):
+    """Counters live in the cache, seeded from the round log; strategies.csv changes only on a flip."""
+
+    def setUp(self):
+        cache.clear()
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.csv = os.path.join(tmp.name, 'strategies.csv')
+        for patcher in (mock.patch.object(round_log, 'HISTORY_FILE', os.path.join(tmp.name, 'game_history.csv')),
+                        mock.patch.object(strategy_table, 'STRATEGIES_FILE', self.csv),
+                        mock.patch.object(strategy_table, '_strategies', None),
+                        mock.patch('builtins.print')):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        round_log._checked = None
+
+    def _play(self, player_card_id, strategy, outcome):
+        """What the single-player view does: log the round, then count it."""
+        round_log.append({'player_card_id': player_card_id, 'computer_name': strategy, 'outcome': outcome})
+        strategy_table.record_round(player_card_id, strategy, outcome)
+
+    def test_counters_are_seeded_from_the_log(self):
+        round_log.append({'player_card_id': 2, 'computer_name': 'high_bowling', 'outcome': 'win'})
+        round_log.append({'player_card_id': 2, 'computer_name': 'high_bowling', 'outcome': 'loss'})
+        self._play(4, 'high_bowling', 'win')
+        self._play(4, 'balanced', 'loss')
+
+        self.assertEqual(strategy_table.counts('high_batting'),
+                         ({'balanced': 0, 'high_batting': 0, 'high_bowling': 2},
+                          {'balanced': 1, 'high_batting': 0, 'high_bowling': 1}))
+
+    def test_one_evicted_counter_reseeds_instead_of_restarting_from_zero(self):
+        for _ in range(3):
+            self._play(2, 'high_bowling', 'win')
+        cache.delete(strategy_table._counter_key('win', 'high_batting', 'high_bowling'))
+        self._play(2, 'high_bowling', 'win')
+        self.assertEqual(strategy_table.counts('high_batting')[0]['high_bowling'], 4)
+
+        cache.delete(strategy_table._counter_key('loss', 'high_batting', 'balanced'))
+        self.assertEqual(strategy_table.counts('high_batting')[0]['high_bowling'], 4)
+
+    def test_csv_is_rewritten_only_when_the_pick_flips(self):
+        strategy_table.get()
+        with mock.patch.object(strategy_table, '_write', wraps=strategy_table._write) as write:
+            for outcome in ('win', 'loss', 'loss', 'win'):
+                self._play(2, 'high_bowling', outcome)
+            write.assert_not_called()
+
+            for _ in range(2):
+                self._play(2, 'high_bowling', 'loss')    # 4 losses > 2 wins: high_batting's counter flips
+            self.assertEqual(write.call_count, 1)
+
+        self.assertNotEqual(strategy_table.get()['high_batting'], 'high_bowling')
+        with open(self.csv, newline='', encoding='utf-8') as f:
+            self.assertEqual({row['player_profile']: row['best_counter'] for row in csv.DictReader(f)},
+                             strategy_table.get())
+
+
+@override_settings(ALLOWED_HOSTS=['testserver'], STATE_FLUSH_INTERVAL=60)
+class MatchStatsTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.p1, self.p2 = _user('alice'), _user('bob')
+        self.room = GameRoom.objects.create(
+            code='STATS1', player1=self.p1, player2=self.p2, status='live',
+            state=MatchState({'winner': 'player2', 'game_over': True,
+                              'scores': {'player1': 40, 'player2': 41}}).to_json(),
+        )
+
+    def _finish(self, room):
+        """What mp_result does once it has the final state."""
+        state = MatchState.from_json(room.state)
+        room.status = 'completed'
+        room.record_result(state)
+        room.save(update_fields=['state', 'status', *GameRoom.RESULT_FIELDS])
+        return stats.finalize_match(room)
+
+    def _client(self, user):
+        client = Client()
+        client.force_login(user)
+        return client
+
+    def test_finalize_counts_a_match_once(self):
+        self.assertTrue(self._finish(self.room))
+        self.assertFalse(self._finish(self.room))
+        self.assertFalse(self._finish(GameRoom.objects.get(pk=self.room.pk)))
+
+        p1, p2 = PlayerStats.objects.get(user=self.p1), PlayerStats.objects.get(user=self.p2)
+        self.assertEqual((p1.wins, p1.losses, p1.matches), (0, 1, 1))
+        self.assertEqual((p2.wins, p2.losses, p2.matches), (1, 0, 1))
+        self.assertEqual(p2.recent[0]['code'], 'STATS1')
+        self.assertEqual((p2.recent[0]['my_score'], p2.recent[0]['opp_score']), (41, 40))
+
+    def test_stale_room_save_does_not_unclaim_the_match(self):
+        stale = GameRoom.objects.get(pk=self.room.pk)       # loaded before the other request finished
+        self.assertTrue(self._finish(GameRoom.objects.get(pk=self.room.pk)))
+        self.assertFalse(self._finish(stale))
+        self.assertTrue(GameRoom.objects.get(pk=self.room.pk).stats_recorded)
+        self.assertEqual(PlayerStats.objects.get(user=self.p2).wins, 1)
+
+    def test_both_players_opening_the_result_page_at_once_count_once(self):
+        url = reverse('mp_result', args=['STATS1'])
+        real_get_state = views.get_game_state
+        other = self._client(self.p2)
+        ran = []
+
+        def other_player_first(code):
+            # The opponent's whole request lands after ours loaded the room.
+            if not ran:
+                ran.append(True)
+                self.assertEqual(other.get(url).status_code, 200)
+            return real_get_state(code)
+
+        with mock.patch.object(views, 'get_game_state', side_effect=other_player_first):
+            self.assertEqual(self._client(self.p1).get(url).status_code, 200)
+
+        self.assertEqual(PlayerStats.objects.get(user=self.p2).wins, 1)
+        self.assertEqual(PlayerStats.objects.get(user=self.p1).losses, 1)
+        room = GameRoom.objects.get(pk=self.room.pk)
+        self.assertEqual((room.winner_role, room.winner_user, room.player2_score), ('player2', self.p2, 41))
+
+    def test_exit_survives_losing_the_cache_entry(self):
+        GameRoom.objects.create(code='EXIT1', player1=self.p1, player2=self.p2, status='live',
+                                state=MatchState({'innings': 1}).to_json())
+        write_behind._dirty.clear()
+        self.addCleanup(write_behind._dirty.clear)
+
+        response = self._client(self.p1).post(reverse('exit_match', args=['EXIT1']))
+        self.assertEqual(response.status_code, 302)
+        write_behind.flush()
+        cache.clear()
+
+        self.assertEqual(self._client(self.p2).get(reverse('mp_result', args=['EXIT1'])).status_code, 200)
+        room = GameRoom.objects.get(code='EXIT1')
+        self.assertEqual((room.status, room.winner_user, room.exit_by), ('completed', self.p2, 'player1'))
+
+    def test_history_migration_fills_deck_usage_and_recent(self):
+        deck = UserDeck.objects.create(user=self.p2, team=Team.objects.create(name='India'), name='Main')
+        GameRoom.objects.filter(pk=self.room.pk).update(player2_deck=deck)
+        self._finish(GameRoom.objects.get(pk=self.room.pk))
+        PlayerStats.objects.update(wins=0, losses=0, matches=0, deck_usage={}, recent=[])   # as 0014 left them
+
+        importlib.import_module('s7app.migrations.0017_fold_playerstats_history').fold_history(django_apps, None)
+
+        p1, p2 = PlayerStats.objects.get(user=self.p1), PlayerStats.objects.get(user=self.p2)
+        self.assertEqual((p2.wins, p2.matches, p2.deck_usage), (1, 1, {'India': 1}))
+        self.assertEqual([(m['code'], m['result']) for m in p2.recent], [('STATS1', 'Win')])
+        self.assertEqual((p1.losses, p1.deck_usage, p1.recent[0]['opponent']), (1, {}, 'bob'))
+
+    def test_backfill_claims_rooms_before_finalize_can(self):
+        room = GameRoom.objects.get(pk=self.room.pk)
+        room.status = 'completed'
+        room.record_result(MatchState.from_json(room.state))
+        room.save()
+
+        call_command('backfill_player_stats', stdout=io.StringIO())
+        self.assertFalse(stats.finalize_match(room))
+        call_command('backfill_player_stats', stdout=io.StringIO())
+
+        self.assertTrue(GameRoom.objects.get(pk=room.pk).stats_recorded)
+        p2 = PlayerStats.objects.get(user=self.p2)
+        self.assertEqual((p2.wins, p2.matches, len(p2.recent)), (1, 1, 1))
+
+    def test_leaderboard_is_an_indexed_read_of_player_stats(self):
+        self._finish(self.room)
+        newcomer = _user('carol')            # row from the post_save signal
+
+        response = self._client(newcomer).get(reverse('leaderboard'))
+
+        self.assertEqual([(row['user'].username, row['wins']) for row in response.context['leaderboard']],
+                         [('bob', 1), ('alice', 0), ('carol', 0)])
+        self.assertEqual(response.context['my_rank'], 3)
+        self.assertEqual(stats.rank_of(self.p2), 1)
+        self.assertIn('playerstats_rank', stats.ranking()[:stats.LEADERBOARD_PAGE_SIZE].explain())
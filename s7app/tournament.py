@@ -0,0 +1,153 @@
+"""
+Round-robin tournaments between many decks, spread over worker processes.
+
+Every pair of decks plays `matches` simulated matches (simulator.simulate).
+Pairings are cut into batches and handed to a ProcessPoolExecutor; each
+worker gets the deck arrays once (pool initializer) and returns one small
+block of columns per batch, so throughput grows with the number of cores.
+
+Results stream to a columnar msgpack file as batches finish:
+
+    frame 0   header  {'format', 'version', 'matches', 'seed', 'decks': [{'label', 'cards'}]}
+    frame 1+  columns {'a', 'b', 'wins_a', 'wins_b', 'ties'}, each raw little-endian int32
+
+    header, columns = read_results(path)   # columns as NumPy arrays
+
+legal_decks() enumerates every deck build_deck would accept from a set of
+cards: 7-9 cards, total weightage at most 32.
+"""
+import itertools
+import os
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import msgpack
+
+from . import simulator
+
+FORMAT = 's7-tournament'
+VERSION = 1
+COLUMNS = ('a', 'b', 'wins_a', 'wins_b', 'ties')
+
+MAX_WEIGHTAGE = 32
+DECK_SIZES = (7, 8, 9)
+
+# label: how the deck is shown; cards: CardRecords (picklable, sent to workers once)
+TournamentDeck = namedtuple('TournamentDeck', ['label', 'cards'])
+
+
+def legal_decks(cards, max_weightage=MAX_WEIGHTAGE, sizes=DECK_SIZES):
+    """Every subset of `cards` that is a legal deck, as tuples ordered by card id."""
+    cards = sorted(cards, key=lambda c: c.id)
+    decks = []
+    for size in sizes:
+        for combo in itertools.combinations(cards, size):
+            if sum(c.weightage for c in combo) <= max_weightage:
+                decks.append(combo)
+    return decks
+
+
+# ─── worker side ─────────────────────────────────────────────────────────────
+
+_worker_decks = None
+
+
+def _init_worker(decks):
+    global _worker_decks
+    _worker_decks = [simulator.deck_arrays(d.cards) for d in decks]
+
+
+def _play_batch(pairs, matches, seed, chunk):
+    np = simulator.np
+    rng = np.random.default_rng(seed)
+    cols = {name: np.empty(len(pairs), dtype='<i4') for name in COLUMNS}
+    for row, (a, b) in enumerate(pairs):
+        result = simulator.simulate(_worker_decks[a], _worker_decks[b], matches, seed=rng, chunk=chunk)
+        cols['a'][row] = a
+        cols['b'][row] = b
+        cols['wins_a'][row] = result.wins_a
+        cols['wins_b'][row] = result.wins_b
+        cols['ties'][row] = result.ties
+    return {name: col.tobytes() for name, col in cols.items()}
+
+
+# ─── driver ──────────────────────────────────────────────────────────────────
+
+def run(decks, matches, path, workers=None, seed=None, batch_pairs=None,
+        chunk=simulator.DEFAULT_CHUNK, progress=None):
+    """
+    Play the round robin and stream it to `path`. `progress(done, total)` is
+    called after each batch. Returns (pairings, seconds).
+    """
+    if not simulator.HAS_NUMPY:
+        raise RuntimeError("NumPy is not available: install numpy to run tournaments")
+    np = simulator.np
+    workers = workers or os.cpu_count() or 1
+    pairs = list(itertools.combinations(range(len(decks)), 2))
+    if batch_pairs is None:
+        # A few batches per worker keeps every core busy to the end.
+        batch_pairs = max(1, min(256, len(pairs) // (workers * 4) or 1))
+    batches = [pairs[i:i + batch_pairs] for i in range(0, len(pairs), batch_pairs)]
+    seeds = np.random.SeedSequence(seed).spawn(len(batches))
+
+    header = {
+        'format':  FORMAT,
+        'version': VERSION,
+        'matches': matches,
+        'seed':    seed,
+        'decks':   [{'label': d.label, 'cards': [c.id for c in d.cards]} for d in decks],
+    }
+
+    _start = time.time()
+    done = 0
+    tmp_path = path + '.part'
+    with open(tmp_path, 'wb') as out, ProcessPoolExecutor(
+        max_workers=workers, initializer=_init_worker, initargs=(decks,)
+    ) as pool:
+        out.write(msgpack.packb(header, use_bin_type=True))
+        futures = [
+            pool.submit(_play_batch, batch, matches, batch_seed, chunk)
+            for batch, batch_seed in zip(batches, seeds)
+        ]
+        for future in as_completed(futures):
+            out.write(msgpack.packb(future.result(), use_bin_type=True))
+            done += 1
+            if progress is not None:
+                progress(done, len(batches))
+    os.replace(tmp_path, path)
+    return len(pairs), time.time() - _start
+
+
+def read_results(path):
+    """(header, {column: int32 array}) from a file written by run()."""
+    np = simulator.np
+    with open(path, 'rb') as f:
+        unpacker = msgpack.Unpacker(f, raw=False)
+        header = next(unpacker)
+        if header.get('format') != FORMAT:
+            raise ValueError(f'{path} is not a tournament results file')
+        parts = {name: [] for name in COLUMNS}
+        for block in unpacker:
+            for name in COLUMNS:
+                parts[name].append(np.frombuffer(block[name], dtype='<i4'))
+    columns = {
+        name: np.concatenate(chunks) if chunks else np.empty(0, dtype='<i4')
+        for name, chunks in parts.items()
+    }
+    return header, columns
+
+
+def deck_win_rates(header, columns):
+    """Each deck's win rate over all its pairings (ties = half)."""
+    np = simulator.np
+    n_decks = len(header['decks'])
+    total = columns['wins_a'] + columns['wins_b'] + columns['ties']
+    points = np.zeros(n_decks)
+    played = np.zeros(n_decks)
+    half_ties = 0.5 * columns['ties']
+    np.add.at(points, columns['a'], columns['wins_a'] + half_ties)
+    np.add.at(points, columns['b'], columns['wins_b'] + half_ties)
+    np.add.at(played, columns['a'], total)
+    np.add.at(played, columns['b'], total)
+    return np.divide(points, played, out=np.zeros(n_decks), where=played > 0)
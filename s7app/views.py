@@ -1,152 +1,31 @@
-import contextlib
-import code
-import csv
-from urllib import request
-from urllib import request
-from django.shortcuts import render, redirect
 import random
-from .models import DeckCard, GameRoom, PlayerCard, UserDeck, UserPrizeCard
-import os
+import string
+import time
 from datetime import datetime
-from collections import defaultdict
-from .game_cache import get_game_state, save_game_state, delete_game_state
-from s7app import models
-
-# ML code moved to ai_model.py and imported lazily inside game_start
-# Load strategies from CSV
-BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-STRATEGIES_FILE = os.path.join(BASE_DIR, 's7app', 'strategies.csv')
-HISTORY_FILE = os.path.join(BASE_DIR, 's7app', 'game_history.csv')
-MODEL_FILE = os.path.join(BASE_DIR, 's7app', 'card_model.joblib')
-OPTIMAL_COUNTERS = {
-    'high_bowling': lambda cards: max(cards, key=lambda x: x.batting + x.runs),
-    'high_batting': lambda cards: max(cards, key=lambda x: x.bowling),
-    'balanced': lambda cards: max(cards, key=lambda x: (x.bowling + x.batting + x.runs) / 3),
-}
-strategies = {}
-if os.path.exists(STRATEGIES_FILE):
-    with open(STRATEGIES_FILE, newline='', encoding='utf-8') as csvfile:
-        reader = csv.DictReader(csvfile)
-        for row in reader:
-            strategies[row['player_profile']] = row['best_counter']
-else:
-    # default strategies file creation
-    with open(STRATEGIES_FILE, 'w', newline='', encoding='utf-8') as csvfile:
-        writer = csv.DictWriter(csvfile, fieldnames=['player_profile', 'best_counter'])
-        writer.writeheader()
-        writer.writerow({'player_profile': 'high_batting', 'best_counter': 'high_bowling'})
-        writer.writerow({'player_profile': 'high_bowling', 'best_counter': 'high_batting'})
-        writer.writerow({'player_profile': 'balanced', 'best_counter': 'balanced'})
-    strategies = {'high_batting': 'high_bowling', 'high_bowling': 'high_batting', 'balanced': 'balanced'}
-
-# Initialize game_history.csv with full headers if it doesn't exist
-if not os.path.exists(HISTORY_FILE):
-    with open(HISTORY_FILE, 'w', newline='', encoding='utf-8') as csvfile:
-        writer = csv.DictWriter(csvfile, fieldnames=[
-            'round_number', 'player_card_id', 'player_name', 'computer_card_id', 'computer_name',
-            'outcome', 'score', 'wickets', 'batting_team', 'innings', 'round_timestamp'
-        ])
-        writer.writeheader()
-
-def ensure_history_headers():
-    """Ensure HISTORY_FILE has the expected headers. If headers mismatch attempt to remap common variants and rewrite file."""
-    desired = ['round_number', 'player_card_id', 'player_name', 'computer_card_id', 'computer_name',
-               'outcome', 'score', 'wickets', 'batting_team', 'innings', 'round_timestamp']
-    if not os.path.exists(HISTORY_FILE):
-        with open(HISTORY_FILE, 'w', newline='', encoding='utf-8') as f:
-            writer = csv.DictWriter(f, fieldnames=desired)
-            writer.writeheader()
-        return
-
-    # Read existing file
-    try:
-        with open(HISTORY_FILE, newline='', encoding='utf-8') as f:
-            reader = csv.reader(f)
-            rows = list(reader)
-    except Exception:
-        rows = []
-
-    if not rows:
-        with open(HISTORY_FILE, 'w', newline='', encoding='utf-8') as f:
-            writer = csv.DictWriter(f, fieldnames=desired)
-            writer.writeheader()
-        return
-
-    existing_header = rows[0]
-    # if desired header is already present (subset), nothing to do
-    if set(desired).issubset(set(existing_header)):
-        return
-
-    # Try to read with DictReader and remap known timestamp variants
-    try:
-        with open(HISTORY_FILE, newline='', encoding='utf-8') as f:
-            old_rows = list(csv.DictReader(f))
-    except Exception:
-        old_rows = []
-
-    new_rows = []
-    for r in old_rows:
-        new_r = {k: '' for k in desired}
-        # copy values for keys that exist
-        for k in desired:
-            if k in r:
-                new_r[k] = r.get(k, '')
-        # common mappings: 'timestamp' or 'timestamp1' => 'round_timestamp'
-        if not new_r.get('round_timestamp'):
-            if 'timestamp' in r:
-                new_r['round_timestamp'] = r.get('timestamp', '')
-            elif 'timestamp1' in r:
-                new_r['round_timestamp'] = r.get('timestamp1', '')
-        # best-effort: if batting_team or innings missing, leave blank/default
-        new_rows.append(new_r)
-
-    # rewrite file with desired header and remapped rows
-    try:
-        with open(HISTORY_FILE, 'w', newline='', encoding='utf-8') as f:
-            writer = csv.DictWriter(f, fieldnames=desired)
-            writer.writeheader()
-            for nr in new_rows:
-                writer.writerow(nr)
-    except Exception:
-        # last-resort: overwrite with just header to avoid future ValueError
-        with open(HISTORY_FILE, 'w', newline='', encoding='utf-8') as f:
-            writer = csv.DictWriter(f, fieldnames=desired)
-            writer.writeheader()
-
-def analyze_history_and_update_strategy():
-    win_counts = defaultdict(lambda: defaultdict(int))
-    loss_counts = defaultdict(lambda: defaultdict(int))
-    if os.path.exists(HISTORY_FILE):
-        with open(HISTORY_FILE, newline='', encoding='utf-8') as csvfile:
-            reader = csv.DictReader(csvfile)
-            for row in reader:
-                player_profile = 'high_batting' if int(row['player_card_id']) % 2 == 0 else 'balanced'
-                computer_strategy = row['computer_name'] or 'N/A'
-                if row['outcome'] == 'win':
-                    win_counts[player_profile][computer_strategy] += 1
-                else:
-                    loss_counts[player_profile][computer_strategy] += 1
-
-    new_strategies = {}
-    for profile in strategies:
-        current_counter = strategies[profile]
-        wins = win_counts[profile][current_counter]
-        losses = loss_counts[profile][current_counter]
-        if losses > wins and losses > 2:
-            alt_strategies = [s for s in OPTIMAL_COUNTERS.keys() if s != current_counter]
-            best_alt = min(alt_strategies, key=lambda s: loss_counts[profile].get(s, 0), default=current_counter)
-            new_strategies[profile] = best_alt
-        else:
-            new_strategies[profile] = current_counter
-
-    with open(STRATEGIES_FILE, 'w', newline='', encoding='utf-8') as csvfile:
-        writer = csv.DictWriter(csvfile, fieldnames=['player_profile', 'best_counter'])
-        writer.writeheader()
-        for profile, counter in new_strategies.items():
-            writer.writerow({'player_profile': profile, 'best_counter': counter})
-    # update in-memory strategies
-    strategies.update(new_strategies)
 
+from asgiref.sync import async_to_sync, sync_to_async
+from channels.layers import get_channel_layer
+from django.contrib import messages
+from django.contrib.auth import authenticate, login as auth_login, logout as auth_logout
+from django.contrib.auth.decorators import login_required
+from django.contrib.auth.forms import UserCreationForm
+from django.db import transaction
+from django.db.models import Q
+from django.http import Http404, HttpResponse, JsonResponse
+from django.middleware.csrf import get_token
+from django.shortcuts import get_object_or_404, redirect, render
+from django.utils.dateparse import parse_datetime
+
+from . import engine, live_updates, round_log, stats, strategy_table, write_behind
+from .card_catalog import deck_cards, deck_snapshot, get_card, get_catalog
+from .game_cache import get_game_state, delete_game_state
+from .game_cache import aget_game_state, aupdate_game_state
+from .match_state import MatchState
+from .models import DeckCard, GameRoom, PlayerCard, PlayerStats, SupportCard, Team, UserDeck, UserPrizeCard
+from .strategy_table import OPTIMAL_COUNTERS
+
+# Nothing here touches the disk at import: the strategy table and the round
+# log are opened on first use (strategy_table.get(), round_log.append()).
 # keep ML-heavy helpers in ai_model; do lazy import inside view to avoid ModuleNotFoundError at import time
 
 def toss_view(request):
@@ -171,16 +50,16 @@ def toss_view(request):
     return render(request, "toss.html")
 
 def game_start(request):
-    analyze_history_and_update_strategy()
 
     # Lazy import ai_model here so module import doesn't fail if ai_model.py missing
     try:
-        from .ai_model import predict_best_card, load_model
+        from .ai_model import best_assignment, is_model_ready
         model_module_available = True
     except Exception:
-        predict_best_card = None
-        load_model = None
+        best_assignment = None
+        is_model_ready = None
         model_module_available = False
+    from . import opponent
 
     # Initialize / reset session
     if 'innings' not in request.session or request.method == "POST" and 'batting_first' in request.POST:
@@ -216,24 +95,38 @@ def game_start(request):
         # compute player profile and counter strategy for fallback
         player_batting_weight = player_card.batting / (player_card.batting + player_card.bowling + 1)
         player_profile = 'high_batting' if player_batting_weight > 0.6 else 'high_bowling' if player_card.bowling > player_card.batting else 'balanced'
-        counter_strategy = strategies.get(player_profile, 'balanced')
+        counter_strategy = strategy_table.get().get(player_profile, 'balanced')
 
         model_ready = False
         if model_module_available:
             try:
-                model_ready = load_model() is not None
+                model_ready = is_model_ready()
             except Exception:
                 model_ready = False
 
+        search = None
+        if available_for_computer and opponent.budget_ms() > 0:
+            try:
+                search = opponent.choose_card(
+                    innings, round_number, batting_first, used_by_player, used_by_computer,
+                    request.session['scores'], player_card.id, [c.id for c in available_for_computer],
+                )
+            except Exception as e:
+                print(f"❌ OPPONENT SEARCH FAILED: {e}")
+
         computer_card = None
         if not available_for_computer:
             computer_card = None
+        elif search is not None:
+            computer_card = next(c for c in available_for_computer if c.id == search.card_id)
         elif batting_team == 'computer':
             computer_card = max(available_for_computer, key=lambda x: x.batting + x.runs)
-        elif model_ready and predict_best_card is not None:
+        elif model_ready and best_assignment is not None:
             candidate_ids = [c.id for c in available_for_computer]
+            # Plan the rest of the innings against the player's remaining cards; only this round's pick is used.
+            player_hand = [i for i in get_catalog() if i not in used_by_player]
             try:
-                best_id, prob = predict_best_card(player_card.id, candidate_ids, innings=innings, round_number=round_number, wickets=request.session['wickets'].get(batting_team, 0))
+                best_id, prob, _plan = best_assignment(player_card.id, candidate_ids, player_hand, innings=innings, round_number=round_number, wickets=request.session['wickets'].get(batting_team, 0))
                 if best_id:
                     computer_card = PlayerCard.objects.get(id=best_id)
             except Exception:
@@ -271,25 +164,20 @@ def game_start(request):
                 round_outcome = 'loss'
             request.session['message'] = message
 
-            ensure_history_headers()   # <-- add this before appending a new row
-            with open(HISTORY_FILE, 'a', newline='', encoding='utf-8') as csvfile:
-                writer = csv.DictWriter(csvfile, fieldnames=[
-                    'round_number', 'player_card_id', 'player_name', 'computer_card_id', 'computer_name',
-                    'outcome', 'score', 'wickets', 'batting_team', 'innings', 'round_timestamp'
-                ])
-                writer.writerow({
-                    'round_number': round_number,
-                    'player_card_id': player_card.id,
-                    'player_name': player_card.name,
-                    'computer_card_id': computer_card.id if computer_card else None,
-                    'computer_name': computer_card.name if computer_card else 'N/A',
-                    'outcome': round_outcome,
-                    'score': request.session['scores'][batting_team],
-                    'wickets': request.session['wickets'][batting_team],
-                    'batting_team': batting_team,
-                    'innings': request.session.get('innings', 1),
-                    'round_timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                })
+            round_log.append({
+                'round_number': round_number,
+                'player_card_id': player_card.id,
+                'player_name': player_card.name,
+                'computer_card_id': computer_card.id if computer_card else None,
+                'computer_name': computer_card.name if computer_card else 'N/A',
+                'outcome': round_outcome,
+                'score': request.session['scores'][batting_team],
+                'wickets': request.session['wickets'][batting_team],
+                'batting_team': batting_team,
+                'innings': request.session.get('innings', 1),
+                'round_timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            })
+            strategy_table.record_round(player_card.id, computer_card.name if computer_card else 'N/A', round_outcome)
 
             request.session['last_batter'] = {
                 'name': batter.name,
@@ -369,12 +257,7 @@ def game_start(request):
     if 'last_batter' in request.session:
         context['last_batter'] = request.session['last_batter']
         context['last_bowler'] = request.session['last_bowler']
-    game_history = []
-    if os.path.exists(HISTORY_FILE):
-        with open(HISTORY_FILE, newline='', encoding='utf-8') as csvfile:
-            reader = csv.DictReader(csvfile)
-            game_history = list(reader)[-10:]
-    context['game_history'] = game_history
+    context['game_history'] = round_log.tail(10)
     return render(request, "game.html", context)
 
 
@@ -382,8 +265,6 @@ def game_start(request):
 
 
 # game/views.py (new views)
-import random, string
-from django.contrib.auth.decorators import login_required
 
 
 def create_room(request):
@@ -407,10 +288,6 @@ def join_room(request, code):
     return redirect('game_room', code=code)
 
 
-from django.contrib.auth.forms import UserCreationForm
-from django.contrib.auth import login as auth_login, logout as auth_logout, authenticate
-from django.shortcuts import render, redirect
-from django.contrib import messages
 
 def register(request):
     if request.user.is_authenticated:
@@ -450,12 +327,6 @@ def logout_view(request):
     return redirect('landing')
 
 
-import random
-import string
-from django.shortcuts import render, redirect, get_object_or_404
-from django.contrib.auth.decorators import login_required
-from django.contrib.auth.models import User
-from .models import GameRoom, PlayerCard
 
 
 # ─── helpers ────────────────────────────────────────────────────────────────
@@ -466,7 +337,7 @@ def _make_code(length=6):
 
 def _my_role(request, room):
     """Returns 'player1' or 'player2' based on who is logged in."""
-    if request.user == room.player1:
+    if request.user.id == room.player1_id:
         return 'player1'
     return 'player2'
 
@@ -479,6 +350,31 @@ def _get_player(room, role):
     return room.player1 if role == 'player1' else room.player2
 
 
+# ── async match views ────────────────────────────────────────
+# mp_toss, mp_toss_result, mp_game and exit_match run on the ASGI event loop:
+# state goes through the async cache client, group_send is awaited directly,
+# and ORM/template work is batched into sync_to_async calls.
+
+async def _aget_room(code):
+    """get_object_or_404 for async views, with both players joined in."""
+    try:
+        return await GameRoom.objects.select_related('player1', 'player2').aget(code=code)
+    except GameRoom.DoesNotExist:
+        raise Http404(f'No GameRoom with code {code}')
+
+
+async def _aresolve_user(request):
+    """Swap the lazy request.user for the loaded user so _my_role/templates don't query."""
+    request.user = await request.auser()
+
+
+async def _agroup_send(code, event, what):
+    try:
+        await get_channel_layer().group_send(f"s7app_{code}", event)
+    except Exception as e:
+        print(f"{what} notify failed: {e}")
+
+
 # ─── lobby ──────────────────────────────────────────────────────────────────
 @login_required
 def lobby(request):
@@ -570,8 +466,6 @@ def join_room(request):
             room.player2_deck = active_deck
             room.save()
         try:
-            from asgiref.sync import async_to_sync
-            from channels.layers import get_channel_layer
             channel_layer = get_channel_layer()
             async_to_sync(channel_layer.group_send)(
                 f"s7app_{code}",
@@ -604,9 +498,10 @@ def waiting_room(request, code):
 # ─── toss ────────────────────────────────────────────────────────────────────
 
 @login_required
-def mp_toss(request, code):
-    room = get_object_or_404(GameRoom, code=code)
-    state = get_game_state(code)
+async def mp_toss(request, code):
+    await _aresolve_user(request)
+    room = await _aget_room(code)
+    state = await aget_game_state(code)
     my_role = _my_role(request, room)
     is_toss_caller = (my_role == 'player1')
 
@@ -618,45 +513,35 @@ def mp_toss(request, code):
         result = random.choice(['heads', 'tails'])
         toss_winner = 'player1' if choice == result else 'player2'
 
-        state['toss_result'] = result
-        state['toss_winner'] = toss_winner
-        state['toss_done'] = True
-        save_game_state(room.code, state, save_to_db=False)
-        try:
-            from asgiref.sync import async_to_sync
-            from channels.layers import get_channel_layer
-            channel_layer = get_channel_layer()
-            async_to_sync(channel_layer.group_send)(
-                f"s7app_{code}",
-                {
-                    "type": "toss_result",
-                    "action": "reload",
-                }
-            )
-        except Exception as e:
-            print(f"Toss notify failed: {e}")
+        def call_toss(st):
+            if st.get('toss_done'):
+                return
+            st['toss_result'] = result
+            st['toss_winner'] = toss_winner
+            st['toss_done'] = True
+        await aupdate_game_state(room.code, call_toss, state=state)
+        await _agroup_send(code, {
+            "type": "toss_result",
+            "action": "reload",
+        }, 'Toss')
 
         return redirect('mp_toss_result', code=code)
 
     if state.get('toss_done'):
         return redirect('mp_toss_result', code=code)
 
-    # ── Get both decks ──────────────────────────────
-    p1_deck = UserDeck.objects.filter(user=room.player1, is_active=True).first()
-    p2_deck = UserDeck.objects.filter(
-        user=room.player2, is_active=True
-    ).first() if room.player2 else None
+    return await sync_to_async(_render_toss)(request, room, is_toss_caller)
 
-    p1_cards = []
-    p2_cards = []
 
-    if p1_deck:
-        p1_ids = DeckCard.objects.filter(deck=p1_deck).values_list('player_card_id', flat=True)
-        p1_cards = list(PlayerCard.objects.filter(id__in=p1_ids))
+def _render_toss(request, room, is_toss_caller):
+    # ── Get both decks — the ones they joined the room with ──
+    p1_deck = UserDeck.objects.select_related('team').filter(id=_room_deck_id(room, 'player1')).first()
+    p2_deck = UserDeck.objects.select_related('team').filter(
+        id=_room_deck_id(room, 'player2')
+    ).first() if room.player2_id else None
 
-    if p2_deck:
-        p2_ids = DeckCard.objects.filter(deck=p2_deck).values_list('player_card_id', flat=True)
-        p2_cards = list(PlayerCard.objects.filter(id__in=p2_ids))
+    p1_cards = deck_cards(p1_deck.id) if p1_deck else []
+    p2_cards = deck_cards(p2_deck.id) if p2_deck else []
 
     return render(request, 'mp_toss.html', {
         'room': room,
@@ -669,10 +554,18 @@ def mp_toss(request, code):
 
 # ─── toss result ─────────────────────────────────────────────────────────────
 
+def _room_deck_snapshots(room):
+    return (
+        deck_snapshot(_room_deck_id(room, 'player1')),
+        deck_snapshot(_room_deck_id(room, 'player2')),
+    )
+
+
 @login_required
-def mp_toss_result(request, code):
-    room = get_object_or_404(GameRoom, code=code)
-    state = get_game_state(code)
+async def mp_toss_result(request, code):
+    await _aresolve_user(request)
+    room = await _aget_room(code)
+    state = await aget_game_state(code)
 
     # Wait if toss not done yet
     if not state.get('toss_done'):
@@ -688,29 +581,27 @@ def mp_toss_result(request, code):
             return redirect('mp_toss_result', code=code)
 
         batting_first = request.POST.get('batting_first')  # 'player1' or 'player2'
-        state['batting_first'] = batting_first
-        state['innings'] = 1
-        state['round_number'] = 1
-        state['scores'] = {'player1': 0, 'player2': 0}
-        state['wickets'] = {'player1': 0, 'player2': 0}
-        state['used_by_player1'] = []
-        state['used_by_player2'] = []
-        state['message'] = ''
-        state['innings_chosen'] = True
-        save_game_state(room.code, state, save_to_db=False)
-        try:
-            from asgiref.sync import async_to_sync
-            from channels.layers import get_channel_layer
-            channel_layer = get_channel_layer()
-            async_to_sync(channel_layer.group_send)(
-                f"s7app_{code}",
-                {
-                    "type": "innings_chosen",
-                    "action": "redirect_game",
-                }
-            )
-        except Exception as e:
-            print(f"Innings notify failed: {e}")
+        # Freeze both decks now; the match never looks at UserDeck again.
+        p1_snapshot, p2_snapshot = await sync_to_async(_room_deck_snapshots)(room)
+
+        def choose_innings(st):
+            if st.get('innings_chosen'):
+                return
+            st.set_decks(p1_snapshot, p2_snapshot)
+            st['batting_first'] = batting_first
+            st['innings'] = 1
+            st['round_number'] = 1
+            st['scores'] = {'player1': 0, 'player2': 0}
+            st['wickets'] = {'player1': 0, 'player2': 0}
+            st['used_by_player1'] = []
+            st['used_by_player2'] = []
+            st['message'] = ''
+            st['innings_chosen'] = True
+        await aupdate_game_state(room.code, choose_innings, state=state)
+        await _agroup_send(code, {
+            "type": "innings_chosen",
+            "action": "redirect_game",
+        }, 'Innings')
 
         return redirect('mp_game', code=code)
 
@@ -718,7 +609,7 @@ def mp_toss_result(request, code):
     if state.get('innings_chosen'):
         return redirect('mp_game', code=code)
 
-    return render(request, 'mp_toss_result.html', {
+    return await sync_to_async(render)(request, 'mp_toss_result.html', {
         'room': room,
         'toss_result': state.get('toss_result'),
         'i_won_toss': i_won_toss,
@@ -736,17 +627,61 @@ Fixes:
   2. Both players redirected to result at the same time
   3. 10 wickets also ends the game early
 """
-def _resolve_round(room, innings, round_number, batting_team, batting_first):
-    state = get_game_state(room.code)
+def _round_context(state, innings, round_number, batting_team):
+    """What engine.resolve needs to know about the rounds before this one."""
+    recent = state.recent_rounds(innings, round_number)
+    return engine.RoundContext(
+        round_number=round_number,
+        batting_score=state.get('scores', {}).get(batting_team, 0),
+        recent_runs=sum(rec.runs for rec in recent),
+        recent_wicket=any(rec.wicket for rec in recent),
+    )
+
+
+def _outcome_message(kind, runs, suffix=''):
+    if kind == 'runs':
+        return f"Runs added: {runs}!{suffix}"
+    if kind == 'tie':
+        return f"Tie! Partial runs: {runs}!{suffix}"
+    return f"Wicket! 🎯{suffix}"
+
+
+def _apply_match_status(state, innings, batting_team, batting_first, announce=True):
+    """Set innings_transition / game_over(_pending) / winner from engine.match_status."""
+    status = engine.match_status(
+        innings, state['round_number'], batting_team, batting_first,
+        state['scores'], state['wickets'], state.get('target'),
+    )
+    if status.kind == 'chased':
+        state['game_over_pending'] = True
+        state['winner'] = status.winner
+    elif status.kind == 'innings_over':
+        state['innings_transition'] = {
+            'target':      status.first_score + 1,
+            'first_score': status.first_score,
+        }
+        if announce:
+            state['message'] = f"First innings over! Target: {status.first_score + 1}"
+    elif status.kind == 'match_over':
+        state['winner'] = status.winner
+        state['game_over'] = True
+
+
+def _resolve_round(state, innings, round_number, batting_team, batting_first):
+    """
+    Score a round both players have played, mutating `state` in place.
+    Runs inside aupdate_game_state, so it must not read or write the cache
+    itself; the caller saves and then calls _notify_round_resolved.
+    The scoring itself is engine.resolve; this only reads and writes state.
+    """
     if 'scores' not in state:
         state['scores'] = {'player1': 0, 'player2': 0}
     if 'wickets' not in state:
         state['wickets'] = {'player1': 0, 'player2': 0}
-    p1_card_id = state.get(f'player1_played_round_{innings}_{round_number}')
-    p2_card_id = state.get(f'player2_played_round_{innings}_{round_number}')
+    this_round = state.round(innings, round_number)
 
-    p1_card = PlayerCard.objects.get(id=p1_card_id)
-    p2_card = PlayerCard.objects.get(id=p2_card_id)
+    p1_card = state.card(this_round.player1_card)
+    p2_card = state.card(this_round.player2_card)
 
     if batting_team == 'player1':
         batter_card, bowler_card = p1_card, p2_card
@@ -756,796 +691,700 @@ def _resolve_round(room, innings, round_number, batting_team, batting_first):
     batter_role = batting_team
     bowler_role = 'player2' if batting_team == 'player1' else 'player1'
 
-    # ── 0. Check if spin_basher will trigger ──────────────
-    spin_basher_will_trigger = (
-        batter_card.ability == 'spin_basher' 
-        and bowler_card.is_spinner
+    outcome = engine.resolve(
+        batter_card, bowler_card,
+        _round_context(state, innings, round_number, batting_team),
+        batter_boost=state.get(f'{batter_role}_boost_active', False),
+        bowler_boost=state.get(f'{bowler_role}_boost_active', False),
+        batter_support=state.get(f'{batter_role}_support'),
+        bowler_support=state.get(f'{bowler_role}_support'),
     )
 
-    # ── 1. Read boost BEFORE _apply_abilities clears it ──
-    batter_boost_was_active = state.get(f'{batter_role}_boost_active', False)
-    bowler_boost_was_active = state.get(f'{bowler_role}_boost_active', False)
-    
-    # If spin_basher triggers, boost won't be used (show 0)
-    batter_boost_bonus = 10 if (batter_boost_was_active and not spin_basher_will_trigger) else 0
-    bowler_boost_bonus = 10 if bowler_boost_was_active else 0
+    # ── Boosts are spent this round ──────────────────────
+    for role in (batter_role, bowler_role):
+        if state.get(f'{role}_boost_active'):
+            state[f'{role}_boost_active'] = False
+    if outcome.boost_restored:
+        # Spin Basher fired instead — the batter gets the boost back
+        state[f'{batter_role}_boost_used'] = False
 
-    # ── 2. Apply abilities (clears boost_active internally) ──
-    eff_batting, eff_bowling, eff_runs, runs_cutter_active, ability_log = _apply_abilities(
-        batter_card, bowler_card, round_number, state, batting_team
-    )
-    
-    # ── 2.5. Auto-restore boost if spin_basher was used instead ──
-    # If spin_basher triggered AND boost was active before abilities fired
-    if spin_basher_will_trigger and batter_boost_was_active:
-        # Restore boost for next round
-        state[f'{batter_role}_boost_active'] = False   # ← Key change       
-        state[f'{batter_role}_boost_used'] = False  # Allow it to be used again
-        log_entry = "♻️ Boost restored: Spin Basher used instead!"
-        if log_entry not in ability_log:
-            ability_log.append(log_entry)
-
-    import math
-
-    # ── 3. Calculate individual bonuses for display ───────
-    batter_ability_bonus = eff_batting - batter_card.batting
-    bowler_ability_bonus = eff_bowling - bowler_card.bowling
-
-    batter_support = state.get(f'{batter_role}_support')
-    bowler_support = state.get(f'{bowler_role}_support')
-
-    batter_support_bonus = 0
-    batter_support_type  = None
-    if batter_support and batter_support.get('from_round', 0) <= round_number <= batter_support.get('until_round', 0):
-        if batter_support.get('type') == 'batting_support':
-            batter_support_bonus = 2
-            batter_support_type  = 'Batting Support'
-
-    bowler_support_bonus = 0
-    bowler_support_type  = None
-    if bowler_support and bowler_support.get('from_round', 0) <= round_number <= bowler_support.get('until_round', 0):
-        st = bowler_support.get('type')
-        if st == 'pace_support' and not bowler_card.is_spinner:
-            bowler_support_bonus = 2
-            bowler_support_type  = 'Pace Support'
-        elif st == 'spin_support' and bowler_card.is_spinner:
-            bowler_support_bonus = 2
-            bowler_support_type  = 'Spin Support'
-
-    # ── 4. Score the round ────────────────────────────────
-    runs_cut_amount = 0  # ← Track how many runs were cut
-
-    if eff_batting > eff_bowling:
-        if runs_cutter_active:
-            runs_cut_amount = min(10, eff_runs)  # ← How much was actually cut
-            eff_runs = max(0, eff_runs - 10)
-            ability_log.append("✂️ Runs Cutter: -10 runs!")
-
-        state['scores'][batting_team] += eff_runs
-        print(f"✅ Runs added: {eff_runs} to {batting_team}, total: {state['scores'][batting_team]}")  # Debug
-
-        state[f'runs_in_round_{innings}_{round_number}']   = eff_runs
-        state[f'wicket_in_round_{innings}_{round_number}'] = False
-
-        ability_str = "  |  " + "  ".join(ability_log) if ability_log else ""
-        state['message'] = f"Runs added: {eff_runs}!{ability_str}"
-
-    elif eff_batting == eff_bowling:
-        partial = eff_runs / 3
-        awarded = math.floor(partial + 0.5)
-
-        state['scores'][batting_team] += awarded
-        state[f'runs_in_round_{innings}_{round_number}']   = awarded
-        state[f'wicket_in_round_{innings}_{round_number}'] = False
-
-        ability_str = "  |  " + "  ".join(ability_log) if ability_log else ""
-        state['message'] = f"Tie! Partial runs: {awarded}!{ability_str}"
-
-    else:
+    # ── Score the round ──────────────────────────────────
+    if outcome.wicket:
         state['wickets'][batting_team] += 1
-        state[f'runs_in_round_{innings}_{round_number}']   = 0
-        state[f'wicket_in_round_{innings}_{round_number}'] = True
-
-        ability_str = "  |  " + "  ".join(ability_log) if ability_log else ""
-        state['message'] = f"Wicket! 🎯{ability_str}"
-
-    # ── 5. Calculate actual bonuses for display ──────────
-    batter_actual_ability_bonus = (
-        eff_batting 
-        - batter_card.batting 
-        - batter_support_bonus 
-        - batter_boost_bonus  
-    )
+    else:
+        state['scores'][batting_team] += outcome.runs
+        if outcome.kind == 'runs':
+            print(f"✅ Runs added: {outcome.runs} to {batting_team}, total: {state['scores'][batting_team]}")  # Debug
+    this_round.runs   = outcome.runs
+    this_round.wicket = outcome.wicket
 
-    bowler_actual_ability_bonus = (
-        eff_bowling 
-        - bowler_card.bowling 
-        - bowler_support_bonus 
-        - bowler_boost_bonus  
-    )
+    ability_str = "  |  " + "  ".join(outcome.log) if outcome.log else ""
+    state['message'] = _outcome_message(outcome.kind, outcome.runs, ability_str)
 
-    # ── 6. Save last played cards with all bonuses ────────
+    # ── Save last played cards with all bonuses ──────────
     state['last_batter'] = {
         'name':              batter_card.name,
-        'image':             batter_card.image.url if batter_card.image else None,
+        'image':             batter_card.image_url,
         'ability':           batter_card.ability,
         'batting':           batter_card.batting,
         'runs':              batter_card.runs,
-        'ability_bonus':     batter_actual_ability_bonus,
-        'boost_bonus':       batter_boost_bonus,
-        'support_bonus':     batter_support_bonus,
-        'support_type':      batter_support_type,
-        'effective_batting': eff_batting,
+        'ability_bonus':     outcome.batter_ability_bonus,
+        'boost_bonus':       outcome.batter_boost_bonus,
+        'support_bonus':     outcome.batter_support_bonus,
+        'support_type':      outcome.batter_support_type,
+        'effective_batting': outcome.eff_batting,
     }
     state['last_bowler'] = {
         'name':              bowler_card.name,
-        'image':             bowler_card.image.url if bowler_card.image else None,
+        'image':             bowler_card.image_url,
         'ability':           bowler_card.ability,
         'bowling':           bowler_card.bowling,
         'runs':              bowler_card.runs,
-        'ability_bonus':     bowler_actual_ability_bonus,
-        'boost_bonus':       bowler_boost_bonus,
-        'support_bonus':     bowler_support_bonus,
-        'support_type':      bowler_support_type,
-        'effective_bowling': eff_bowling,
-        'runs_cut':          runs_cut_amount,  # ← Add this
-
+        'ability_bonus':     outcome.bowler_ability_bonus,
+        'boost_bonus':       outcome.bowler_boost_bonus,
+        'support_bonus':     outcome.bowler_support_bonus,
+        'support_type':      outcome.bowler_support_type,
+        'effective_bowling': outcome.eff_bowling,
+        'runs_cut':          outcome.runs_cut,
     }
 
     state['round_number'] = round_number + 1
 
-    # ── 6.5. Save a recalculation snapshot + open post-round boost window ──
-    import time as _time
-
-    state[f'round_snapshot_{innings}_{round_number}'] = {
+    # ── Save a recalculation snapshot + open post-round boost window ──
+    this_round.snapshot = {
         'batting_team':       batting_team,
         'batter_card_id':     batter_card.id,
         'bowler_card_id':     bowler_card.id,
-        'eff_batting':        eff_batting,
-        'eff_bowling':        eff_bowling,
+        'eff_batting':        outcome.eff_batting,
+        'eff_bowling':        outcome.eff_bowling,
         'eff_runs':           batter_card.runs,   # original card runs, pre-cutter
-        'runs_cutter_active': runs_cutter_active,
-        'batter_ability_triggered': batter_actual_ability_bonus > 0,
-        'bowler_ability_triggered': (
-            bowler_actual_ability_bonus > 0
-            or (bowler_card.ability == 'runs_cutter' and runs_cutter_active)
-        ),
+        'runs_cutter_active': outcome.runs_cutter_active,
+        'batter_ability_triggered': outcome.batter_ability_triggered,
+        'bowler_ability_triggered': outcome.bowler_ability_triggered,
         'batter_role':        batter_role,
         'bowler_role':        bowler_role,
     }
-    state[f'boost_window_open_{innings}_{round_number}']    = True
-    state[f'boost_window_started_{innings}_{round_number}'] = _time.time()
-    state[f'round_boost_clicks_{innings}_{round_number}']   = []
-
-    current_score   = state['scores'][batting_team]
-    current_wickets = state['wickets'][batting_team]
-    target          = state.get('target')
+    this_round.boost_window_open    = True
+    this_round.boost_window_started = time.time()
+    this_round.boost_clicks         = []
 
-    # ── 7. Early end: target chased ───────────────────────
-    if innings == 2 and target is not None and current_score >= target:
-        chasing_team = 'player2' if batting_first == 'player1' else 'player1'
-        state['game_over_pending'] = True
-        state['winner'] = chasing_team
+    # ── Target chased / all out / 7 rounds done ──────────
+    _apply_match_status(state, innings, batting_team, batting_first)
 
 
-    # ── 8. Early end: all out or 7 rounds done ────────────
-    # ── 8. Early end: all out or 7 rounds done ────────────
-    # Skip this whole block if step 7 already decided the result
-    if not state.get('game_over_pending'):
-        innings_over = (current_wickets >= 10) or (state['round_number'] > 7)
-
-        if innings_over:
-            if innings == 1:
-                first_score = state['scores'][batting_first]
-                state['innings_transition'] = {
-                    'target':      first_score + 1,
-                    'first_score': first_score,
-                }
-                state['message'] = f"First innings over! Target: {first_score + 1}"
-            else:
-                # innings == 2 — chasing team failed to reach target in time
-                chasing_team   = 'player2' if batting_first == 'player1' else 'player1'
-                defending_team = batting_first
-                chasing_score  = state['scores'][chasing_team]
-                defending_score = state['scores'][defending_team]
-                target_val = state.get('target', 0)
-
-                if chasing_score == defending_score:
-                    state['winner'] = 'Tie'
-                elif chasing_score >= target_val:
-                    state['winner'] = chasing_team
-                else:
-                    state['winner'] = defending_team
+def _needs_db_save(state):
+    """Save to Redis always, DB only at important moments."""
+    return bool(
+        state.get('game_over') or state.get('game_over_pending') or state.get('innings_transition')
+    )
 
-                state['game_over'] = True
 
+async def _notify_round_resolved(room, state, round_number):
     is_game_over = state.get('game_over', False)
     is_game_over_pending = state.get('game_over_pending', False)
     is_innings_transition = bool(state.get('innings_transition'))
 
-    should_save_db = is_game_over or is_game_over_pending or is_innings_transition
+    if is_game_over:
+        event = {
+            "type": "game_over",
+            "action": "redirect_result",
+        }
+    elif is_innings_transition or is_game_over_pending:
+        event = {
+            "type": "innings_over",
+            "action": "reload",
+        }
+    else:
+        event = {
+            "type": "round_result",
+            "round": round_number,          # ← ADD THIS
+            "message": state.get('message', ''),  # ← fine here
+            "action": "reload",
+        }
+    await _agroup_send(room.code, event, 'WebSocket')
 
-    # Save to Redis always, DB only at important moments
-    save_game_state(room.code, state, save_to_db=should_save_db)
-    # At end of _resolve_round, replace the existing group_send with:
-    try:
-        from asgiref.sync import async_to_sync
-        from channels.layers import get_channel_layer
-        channel_layer = get_channel_layer()
 
-        is_game_over = state.get('game_over', False)
-        is_game_over_pending = state.get('game_over_pending', False)
-        is_innings_transition = bool(state.get('innings_transition'))
+# ── mp_game context, in sections ─────────────────────────────────
+# Each partial only renders a few keys, so the context is split into
+# sections and each partial builds just the ones it uses. Deck/card queries
+# live in their own sections and never run for e.g. the scoreboard.
 
-        if is_game_over:
-            async_to_sync(channel_layer.group_send)(
-                f"s7app_{room.code}",
-                {
-                    "type": "game_over",
-                    "action": "redirect_result",
-                }
-            )
-        elif is_innings_transition or is_game_over_pending:
-            async_to_sync(channel_layer.group_send)(
-                f"s7app_{room.code}",
-                {
-                    "type": "innings_over",
-                    "action": "reload",
-                }
-            )
-        else:
-            async_to_sync(channel_layer.group_send)(
-                f"s7app_{room.code}",
-                {
-                    "type": "round_result",
-                    "round": round_number,          # ← ADD THIS
-                    "message": state.get('message', ''),  # ← fine here
-                    "action": "reload",
-                }
-            )
-    except Exception as e:
-        print(f"WebSocket notify failed: {e}")
-@login_required
-def mp_game(request, code):
-    room = get_object_or_404(GameRoom, code=code)
-    state = get_game_state(code)
-    if room.status in ['waiting', None]:
-        room.status = 'live'
-        room.save()
-    my_role  = _my_role(request, room)
+def _ctx_core(room, state, my_role):
+    """Scores, round, flags — straight from state, no queries."""
     opp_role = _opponent_role(my_role)
-    opponent_name = _get_player(room, opp_role).username
-    
-    if state.get('game_over') and state.get(f'{my_role}_viewing_result', False):
-        return redirect('mp_result', code=code)
 
-    innings      = state.get('innings', 1)
-    round_number = state.get('round_number', 1)
-    batting_first = state.get('batting_first', 'player1')
+    # ── Read innings/round from THIS state, not outer scope ──
+    _innings      = state.get('innings', 1)
+    _round_number = state.get('round_number', 1)
+    _batting_first = state.get('batting_first', 'player1')
 
-    if innings == 1:
-        batting_team = batting_first
+    if _innings == 1:
+        _batting_team = _batting_first
     else:
-        batting_team = 'player2' if batting_first == 'player1' else 'player1'
+        _batting_team = 'player2' if _batting_first == 'player1' else 'player1'
+
+    _current_round = state.round(_innings, _round_number)
+    _i_played   = _current_round is not None and _current_round.played(my_role) is not None
+    _opp_played = _current_round is not None and _current_round.played(opp_role) is not None
+    _waiting    = _i_played and not _opp_played
+
+    _recent_rounds = state.recent_rounds(_innings, _round_number)
+    _last_wicket = any(rec.wicket for rec in _recent_rounds)
+    _recent_runs = sum(rec.runs for rec in _recent_rounds)
+    _opponent_team  = 'player2' if my_role == 'player1' else 'player1'
+    _opponent_score = state.get('scores', {}).get(_opponent_team, 0)
+
+    _active_support = state.get(f'{my_role}_support')
+    if _active_support and _round_number >= _active_support.get('until_round', 0):
+        _active_support = None
+
+    # ── Per-player innings-2 viewing flag (NEW) ──
+    _my_viewing_innings2 = state.get(f'{my_role}_viewing_innings2', False)
+    _shared_innings = state.get('innings', 1)
+    # This player still needs to see (and click through) the transition screen if
+    # the match has already moved to innings 2 in shared state, but THIS player
+    # hasn't personally clicked Continue yet.
+    _show_transition_to_me = (_shared_innings == 2 and not _my_viewing_innings2)
+    # Preserve target info for display even after the shared 'innings_transition'
+    # key has been cleared from state by whichever player clicked first.
+    _my_transition_target = state.get('target') if _show_transition_to_me else None
+    # ── Per-player game-over viewing flag (NEW) ──
+    _my_viewing_result = state.get(f'{my_role}_viewing_result', False)
+    _shared_game_over = state.get('game_over', False)
+    _shared_game_over_pending = state.get('game_over_pending', False)
+
+    # This player still needs to see the "Match Over!" screen and click
+    # their own "See Result →" if the match has ended but THEY haven't
+    # personally confirmed yet.
+    _show_result_screen_to_me = (
+        (_shared_game_over or _shared_game_over_pending)
+        and not _my_viewing_result
+    )
 
-    my_used  = state.get(f'used_by_{my_role}', [])
-    opp_used = state.get(f'used_by_{opp_role}', [])
-
-    my_played_key  = f'{my_role}_played_round_{innings}_{round_number}'
-    opp_played_key = f'{opp_role}_played_round_{innings}_{round_number}'
-    i_played   = state.get(my_played_key) is not None
-    opp_played = state.get(opp_played_key) is not None
-
-    opp_user = room.player2 if my_role == 'player1' else room.player1
-    opp_deck = UserDeck.objects.filter(user=opp_user, is_active=True).first()
-    opponent_deck_cards = []
-    if opp_deck:
-        opp_deck_ids = DeckCard.objects.filter(deck=opp_deck).values_list('player_card_id', flat=True)
-        opponent_deck_cards = list(PlayerCard.objects.filter(id__in=opp_deck_ids))
-
-    # ── Helper to build full context ──────────────────────────────
-    def build_context(state):
-        # ── Read innings/round from THIS state, not outer scope ──
-        _innings      = state.get('innings', 1)
-        _round_number = state.get('round_number', 1)
-        _batting_first = state.get('batting_first', 'player1')
-
-        if _innings == 1:
-            _batting_team = _batting_first
-        else:
-            _batting_team = 'player2' if _batting_first == 'player1' else 'player1'
-
-        _my_used    = state.get(f'used_by_{my_role}', [])
-        _my_played_key  = f'{my_role}_played_round_{_innings}_{_round_number}'
-        _opp_played_key = f'{opp_role}_played_round_{_innings}_{_round_number}'
-        _i_played   = state.get(_my_played_key) is not None
-        _opp_played = state.get(_opp_played_key) is not None
-        _waiting    = _i_played and not _opp_played
-
-        active_user = room.player1 if my_role == 'player1' else room.player2
-        active_deck = UserDeck.objects.filter(user=active_user, is_active=True).first()
-        if active_deck:
-            deck_card_ids = DeckCard.objects.filter(
-                deck=active_deck
-            ).values_list('player_card_id', flat=True)
-            _available_cards = PlayerCard.objects.filter(
-                id__in=deck_card_ids
-            ).exclude(id__in=_my_used)
-        else:
-            _available_cards = PlayerCard.objects.exclude(id__in=_my_used)
+    ctx = {
+        'room':                 room,
+        'innings':              _innings,
+        'round_number':         _round_number,
+        'batting_team':         _batting_team,
+        'my_role':              my_role,
+        'waiting_for_opponent': _waiting,
+        'message':              state.get('message', ''),
+        'p1_runs':              state.get('scores', {}).get('player1', 0),
+        'p2_runs':              state.get('scores', {}).get('player2', 0),
+        'p1_wickets':           state.get('wickets', {}).get('player1', 0),
+        'p2_wickets':           state.get('wickets', {}).get('player2', 0),
+        'last_batter':          state.get('last_batter'),
+        'last_bowler':          state.get('last_bowler'),
+        'active_support':       _active_support,
+        'support_used':         state.get(f'{my_role}_support_used', False),
+
+        # ── CHANGED: gated by this player's own viewing flag, not shared state ──
+        'innings_transition':   (
+            {'target': _my_transition_target} if _show_transition_to_me
+            else state.get('innings_transition')
+        ),
 
-        _last_wicket = any(
-            state.get(f'wicket_in_round_{_innings}_{r}')
-            for r in [_round_number - 1, _round_number - 2] if r >= 1
-        )
-        _recent_runs = sum(
-            state.get(f'runs_in_round_{_innings}_{r}', 0)
-            for r in [_round_number - 1, _round_number - 2] if r >= 1
-        )
-        _opponent_team  = 'player2' if my_role == 'player1' else 'player1'
-        _opponent_score = state.get('scores', {}).get(_opponent_team, 0)
-
-        from .models import SupportCard
-        _support_cards  = SupportCard.objects.all()
-        _active_support = state.get(f'{my_role}_support')
-        if _active_support and _round_number >= _active_support.get('until_round', 0):
-            _active_support = None
-
-        _bowling_first = 'player2' if _batting_first == 'player1' else 'player1'
-
-        # Timeline innings 1
-        _innings1_timeline = []
-        for r in range(1, _round_number if _innings == 1 else 8):
-            batter_id = state.get(f'{_batting_first}_played_round_1_{r}')
-            bowler_id = state.get(f'{_bowling_first}_played_round_1_{r}')
+        'game_over_pending':    _show_result_screen_to_me,
+        'boost_used':           state.get(f'{my_role}_boost_used', False),
+        'boost_active':         state.get(f'{my_role}_boost_active', False),
+        'last_wicket_in_round': _last_wicket,
+        'recent_runs_high':     _recent_runs >= 30,
+        'opponent_score_high':  _opponent_score >= 60,
+    }
+
+    if _innings == 2:
+        ctx['target']           = state.get('target')
+        chasing_runs            = state.get('scores', {}).get(_batting_team, 0)
+        target_val              = state.get('target', 0)
+        ctx['runs_needed']      = max(0, target_val - chasing_runs)
+        ctx['rounds_remaining'] = max(0, 8 - _round_number)
+
+    return ctx
+
+
+def _room_deck_id(room, role):
+    """The deck `role` entered the room with (their active deck if none was recorded)."""
+    deck_id = room.player1_deck_id if role == 'player1' else room.player2_deck_id
+    if deck_id is None:
+        user_id = room.player1_id if role == 'player1' else room.player2_id
+        deck_id = UserDeck.objects.filter(
+            user_id=user_id, is_active=True
+        ).values_list('id', flat=True).first()
+    return deck_id
+
+
+def _match_deck(room, state, role):
+    """
+    `role`'s cards for this match as CardRecords — the snapshot frozen at
+    choose_innings. Rooms started before snapshots existed read the deck live.
+    """
+    cards = state.deck(role)
+    if cards is None:
+        deck_id = _room_deck_id(room, role)
+        cards = deck_cards(deck_id) if deck_id else list(get_catalog().values())
+    return cards
+
+
+def _ctx_hand(room, state, my_role):
+    """The cards this player can still play."""
+    _my_used = set(state.get(f'used_by_{my_role}', []))
+    _available_cards = [c for c in _match_deck(room, state, my_role) if c.id not in _my_used]
+    return {'available_cards': _available_cards}
+
+
+def _ctx_support_cards(room, state, my_role):
+    return {'support_cards': SupportCard.objects.all()}
+
+
+def _ctx_opponent(room, state, my_role):
+    return {'opponent_name': _get_player(room, _opponent_role(my_role)).username}
+
+
+def _ctx_opponent_deck(room, state, my_role):
+    return {'opponent_deck_cards': _match_deck(room, state, _opponent_role(my_role))}
+
+
+def _ctx_timeline(room, state, my_role):
+    _innings      = state.get('innings', 1)
+    _round_number = state.get('round_number', 1)
+    _batting_first = state.get('batting_first', 'player1')
+    _bowling_first = 'player2' if _batting_first == 'player1' else 'player1'
+    if not state.get('decks'):
+        # Rooms without frozen decks: one catalog read for the whole timeline.
+        state.catalog = get_catalog()
+
+    # Timeline innings 1
+    _innings1_timeline = []
+    for r, rec in enumerate(state.innings_rounds(1)[:_round_number - 1 if _innings == 1 else 7], start=1):
+        batter_id = rec.played(_batting_first)
+        bowler_id = rec.played(_bowling_first)
+        if batter_id and bowler_id:
+            try:
+                bc  = state.card(batter_id)
+                bwc = state.card(bowler_id)
+                _innings1_timeline.append({
+                    'round':        r,
+                    'batter':       bc.name,
+                    'batter_image': bc.image_url,
+                    'bowler':       bwc.name,
+                    'bowler_image': bwc.image_url,
+                    'runs':         rec.runs,
+                    'wicket':       rec.wicket,
+                })
+            except PlayerCard.DoesNotExist:
+                pass
+
+    # Timeline innings 2
+    _innings2_timeline = []
+    if _innings == 2:
+        _batting_second = _bowling_first
+        _bowling_second = _batting_first
+        for r, rec in enumerate(state.innings_rounds(2)[:_round_number - 1], start=1):
+            batter_id = rec.played(_batting_second)
+            bowler_id = rec.played(_bowling_second)
             if batter_id and bowler_id:
                 try:
-                    bc  = PlayerCard.objects.get(id=batter_id)
-                    bwc = PlayerCard.objects.get(id=bowler_id)
-                    _innings1_timeline.append({
+                    bc  = state.card(batter_id)
+                    bwc = state.card(bowler_id)
+                    _innings2_timeline.append({
                         'round':        r,
                         'batter':       bc.name,
-                        'batter_image': bc.image.url if bc.image else None,
+                        'batter_image': bc.image_url,
                         'bowler':       bwc.name,
-                        'bowler_image': bwc.image.url if bwc.image else None,
-                        'runs':         state.get(f'runs_in_round_1_{r}', 0),
-                        'wicket':       state.get(f'wicket_in_round_1_{r}', False),
+                        'bowler_image': bwc.image_url,
+                        'runs':         rec.runs,
+                        'wicket':       rec.wicket,
                     })
                 except PlayerCard.DoesNotExist:
                     pass
 
-        # Timeline innings 2
-        _innings2_timeline = []
-        if _innings == 2:
-            _batting_second = _bowling_first
-            _bowling_second = _batting_first
-            for r in range(1, _round_number):
-                batter_id = state.get(f'{_batting_second}_played_round_2_{r}')
-                bowler_id = state.get(f'{_bowling_second}_played_round_2_{r}')
-                if batter_id and bowler_id:
-                    try:
-                        bc  = PlayerCard.objects.get(id=batter_id)
-                        bwc = PlayerCard.objects.get(id=bowler_id)
-                        _innings2_timeline.append({
-                            'round':        r,
-                            'batter':       bc.name,
-                            'batter_image': bc.image.url if bc.image else None,
-                            'bowler':       bwc.name,
-                            'bowler_image': bwc.image.url if bwc.image else None,
-                            'runs':         state.get(f'runs_in_round_2_{r}', 0),
-                            'wicket':       state.get(f'wicket_in_round_2_{r}', False),
-                        })
-                    except PlayerCard.DoesNotExist:
-                        pass
-
-        # ── Post-round boost window info ──
-        _boost_round = _round_number - 1
-        _boost_window_open = state.get(f'boost_window_open_{_innings}_{_boost_round}', False)
-        _boost_window_started = state.get(f'boost_window_started_{_innings}_{_boost_round}', 0)
-        import time as _time
-        _boost_elapsed = _time.time() - _boost_window_started if _boost_window_started else 999
-        _boost_window_active = _boost_window_open and _boost_elapsed <= 5
-
-        _boost_seconds_left = max(0, 5 - _boost_elapsed) if _boost_window_active else 0
-
-        _my_post_boost_used = state.get(f'{my_role}_post_boost_used', False)
-        _boost_clicks = state.get(f'round_boost_clicks_{_innings}_{_boost_round}', [])
-        _i_already_clicked = my_role in _boost_clicks
-
-        _snap = state.get(f'round_snapshot_{_innings}_{_boost_round}', {})
-        _my_ability_triggered_last_round = (
-            (_snap.get('batter_ability_triggered') and _snap.get('batter_role') == my_role)
-            or (_snap.get('bowler_ability_triggered') and _snap.get('bowler_role') == my_role)
-        )
+    return {
+        'innings1_timeline':    _innings1_timeline,
+        'innings2_timeline':    _innings2_timeline,
+    }
 
-        _can_use_post_boost = (
-            _boost_window_active
-            and not _my_post_boost_used
-            and not _i_already_clicked
-            and not _my_ability_triggered_last_round
-        )
-        opp_post_boost_used = state.get(f'{opp_role}_post_boost_used', False)
 
-        opp_already_clicked = opp_role in _boost_clicks
+def _ctx_boost(room, state, my_role):
+    """Post-round boost window info."""
+    opp_role = _opponent_role(my_role)
+    _innings      = state.get('innings', 1)
+    _round_number = state.get('round_number', 1)
+
+    _boost_round = _round_number - 1
+    _boost_rec = state.round(_innings, _boost_round)
+    _boost_window_open = _boost_rec.boost_window_open if _boost_rec else False
+    _boost_window_started = _boost_rec.boost_window_started if _boost_rec else 0
+    _boost_elapsed = time.time() - _boost_window_started if _boost_window_started else 999
+    _boost_window_active = _boost_window_open and _boost_elapsed <= 5
+
+    _boost_seconds_left = max(0, 5 - _boost_elapsed) if _boost_window_active else 0
+
+    _my_post_boost_used = state.get(f'{my_role}_post_boost_used', False)
+    _boost_clicks = _boost_rec.boost_clicks if _boost_rec else []
+    _i_already_clicked = my_role in _boost_clicks
+
+    _snap = (_boost_rec.snapshot if _boost_rec else None) or {}
+    _my_ability_triggered_last_round = (
+        (_snap.get('batter_ability_triggered') and _snap.get('batter_role') == my_role)
+        or (_snap.get('bowler_ability_triggered') and _snap.get('bowler_role') == my_role)
+    )
+
+    _can_use_post_boost = (
+        _boost_window_active
+        and not _my_post_boost_used
+        and not _i_already_clicked
+        and not _my_ability_triggered_last_round
+    )
+    opp_post_boost_used = state.get(f'{opp_role}_post_boost_used', False)
 
-        opp_ability_triggered_last_round = (
-            (_snap.get('batter_ability_triggered') and _snap.get('batter_role') == opp_role)
-            or (_snap.get('bowler_ability_triggered') and _snap.get('bowler_role') == opp_role)
-        )
+    opp_already_clicked = opp_role in _boost_clicks
 
-        opp_can_use_post_boost = (
-            _boost_window_active
-            and not opp_post_boost_used
-            and not opp_already_clicked
-            and not opp_ability_triggered_last_round
-        )
-        transition_wait = (
-            (state.get("innings_transition") or state.get("game_over_pending"))
-            and _boost_window_active
-            and (
-                _can_use_post_boost
-                or opp_can_use_post_boost
-            )
-        )
+    opp_ability_triggered_last_round = (
+        (_snap.get('batter_ability_triggered') and _snap.get('batter_role') == opp_role)
+        or (_snap.get('bowler_ability_triggered') and _snap.get('bowler_role') == opp_role)
+    )
 
-        # ── Per-player innings-2 viewing flag (NEW) ──
-        _my_viewing_innings2 = state.get(f'{my_role}_viewing_innings2', False)
-        _shared_innings = state.get('innings', 1)
-        # This player still needs to see (and click through) the transition screen if
-        # the match has already moved to innings 2 in shared state, but THIS player
-        # hasn't personally clicked Continue yet.
-        _show_transition_to_me = (_shared_innings == 2 and not _my_viewing_innings2)
-        # Preserve target info for display even after the shared 'innings_transition'
-        # key has been cleared from state by whichever player clicked first.
-        _my_transition_target = state.get('target') if _show_transition_to_me else None
-        # ── Per-player game-over viewing flag (NEW) ──
-        _my_viewing_result = state.get(f'{my_role}_viewing_result', False)
-        _shared_game_over = state.get('game_over', False)
-        _shared_game_over_pending = state.get('game_over_pending', False)
-
-        # This player still needs to see the "Match Over!" screen and click
-        # their own "See Result →" if the match has ended but THEY haven't
-        # personally confirmed yet.
-        _show_result_screen_to_me = (
-            (_shared_game_over or _shared_game_over_pending)
-            and not _my_viewing_result
+    opp_can_use_post_boost = (
+        _boost_window_active
+        and not opp_post_boost_used
+        and not opp_already_clicked
+        and not opp_ability_triggered_last_round
+    )
+    transition_wait = (
+        (state.get("innings_transition") or state.get("game_over_pending"))
+        and _boost_window_active
+        and (
+            _can_use_post_boost
+            or opp_can_use_post_boost
         )
+    )
 
-        ctx = {
-            'room':                 room,
-            'innings':              _innings,
-            'round_number':         _round_number,
-            'batting_team':         _batting_team,
-            'my_role':              my_role,
-            'opponent_name':        opponent_name,
-            'available_cards':      _available_cards,
-            'waiting_for_opponent': _waiting,
-            'message':              state.get('message', ''),
-            'p1_runs':              state.get('scores', {}).get('player1', 0),
-            'p2_runs':              state.get('scores', {}).get('player2', 0),
-            'p1_wickets':           state.get('wickets', {}).get('player1', 0),
-            'p2_wickets':           state.get('wickets', {}).get('player2', 0),
-            'last_batter':          state.get('last_batter'),
-            'last_bowler':          state.get('last_bowler'),
-            'support_cards':        _support_cards,
-            'active_support':       _active_support,
-            'support_used':         state.get(f'{my_role}_support_used', False),
-
-            # ── CHANGED: gated by this player's own viewing flag, not shared state ──
-            'innings_transition':   (
-                {'target': _my_transition_target} if _show_transition_to_me
-                else state.get('innings_transition')
-            ),
-
-            'game_over_pending':    _show_result_screen_to_me,
-            'boost_used':           state.get(f'{my_role}_boost_used', False),
-            'boost_active':         state.get(f'{my_role}_boost_active', False),
-            'last_wicket_in_round': _last_wicket,
-            'recent_runs_high':     _recent_runs >= 30,
-            'opponent_score_high':  _opponent_score >= 60,
-            'opponent_deck_cards':  opponent_deck_cards,
-            'innings1_timeline':    _innings1_timeline,
-            'innings2_timeline':    _innings2_timeline,
-            'boost_window_active':   _boost_window_active,
-            'boost_seconds_left':    round(_boost_seconds_left, 1),
-            'can_use_post_boost':    _can_use_post_boost,
-            'my_post_boost_used':    _my_post_boost_used,
-            'boost_round_for_form':  _boost_round,
-            'opponent_can_use_post_boost': opp_can_use_post_boost,
-            'must_wait_for_boost': transition_wait,
-        }
+    return {
+        'boost_window_active':   _boost_window_active,
+        'boost_seconds_left':    round(_boost_seconds_left, 1),
+        'can_use_post_boost':    _can_use_post_boost,
+        'my_post_boost_used':    _my_post_boost_used,
+        'boost_round_for_form':  _boost_round,
+        'opponent_can_use_post_boost': opp_can_use_post_boost,
+        'must_wait_for_boost': transition_wait,
+    }
+
+
+GAME_CONTEXT_SECTIONS = {
+    'core':          _ctx_core,
+    'hand':          _ctx_hand,
+    'support_cards': _ctx_support_cards,
+    'opponent':      _ctx_opponent,
+    'opponent_deck': _ctx_opponent_deck,
+    'timeline':      _ctx_timeline,
+    'boost':         _ctx_boost,
+}
+
+# partial name -> sections its template reads. The full page (None) takes all.
+PARTIAL_SECTIONS = {
+    'scoreboard':     ('core',),
+    'status_bar':     ('core',),
+    'last_round':     ('core', 'boost'),
+    'game_panel':     ('core', 'hand', 'opponent', 'boost'),
+    'timeline':       ('core', 'timeline'),
+    'boost_response': ('core', 'boost'),
+    None:             tuple(GAME_CONTEXT_SECTIONS),
+}
+
+
+def _build_game_context(room, state, my_role, partial=None, memo=None):
+    """
+    Template context for mp_game (or one of its partials), for `my_role`'s
+    view of `state`. Only the sections `partial` renders are built; pass the
+    same `memo` dict to reuse sections already built for this state in the
+    current request. Needs no request, so fragments can be rendered outside
+    one (see live_updates.render_fragments).
+    """
+    if memo is None or not state.revision:
+        memo = {}   # revision 0 = uncached DB copy, may differ between calls
+    ctx = {}
+    for name in PARTIAL_SECTIONS[partial]:
+        key = (name, state.revision)
+        if key not in memo:
+            memo[key] = GAME_CONTEXT_SECTIONS[name](room, state, my_role)
+        ctx.update(memo[key])
+    return ctx
+
+
+@login_required
+async def mp_game(request, code):
+    await _aresolve_user(request)
+    room = await _aget_room(code)
+    state = await aget_game_state(code)
+    if room.status in ['waiting', None]:
+        room.status = 'live'
+        await room.asave()
+    my_role  = _my_role(request, room)
+
+    # Fallback poll (the socket normally pushes this) — answer before any
+    # context/deck work, it only needs a few state fields.
+    if request.method == 'GET' and request.GET.get('partial') == 'round_check':
+        return JsonResponse(live_updates.round_check(live_updates.state_delta(state), my_role))
+
+    opp_role = _opponent_role(my_role)
+    
+    if state.get('game_over') and state.get(f'{my_role}_viewing_result', False):
+        return redirect('mp_result', code=code)
+
+    # The boost form defaults to the round just played.
+    innings      = state.get('innings', 1)
+    round_number = state.get('round_number', 1)
+
+    context_memo = {}
 
-        if _innings == 2:
-            ctx['target']           = state.get('target')
-            chasing_runs            = state.get('scores', {}).get(_batting_team, 0)
-            target_val              = state.get('target', 0)
-            ctx['runs_needed']      = max(0, target_val - chasing_runs)
-            ctx['rounds_remaining'] = max(0, 8 - _round_number)
+    def build_context(state, partial=None):
+        return _build_game_context(room, state, my_role, partial, context_memo)
 
-        return ctx
+    async def render_game(template, state, partial=None):
+        # Context sections query decks/cards — build and render in one thread hop.
+        return await sync_to_async(
+            lambda: render(request, template, build_context(state, partial))
+        )()
 
     # ══════════════════════════════════════════════════════════════
     # POST
     # ══════════════════════════════════════════════════════════════
     if request.method == 'POST':
 
+        def _i_played_now(st):
+            rec = st.round(st.get('innings', 1), st.get('round_number', 1))
+            return rec is not None and rec.played(my_role) is not None
+
         # ── cancel_boost ─────────────────────────────────────────
         if request.POST.get('action') == 'cancel_boost':
-            if state.get(f'{my_role}_boost_active') and not i_played:
-                state[f'{my_role}_boost_active'] = False
-                state[f'{my_role}_boost_used']   = False
-                save_game_state(room.code, state, save_to_db=False)
+            def cancel_boost(st):
+                if st.get(f'{my_role}_boost_active') and not _i_played_now(st):
+                    st[f'{my_role}_boost_active'] = False
+                    st[f'{my_role}_boost_used']   = False
+            state, _ = await aupdate_game_state(code, cancel_boost, state=state)
+            await live_updates.apush_state_delta(code, state)
             if request.headers.get('HX-Request'):
-                return render(request, 'partials/status_bar.html',
-                              build_context(get_game_state(code)))
+                return await render_game('partials/status_bar.html', state, 'status_bar')
             return redirect('mp_game', code=code)
 
         # ── cancel_support ───────────────────────────────────────
         if request.POST.get('action') == 'cancel_support':
-            if state.get(f'{my_role}_support_used') and not i_played:
-                state[f'{my_role}_support_used'] = False
-                state[f'{my_role}_support']      = None
-                save_game_state(room.code, state, save_to_db=False)
+            def cancel_support(st):
+                if st.get(f'{my_role}_support_used') and not _i_played_now(st):
+                    st[f'{my_role}_support_used'] = False
+                    st[f'{my_role}_support']      = None
+            state, _ = await aupdate_game_state(code, cancel_support, state=state)
+            await live_updates.apush_state_delta(code, state)
             if request.headers.get('HX-Request'):
-                return render(request, 'partials/status_bar.html',
-                              build_context(get_game_state(code)))
+                return await render_game('partials/status_bar.html', state, 'status_bar')
             return redirect('mp_game', code=code)
 
         # ── use_boost ────────────────────────────────────────────
         if request.POST.get('action') == 'use_boost':
-            if not state.get(f'{my_role}_boost_used'):
-                state[f'{my_role}_boost_used']   = True
-                state[f'{my_role}_boost_active']  = True
-                save_game_state(room.code, state, save_to_db=False)
+            def use_boost(st):
+                if not st.get(f'{my_role}_boost_used'):
+                    st[f'{my_role}_boost_used']   = True
+                    st[f'{my_role}_boost_active']  = True
+            state, _ = await aupdate_game_state(code, use_boost, state=state)
+            await live_updates.apush_state_delta(code, state)
             if request.headers.get('HX-Request'):
-                return render(request, 'partials/status_bar.html',
-                              build_context(get_game_state(code)))
+                return await render_game('partials/status_bar.html', state, 'status_bar')
             return redirect('mp_game', code=code)
 
         # ── use_support ──────────────────────────────────────────
         if request.POST.get('action') == 'use_support':
-            if not state.get(f'{my_role}_support_used'):
-                support_type = request.POST.get('support_type')
-                state[f'{my_role}_support'] = {
-                    'type':        support_type,
-                    'from_round':  round_number,
-                    'until_round': round_number + 3,
-                }
-                state[f'{my_role}_support_used'] = True
-                save_game_state(room.code, state, save_to_db=False)
+            support_type = request.POST.get('support_type')
+
+            def use_support(st):
+                if not st.get(f'{my_role}_support_used'):
+                    current_round = st.get('round_number', 1)
+                    st[f'{my_role}_support'] = {
+                        'type':        support_type,
+                        'from_round':  current_round,
+                        'until_round': current_round + 3,
+                    }
+                    st[f'{my_role}_support_used'] = True
+            state, _ = await aupdate_game_state(code, use_support, state=state)
+            await live_updates.apush_state_delta(code, state)
             if request.headers.get('HX-Request'):
-                return render(request, 'partials/status_bar.html',
-                              build_context(get_game_state(code)))
+                return await render_game('partials/status_bar.html', state, 'status_bar')
             return redirect('mp_game', code=code)
 
-        # ── continue_result ──────────────────────────────────────
         # ── continue_result ──────────────────────────────────────
         if request.POST.get('action') == 'continue_result':
-            fresh_state = get_game_state(code)
-            fresh_state[f'{my_role}_viewing_result'] = True
-            if fresh_state.get('game_over_pending'):
-                fresh_state['game_over'] = True
-                fresh_state.pop('game_over_pending', None)
-            save_game_state(code, fresh_state, save_to_db=True)
+            def continue_result(st):
+                st[f'{my_role}_viewing_result'] = True
+                if st.get('game_over_pending'):
+                    st['game_over'] = True
+                    st.pop('game_over_pending', None)
+            state, _ = await aupdate_game_state(code, continue_result, state=state, save_to_db=True)
+            await live_updates.apush_state_delta(code, state)
             return redirect('mp_result', code=code)
-        
-        # ── continue_innings ─────────────────────────────────────
+
         # ── continue_innings ─────────────────────────────────────
         if request.POST.get('action') == 'continue_innings':
-            fresh_state = get_game_state(code)
-
-            # Always mark THIS player as having clicked through —
-            # regardless of whether shared transition data still exists
-            fresh_state[f'{my_role}_viewing_innings2'] = True
-
-            # The shared game state advances on the FIRST click only.
-            # Use 'innings == 1' as the guard, not 'innings_transition exists',
-            # since the transition key gets cleared after the first click.
-            if fresh_state.get('innings', 1) == 1:
-                transition = fresh_state.get('innings_transition')
-                if transition:
-                    fresh_state['target']           = transition['target']
-                    fresh_state['innings']          = 2
-                    fresh_state['round_number']     = 1
-                    fresh_state['used_by_player1']  = []
-                    fresh_state['used_by_player2']  = []
-                    fresh_state['player1_support']  = None
-                    fresh_state['player2_support']  = None
-                    fresh_state['last_batter']      = None
-                    fresh_state['last_bowler']      = None
-                    fresh_state['message']          = ''
-                    fresh_state.pop('innings_transition', None)
-
-            save_game_state(code, fresh_state, save_to_db=True)
+            def continue_innings(st):
+                # Always mark THIS player as having clicked through —
+                # regardless of whether shared transition data still exists
+                st[f'{my_role}_viewing_innings2'] = True
+
+                # The shared game state advances on the FIRST click only.
+                # Use 'innings == 1' as the guard, not 'innings_transition exists',
+                # since the transition key gets cleared after the first click.
+                if st.get('innings', 1) == 1:
+                    transition = st.get('innings_transition')
+                    if transition:
+                        st['target']           = transition['target']
+                        st['innings']          = 2
+                        st['round_number']     = 1
+                        st['used_by_player1']  = []
+                        st['used_by_player2']  = []
+                        st['player1_support']  = None
+                        st['player2_support']  = None
+                        st['last_batter']      = None
+                        st['last_bowler']      = None
+                        st['message']          = ''
+                        st.pop('innings_transition', None)
+            state, _ = await aupdate_game_state(code, continue_innings, state=state, save_to_db=True)
+            await live_updates.apush_state_delta(code, state)
 
             if request.headers.get('HX-Request'):
-                return render(request, 'partials/game_panel.html',
-                              build_context(get_game_state(code)))
+                return await render_game('partials/game_panel.html', state, 'game_panel')
             return redirect('mp_game', code=code)
 
 
         # ── use_post_round_boost ─────────────────────────────────
         if request.POST.get('action') == 'use_post_round_boost':
-            import time as _time
-            fresh_state = get_game_state(code)
             target_innings = int(request.POST.get('boost_innings', innings))
             target_round   = int(request.POST.get('boost_round', round_number - 1))
 
-            window_open    = fresh_state.get(f'boost_window_open_{target_innings}_{target_round}', False)
-            window_started = fresh_state.get(f'boost_window_started_{target_innings}_{target_round}', 0)
-            elapsed = _time.time() - window_started
+            def use_post_round_boost(st):
+                target_rec     = st.round(target_innings, target_round)
+                window_open    = target_rec.boost_window_open if target_rec else False
+                window_started = target_rec.boost_window_started if target_rec else 0
+                elapsed = time.time() - window_started
 
-            already_used = fresh_state.get(f'{my_role}_post_boost_used', False)
+                already_used = st.get(f'{my_role}_post_boost_used', False)
 
-            snap = fresh_state.get(f'round_snapshot_{target_innings}_{target_round}', {})
-            my_own_ability_triggered = (
-                snap.get('batter_ability_triggered') and snap.get('batter_role') == my_role
-            ) or (
-                snap.get('bowler_ability_triggered') and snap.get('bowler_role') == my_role
-            )
+                snap = (target_rec.snapshot if target_rec else None) or {}
+                my_own_ability_triggered = (
+                    snap.get('batter_ability_triggered') and snap.get('batter_role') == my_role
+                ) or (
+                    snap.get('bowler_ability_triggered') and snap.get('bowler_role') == my_role
+                )
 
-            can_use = (
-                window_open and elapsed <= 5
-                and not already_used
-                and not my_own_ability_triggered
-            )
+                can_use = (
+                    window_open and elapsed <= 5
+                    and not already_used
+                    and not my_own_ability_triggered
+                )
 
-            # ── DEBUG ──
-            print(f"=== BOOST CLICK by {my_role} ===")
-            print(f"target_innings={target_innings}, target_round={target_round}")
-            print(f"window_open={window_open}, elapsed={elapsed:.2f}, already_used={already_used}")
-            print(f"my_own_ability_triggered={my_own_ability_triggered}")
-            print(f"can_use={can_use}")
-            existing_clicks = fresh_state.get(f'round_boost_clicks_{target_innings}_{target_round}', [])
-            print(f"existing_clicks={existing_clicks}")
-            print(f"==============================")
-
-            if can_use:
-                clicks = fresh_state.get(f'round_boost_clicks_{target_innings}_{target_round}', [])
-                if my_role not in clicks:
-                    bonus = 10 if len(clicks) == 0 else 5
-                    clicks.append(my_role)
-                    fresh_state[f'round_boost_clicks_{target_innings}_{target_round}'] = clicks
-                    fresh_state[f'{my_role}_post_boost_used'] = True
-                    save_game_state(code, fresh_state, save_to_db=False)
-
-                    print(f"✅ Applying recalculation: role={my_role}, bonus={bonus}")
-                    fresh_state = _recalculate_round_with_boost(
-                        room, target_innings, target_round, my_role, bonus
-                    )
-                    print(f"✅ After recalc: scores={fresh_state.get('scores')}, wickets={fresh_state.get('wickets')}")
-
-                    try:
-                        from asgiref.sync import async_to_sync
-                        from channels.layers import get_channel_layer
-                        channel_layer = get_channel_layer()
-                        async_to_sync(channel_layer.group_send)(
-                            f"s7app_{code}",
-                            {
-                                "type": "boost_applied",          # ← changed from "round_result"
-                                
-                                "round": target_round,
-                                "message": fresh_state.get('message', ''),
-                                "action": "reload",
-                            }
-                        )
-                        print(f"✅ WS broadcast SUCCEEDED for round {target_round}")  # ← ADD THIS
-                    except Exception as e:
-                        print(f"❌ WebSocket boost notify failed: {e}")  # ← make sure this prints with traceback
-                        import traceback
-                        traceback.print_exc()
+                if not can_use or my_role in target_rec.boost_clicks:
+                    return None
+                bonus = 10 if len(target_rec.boost_clicks) == 0 else 5
+                _recalculate_round_with_boost(st, target_innings, target_round, my_role, bonus)
+                return bonus
+
+            state, bonus = await aupdate_game_state(
+                code, use_post_round_boost, state=state, save_to_db=_needs_db_save
+            )
+            if bonus:
+                await live_updates.apush_state_delta(code, state, room=room)
+                await _agroup_send(code, {
+                    "type":    "boost_applied",
+                    "round":   target_round,
+                    "message": state.get('message', ''),
+                    "action":  "reload",
+                }, 'WebSocket boost')
 
             if request.headers.get('HX-Request'):
-                return render(request, 'partials/_boost_response.html',
-                              build_context(get_game_state(code)))
+                return await render_game('partials/_boost_response.html', state, 'boost_response')
             return redirect('mp_game', code=code)
         # ── play_card ────────────────────────────────────────────
         if request.POST.get('action') == 'play_card':
-            fresh_state   = get_game_state(code)
-            fresh_innings = fresh_state.get('innings', 1)
-            fresh_round   = fresh_state.get('round_number', 1)
-            fresh_key     = f'{my_role}_played_round_{fresh_innings}_{fresh_round}'
+            selected_id = int(request.POST.get('selected_card_id'))
+
+            # One compare-and-set records the card and, if the opponent's card
+            # is already in, resolves the round. Whichever request commits
+            # second sees both cards, so exactly one of them resolves.
+            def play_card(st):
+                st_innings = st.get('innings', 1)
+                st_round   = st.get('round_number', 1)
+                rec = st.round(st_innings, st_round)
+                if rec is None or rec.played(my_role) is not None:
+                    return None   # already played — nothing to do
+
+                rec.set_played(my_role, selected_id)
+                my_used_list = st.get(f'used_by_{my_role}', [])
+                if selected_id not in my_used_list:
+                    my_used_list.append(selected_id)
+                st[f'used_by_{my_role}'] = my_used_list
+
+                if rec.played(opp_role) is None:
+                    return 'played'
+                st_batting_first = st.get('batting_first', 'player1')
+                st_batting_team = st_batting_first if st_innings == 1 else _opponent_role(st_batting_first)
+                _resolve_round(st, st_innings, st_round, st_batting_team, st_batting_first)
+                return 'resolved'
+
+            played_round = state.get('round_number', 1)
+            state, outcome = await aupdate_game_state(
+                code, play_card, state=state, save_to_db=_needs_db_save
+            )
 
-            if fresh_state.get(fresh_key) is not None:
+            if outcome is None:
                 # already played — return panel so UI updates
                 if request.headers.get('HX-Request'):
-                    return render(request, 'partials/game_panel.html',
-                                  build_context(fresh_state))
+                    return await render_game('partials/game_panel.html', state, 'game_panel')
                 return redirect('mp_game', code=code)
 
-            selected_id = int(request.POST.get('selected_card_id'))
-            fresh_state[fresh_key] = selected_id
-            my_used_list = fresh_state.get(f'used_by_{my_role}', [])
-            if selected_id not in my_used_list:
-                my_used_list.append(selected_id)
-            fresh_state[f'used_by_{my_role}'] = my_used_list
-            save_game_state(code, fresh_state, save_to_db=False)
+            # A resolved round changes every partial — push them rendered.
+            await live_updates.apush_state_delta(code, state, room=room if outcome == 'resolved' else None)
 
             # notify opponent
-            try:
-                from asgiref.sync import async_to_sync
-                from channels.layers import get_channel_layer
-                channel_layer = get_channel_layer()
-                async_to_sync(channel_layer.group_send)(
-                    f"s7app_{code}",
-                    {
-                        "type":    "card_played",
-                        "by_role": my_role,
-                        "action":  "reload_if_waiting",
-                    }
-                )
-            except Exception as e:
-                print(f"WebSocket card_played notify failed: {e}")
-
-            # check if both played → resolve
-            after_save    = get_game_state(code)
-            opp_fresh_key = f'{opp_role}_played_round_{fresh_innings}_{fresh_round}'
-            opp_played_now = after_save.get(opp_fresh_key) is not None
-
-            if opp_played_now:
-                _resolve_round(room, fresh_innings, fresh_round, batting_team, batting_first)
-                after_resolve = get_game_state(code)
-                if after_resolve.get('game_over'):
+            await _agroup_send(code, {
+                "type":    "card_played",
+                "by_role": my_role,
+                "action":  "reload_if_waiting",
+            }, 'WebSocket card_played')
+
+            if outcome == 'resolved':
+                await _notify_round_resolved(room, state, state.get('round_number', played_round + 1) - 1)
+                if state.get('game_over'):
                     return redirect('mp_result', code=code)
 
             # return game panel showing waiting overlay
             if request.headers.get('HX-Request'):
-                return render(request, 'partials/game_panel.html',
-                              build_context(get_game_state(code)))
+                return await render_game('partials/game_panel.html', state, 'game_panel')
             return redirect('mp_game', code=code)
 
     # ══════════════════════════════════════════════════════════════
     # GET
     # ══════════════════════════════════════════════════════════════
-    state   = get_game_state(code)
-    context = build_context(state)
-
     partial = request.GET.get('partial')
 
-    if partial == 'round_check':
-        from django.http import JsonResponse
-        fresh_state = get_game_state(code)
-        my_viewing_innings2 = fresh_state.get(f'{my_role}_viewing_innings2', False)
-        my_viewing_result   = fresh_state.get(f'{my_role}_viewing_result', False)
-        shared_innings      = fresh_state.get('innings', 1)
-        shared_game_over    = fresh_state.get('game_over', False)
-        shared_pending      = fresh_state.get('game_over_pending', False)
-
-        i_still_need_innings_transition = (shared_innings == 2 and not my_viewing_innings2)
-        i_still_need_result_confirm     = ((shared_game_over or shared_pending) and not my_viewing_result)
-
-        return JsonResponse({
-            'round_number':     fresh_state.get('round_number', 1),
-            'innings':          fresh_state.get('innings', 1),
-            'game_over':        bool(shared_game_over and my_viewing_result),  # only true once THIS player has confirmed
-            'boost_counter':    fresh_state.get('boost_update_counter', 0),
-            'needs_transition': i_still_need_innings_transition or i_still_need_result_confirm,
-        })
+    # Already rendered for this revision when the round was pushed?
+    if partial in live_updates.FRAGMENT_TEMPLATES:
+        html = await live_updates.acached_fragment(code, state.revision, my_role, partial)
+        if html is not None:
+            return HttpResponse(html.replace(live_updates.CSRF_PLACEHOLDER, get_token(request)))
 
-    if partial == 'scoreboard':
-        return render(request, 'partials/scoreboard.html', context)
-    if partial == 'game_panel':
-        return render(request, 'partials/game_panel.html', context)
-    if partial == 'last_round':
-        return render(request, 'partials/last_round_result.html', context)
-    if partial == 'status_bar':
-        return render(request, 'partials/status_bar.html', context)
-    if partial == 'timeline':
-        return render(request, 'partials/timeline_content.html', context)
+    # Only the sections this partial renders (unknown/None = full page)
+    if partial in live_updates.FRAGMENT_TEMPLATES:
+        return await render_game(live_updates.FRAGMENT_TEMPLATES[partial], state, partial)
 
-    return render(request, 'mp_game.html', context)
+    return await render_game('mp_game.html', state, partial if partial in PARTIAL_SECTIONS else None)
 
 
-def _recalculate_round_with_boost(room, innings, round_number, clicking_role, bonus_amount):
+def _recalculate_round_with_boost(state, innings, round_number, clicking_role, bonus_amount):
     """
     Re-runs the round outcome using the stored snapshot, with bonus_amount
     added to whichever side clicking_role played (batter or bowler).
     Updates scores/wickets/last_batter/last_bowler and re-checks
-    innings/game-over conditions. Returns the updated state.
+    innings/game-over conditions in place. Returns the updated state.
     """
-    import math
-    state = get_game_state(room.code)
-    snap = state.get(f'round_snapshot_{innings}_{round_number}')
+    this_round = state.round(innings, round_number)
+    snap = this_round.snapshot if this_round else None
     if not snap:
         return state  # nothing to recalculate
 
@@ -1565,42 +1404,26 @@ def _recalculate_round_with_boost(room, innings, round_number, clicking_role, bo
     # so the NEXT click (if any) builds on THIS result, not the original
     snap['eff_batting'] = eff_batting
     snap['eff_bowling'] = eff_bowling
-    state[f'round_snapshot_{innings}_{round_number}'] = snap
 
     # ── Undo the previous round's contribution before reapplying ──
-    prev_runs   = state.get(f'runs_in_round_{innings}_{round_number}', 0)
-    prev_wicket = state.get(f'wicket_in_round_{innings}_{round_number}', False)
+    prev_runs   = this_round.runs
+    prev_wicket = this_round.wicket
 
     if prev_wicket:
         state['wickets'][batting_team] = max(0, state['wickets'][batting_team] - 1)
     else:
         state['scores'][batting_team] = max(0, state['scores'][batting_team] - prev_runs)
 
-    # ── Recompute outcome exactly like _resolve_round step 4 ──
-    runs_cut_amount = 0
-    if eff_batting > eff_bowling:
-        new_runs = eff_runs
-        if runs_cutter_active:
-            runs_cut_amount = min(10, new_runs)
-            new_runs = max(0, new_runs - 10)
-        state['scores'][batting_team] += new_runs
-        state[f'runs_in_round_{innings}_{round_number}']   = new_runs
-        state[f'wicket_in_round_{innings}_{round_number}'] = False
-        outcome_message = f"Runs added: {new_runs}! (Boost applied)"
-
-    elif eff_batting == eff_bowling:
-        partial = eff_runs / 3
-        awarded = math.floor(partial + 0.5)
-        state['scores'][batting_team] += awarded
-        state[f'runs_in_round_{innings}_{round_number}']   = awarded
-        state[f'wicket_in_round_{innings}_{round_number}'] = False
-        outcome_message = f"Tie! Partial runs: {awarded}! (Boost applied)"
-
-    else:
+    # ── Recompute outcome with the same scoring as _resolve_round ──
+    result = engine.score(eff_batting, eff_bowling, eff_runs, runs_cutter_active)
+    if result.wicket:
         state['wickets'][batting_team] += 1
-        state[f'runs_in_round_{innings}_{round_number}']   = 0
-        state[f'wicket_in_round_{innings}_{round_number}'] = True
-        outcome_message = "Wicket! 🎯 (Boost applied)"
+    else:
+        state['scores'][batting_team] += result.runs
+    this_round.runs   = result.runs
+    this_round.wicket = result.wicket
+    runs_cut_amount = result.runs_cut
+    outcome_message = _outcome_message(result.kind, result.runs, " (Boost applied)")
 
     state['message'] = outcome_message
 
@@ -1623,11 +1446,9 @@ def _recalculate_round_with_boost(room, innings, round_number, clicking_role, bo
     state[f'{clicking_role}_post_boost_used'] = True
 
     # Record that this player clicked boost
-    boost_clicks = state.get(f'round_boost_clicks_{innings}_{round_number}', [])
+    boost_clicks = this_round.boost_clicks
     if clicking_role not in boost_clicks:
         boost_clicks.append(clicking_role)
-    state[f'round_boost_clicks_{innings}_{round_number}'] = boost_clicks
-    snap = state.get(f'round_snapshot_{innings}_{round_number}', {})
 
     batter_role = snap.get("batter_role")
     bowler_role = snap.get("bowler_role")
@@ -1665,177 +1486,18 @@ def _recalculate_round_with_boost(room, innings, round_number, clicking_role, bo
     )
     # Close boost window if nobody can boost anymore
     if not other_can_still_boost:
-        state[f'boost_window_open_{innings}_{round_number}'] = False
+        this_round.boost_window_open = False
 
     # ── Re-check innings/game-over conditions since outcome may have flipped ──
-    current_score   = state['scores'][batting_team]
-    current_wickets = state['wickets'][batting_team]
-    target          = state.get('target')
-    batting_first   = state.get('batting_first', 'player1')
-
     state.pop('innings_transition', None)
     state.pop('game_over_pending', None)
     state.pop('game_over', None)
     state.pop('winner', None)
+    _apply_match_status(state, innings, batting_team, state.get('batting_first', 'player1'), announce=False)
 
-    if innings == 2 and target is not None and current_score >= target:
-        chasing_team = 'player2' if batting_first == 'player1' else 'player1'
-        state['game_over_pending'] = True
-        state['winner'] = chasing_team
-    else:
-        innings_over = (current_wickets >= 10) or (state['round_number'] > 7)
-        if innings_over:
-            if innings == 1:
-                first_score = state['scores'][batting_first]
-                state['innings_transition'] = {
-                    'target':      first_score + 1,
-                    'first_score': first_score,
-                }
-            else:
-                chasing_team    = 'player2' if batting_first == 'player1' else 'player1'
-                defending_team  = batting_first
-                chasing_score   = state['scores'][chasing_team]
-                defending_score = state['scores'][defending_team]
-                target_val      = state.get('target', 0)
-                if chasing_score == defending_score:
-                    state['winner'] = 'Tie'
-                elif chasing_score >= target_val:
-                    state['winner'] = chasing_team
-                else:
-                    state['winner'] = defending_team
-                state['game_over'] = True
-
-    should_save_db = bool(
-        state.get('game_over') or state.get('game_over_pending') or state.get('innings_transition')
-    )
     state['boost_update_counter'] = state.get('boost_update_counter', 0) + 1
-    save_game_state(room.code, state, save_to_db=should_save_db)
     return state
 
-def _apply_abilities(batter_card, bowler_card, round_number, state, batting_team):
-    batting = batter_card.batting
-    bowling = bowler_card.bowling
-    runs    = batter_card.runs
-    log     = []
-
-    scores  = state.get('scores', {})
-    wickets = state.get('wickets', {})
-
-    # ── Determine roles ──────────────────────────────────
-    if batting_team == 'player1':
-        batter_role = 'player1'
-        bowler_role = 'player2'
-    else:
-        batter_role = 'player2'
-        bowler_role = 'player1'
-
-    # ── CHECK: Will spin_basher trigger? ─────────────────
-    spin_basher_will_trigger = (
-        batter_card.ability == 'spin_basher' 
-        and bowler_card.is_spinner
-    )
-
-    # ── BATTING ABILITIES ────────────────────────────────
-    if batter_card.ability == 'opener' and round_number <= 2:
-        batting += 10
-        log.append("⚡ Opener: +10 batting!")
-
-    if batter_card.ability == 'finisher' and round_number >= 6:
-        batting += 10
-        log.append("💥 Finisher: +10 batting!")
-
-    if batter_card.ability == 'mid_over_hitter' and 3 <= round_number <= 5:
-        batting += 10
-        log.append("🏏 Mid Over Hitter: +10 batting!")
-
-    if batter_card.ability == 'spin_basher' and bowler_card.is_spinner:
-        batting += 10
-        log.append("🌀 Spin Basher: +10 batting vs spinner!")
-
-    if batter_card.ability == 'saviour':
-        innings = state.get('innings', 1)
-        wicket_fell = any(
-            state.get(f'wicket_in_round_{innings}_{r}')
-            for r in [round_number - 1, round_number - 2] if r >= 1
-        )
-        if wicket_fell:
-            batting += 10
-            log.append("🛡️ Saviour: +10 batting after recent wicket!")
-
-    # ── BOWLING ABILITIES ────────────────────────────────
-    if bowler_card.ability == 'powerplay_specialist' and round_number <= 2:
-        bowling += 10
-        log.append("🔥 Powerplay Specialist: +10 bowling!")
-
-    if bowler_card.ability == 'death_specialist' and round_number >= 6:
-        bowling += 10
-        log.append("💀 Death Specialist: +10 bowling!")
-
-    if bowler_card.ability == 'mid_over_specialist' and 3 <= round_number <= 5:
-        bowling += 10
-        log.append("🎯 Mid Over Specialist: +10 bowling!")
-
-    if bowler_card.ability == 'golden_arm':
-        innings = state.get('innings', 1)
-        prev_runs = sum(
-            state.get(f'runs_in_round_{innings}_{r}', 0)
-            for r in [round_number - 1, round_number - 2] if r >= 1
-        )
-        if prev_runs >= 30:
-            bowling += 10
-            log.append(f"💛 Golden Arm: +10 bowling ({prev_runs} runs in last 2 rounds)!")
-
-    if bowler_card.ability == 'breakthrough':
-        opponent_score = scores.get(batting_team, 0)
-        if opponent_score >= 60:
-            bowling += 10
-            log.append(f"🚨 Breakthrough: +10 bowling (opponent at {opponent_score} runs)!")
-
-    runs_cutter_active = (
-        bowler_card.ability == 'runs_cutter'
-        and batter_card.ability != 'spin_basher'
-    )
-
-    # ── BOOST EFFECT — BUT NOT if spin_basher will trigger ──
-    if state.get(f'{batter_role}_boost_active'):
-        # Only add boost if spin_basher won't trigger
-        if not spin_basher_will_trigger:
-            batting += 10
-            log.append("🚀 Boost: +10 batting!")
-        # Consume boost after this round (whether used or not)
-        state[f'{batter_role}_boost_active'] = False
-
-    if state.get(f'{bowler_role}_boost_active'):
-        bowling += 10
-        log.append("🚀 Boost: +10 bowling!")
-        state[f'{bowler_role}_boost_active'] = False
-
-    # ── SUPPORT CARD EFFECTS ─────────────────────────────
-    batter_support = state.get(f'{batter_role}_support')
-    if batter_support:
-        s_from  = batter_support.get('from_round', 0)
-        s_until = batter_support.get('until_round', 0)
-        s_type  = batter_support.get('type')
-        if s_from <= round_number <= s_until:
-            if s_type == 'batting_support':
-                batting += 2
-                log.append("🟢 Batting Support: +2 batting!")
-
-    bowler_support = state.get(f'{bowler_role}_support')
-    if bowler_support:
-        s_from  = bowler_support.get('from_round', 0)
-        s_until = bowler_support.get('until_round', 0)
-        s_type  = bowler_support.get('type')
-        if s_from <= round_number <= s_until:
-            if s_type == 'pace_support' and not bowler_card.is_spinner:
-                bowling += 2
-                log.append("⚡ Pace Support: +2 bowling!")
-            elif s_type == 'spin_support' and bowler_card.is_spinner:
-                bowling += 2
-                log.append("🌀 Spin Support: +2 bowling!")
-
-    return batting, bowling, runs, runs_cutter_active, log
-
 # ─── result ──────────────────────────────────────────────────────────────────
 
 def mp_result(request, code):
@@ -1845,15 +1507,20 @@ def mp_result(request, code):
     state = get_game_state(code)
     
     # If Redis empty, load from DB (happens when second player loads result)
-    if not state or 'winner' not in state:
-        state = room.state or {}
+    if 'winner' not in state:
+        state = MatchState.from_json(room.state)
 
     # Save state to DB before deleting Redis
     # This ensures second player can still get data from DB
-    if state and 'winner' in state:
-        room.state = state
+    if 'winner' in state:
+        room.state = state.to_json()
         room.status = 'completed'
-        room.save()
+        room.record_result(state)
+        # Never stats_recorded: the other player's request may have just claimed it.
+        room.save(update_fields=['state', 'status', *GameRoom.RESULT_FIELDS])
+        # Saved synchronously — a queued older copy must not overwrite it later.
+        write_behind.discard(code)
+        stats.finalize_match(room)
     else:
         room.status = 'completed'
         room.save(update_fields=['status'])
@@ -1934,57 +1601,6 @@ def mp_result(request, code):
 
     return render(request, 'mp_result.html', context)
 
-from django.contrib.auth.decorators import login_required
-from django.shortcuts import render, redirect, get_object_or_404
-from django.db import transaction
-from .models import UserDeck, DeckCard, PlayerCard, Team
-
-@login_required
-def exit_match(request, code):
-    if request.method == 'POST':
-        room = get_object_or_404(GameRoom, code=code)
-        state = get_game_state(code)
-        
-        if state.get('game_over') and state.get(f'{my_role}_viewing_result', False):
-            return redirect('mp_result', code=code)
-        
-        my_role = _my_role(request, room)
-        opp_role = _opponent_role(my_role)
-        if 'scores' not in state:
-            state['scores'] = {'player1': 0, 'player2': 0}
-        if 'wickets' not in state:
-            state['wickets'] = {'player1': 0, 'player2': 0}
-
-        state['game_over'] = True
-        state['winner'] = opp_role
-        state['exit_by'] = my_role
-        
-        # ← Save to BOTH (game over)
-        save_game_state(code, state, save_to_db=True)
-        delete_game_state(code)
-
-        # Notify via WebSocket
-        from asgiref.sync import async_to_sync
-        from channels.layers import get_channel_layer
-        channel_layer = get_channel_layer()
-        async_to_sync(channel_layer.group_send)(
-            f"s7app_{code}",
-            {
-                "type": "player_exit",
-                "message": f"{request.user.username} has exited",
-                "exited_by": my_role,
-                "winner": opp_role,
-                "game_over": True,
-            }
-        )
-        return redirect('mp_result', code=code)
-
-    return redirect('mp_game', code=code)
-from django.contrib.auth.decorators import login_required
-from django.shortcuts import render, redirect, get_object_or_404
-from django.db import transaction
-from .models import UserDeck, DeckCard, PlayerCard, Team
-
 
 # ── My Decks page ─────────────────────────────────────────────────────────
 
@@ -2046,10 +1662,6 @@ def create_deck(request):
 
 
 # ── Build / edit deck (add cards, stay under weightage 32) ────────────────
-from django.contrib.auth import logout as auth_logout
-from django.shortcuts import redirect
-from django.db.models import Q
-from .models import UserPrizeCard
 def logout_view(request):
     auth_logout(request)
     return redirect('login')
@@ -2205,12 +1817,13 @@ def swap_card(request, deck_id):
     })
 
 @login_required
-def exit_match(request, code):
+async def exit_match(request, code):
     if request.method != 'POST':
         return redirect('mp_game', code=code)
 
-    room = get_object_or_404(GameRoom, code=code)
-    state = get_game_state(code)
+    await _aresolve_user(request)
+    room = await _aget_room(code)
+    state = await aget_game_state(code)
 
     if state.get('game_over'):
         return redirect('mp_result', code=code)
@@ -2218,37 +1831,38 @@ def exit_match(request, code):
     my_role = _my_role(request, room)
     opp_role = _opponent_role(my_role)
 
-    # Mark game as over
-    state['game_over'] = True
-    state['winner'] = opp_role
-    state['exit_by'] = my_role
-    save_game_state(room.code, state, save_to_db=False) 
+    # Mark game as over — unless the match finished while this request was in flight
+    def exit_game(st):
+        if st.get('game_over'):
+            return False
+        st['game_over'] = True
+        st['winner'] = opp_role
+        st['exit_by'] = my_role
+        return True
+    # Persisted like every other match-ending write: if the cache entry is lost
+    # before mp_result runs, the exit must still be in the row.
+    state, exited = await aupdate_game_state(room.code, exit_game, state=state, save_to_db=True)
+    if not exited:
+        return redirect('mp_result', code=code)
 
     # Notify the OTHER player via WebSocket
-    from asgiref.sync import async_to_sync
-    from channels.layers import get_channel_layer
-    
-    channel_layer = get_channel_layer()
-    room_group = f"s7app_{code}"
-    
-    async_to_sync(channel_layer.group_send)(
-        room_group,
-        {
-            "type": "player_exit",
-            "message": f"{request.user.username} has exited the match.\nYou win by default! 🎉",
-            "exited_by": my_role,
-            "winner": opp_role,
-            "game_over": True,
-        }
-    )
+    await _agroup_send(code, {
+        "type": "player_exit",
+        "message": f"{request.user.username} has exited the match.\nYou win by default! 🎉",
+        "exited_by": my_role,
+        "winner": opp_role,
+        "game_over": True,
+    }, 'Exit')
 
     # Redirect the player who exited
     return redirect('mp_result', code=code)
 @login_required
 def watch_matches(request):
     """View live and completed matches"""
-    live_matches = GameRoom.objects.filter(status='live')
-    completed_matches = GameRoom.objects.filter(status='completed').order_by('-created_at')
+    # The list shows names, codes and dates only — leave the state JSON in the database.
+    rooms = GameRoom.objects.select_related('player1', 'player2').defer('state')
+    live_matches = rooms.filter(status='live')
+    completed_matches = rooms.filter(status='completed').order_by('-created_at')
     
     context = {
         'live_matches': live_matches,
@@ -2260,6 +1874,8 @@ def watch_match_detail(request, code):
     """Watch live match or view completed match"""
     room = get_object_or_404(GameRoom, code=code)
     state = get_game_state(code)
+    # One catalog read for the whole timeline, not a version check per card.
+    catalog = get_catalog()
     
     # Build match info
     current_innings = state.get('innings', 1)
@@ -2276,27 +1892,25 @@ def watch_match_detail(request, code):
     
     # Build INNINGS 1 rounds (all 7 or until over)
     innings1_rounds = []
-    for r in range(1, 8):
-        batter_key = f'{batting_first}_played_round_1_{r}'
-        bowler_key = f'{"player2" if batting_first == "player1" else "player1"}_played_round_1_{r}'
-        
-        batter_card_id = state.get(batter_key)
-        bowler_card_id = state.get(bowler_key)
+    bowling_first = 'player2' if batting_first == 'player1' else 'player1'
+    for r, rec in enumerate(state.innings_rounds(1), start=1):
+        batter_card_id = rec.played(batting_first)
+        bowler_card_id = rec.played(bowling_first)
         
         if batter_card_id and bowler_card_id:
             try:
-                batter_card = PlayerCard.objects.get(id=batter_card_id)
-                bowler_card = PlayerCard.objects.get(id=bowler_card_id)
+                batter_card = get_card(batter_card_id, catalog=catalog)
+                bowler_card = get_card(bowler_card_id, catalog=catalog)
                 
-                runs = state.get(f'runs_in_round_1_{r}', 0)
-                wicket = state.get(f'wicket_in_round_1_{r}', False)
+                runs = rec.runs
+                wicket = rec.wicket
                 
                 innings1_rounds.append({
                     'round': r,
                     'batter': batter_card.name,
-                    'batter_image': batter_card.image.url if batter_card.image else None,
+                    'batter_image': batter_card.image_url,
                     'bowler': bowler_card.name,
-                    'bowler_image': bowler_card.image.url if bowler_card.image else None,
+                    'bowler_image': bowler_card.image_url,
                     'runs': runs,
                     'wicket': wicket,
                 })
@@ -2309,27 +1923,24 @@ def watch_match_detail(request, code):
         batting_team_2 = 'player2' if batting_first == 'player1' else 'player1'
         bowling_team_2 = batting_first
         
-        for r in range(1, 8):
-            batter_key = f'{batting_team_2}_played_round_2_{r}'
-            bowler_key = f'{bowling_team_2}_played_round_2_{r}'
-            
-            batter_card_id = state.get(batter_key)
-            bowler_card_id = state.get(bowler_key)
+        for r, rec in enumerate(state.innings_rounds(2), start=1):
+            batter_card_id = rec.played(batting_team_2)
+            bowler_card_id = rec.played(bowling_team_2)
             
             if batter_card_id and bowler_card_id:
                 try:
-                    batter_card = PlayerCard.objects.get(id=batter_card_id)
-                    bowler_card = PlayerCard.objects.get(id=bowler_card_id)
+                    batter_card = get_card(batter_card_id, catalog=catalog)
+                    bowler_card = get_card(bowler_card_id, catalog=catalog)
                     
-                    runs = state.get(f'runs_in_round_2_{r}', 0)
-                    wicket = state.get(f'wicket_in_round_2_{r}', False)
+                    runs = rec.runs
+                    wicket = rec.wicket
                     
                     innings2_rounds.append({
                         'round': r,
                         'batter': batter_card.name,
-                        'batter_image': batter_card.image.url if batter_card.image else None,
+                        'batter_image': batter_card.image_url,
                         'bowler': bowler_card.name,
-                        'bowler_image': bowler_card.image.url if bowler_card.image else None,
+                        'bowler_image': bowler_card.image_url,
                         'runs': runs,
                         'wicket': wicket,
                     })
@@ -2367,98 +1978,34 @@ def watch_match_detail(request, code):
     }
     return render(request, 'watch_match_detail.html', context)
 
-from django.shortcuts import render, redirect, get_object_or_404
-from django.contrib.auth.decorators import login_required
-from django.db.models import Q
-from . import models   # or specific imports
 @login_required
 def profile(request):
     user = request.user
-    
-    # All completed matches this user played
-    completed_matches = GameRoom.objects.filter(
-        status='completed'
-    ).filter(
-        Q(player1=user) | Q(player2=user)   # ← CORRECTED
-    ).order_by('-created_at')
-    
-    total_matches = completed_matches.count()
-    wins = 0
-    losses = 0
-    draws = 0
-    
-    # Deck usage tracking
-    deck_usage = {}  # {team_name: count}
-    
-    for match in completed_matches:
-        state = match.state or {}
-        winner = state.get('winner')
-        exit_by = state.get('exit_by')
-        
-        # Determine my role
-        my_role = 'player1' if match.player1 == user else 'player2'
-        
-        # Count wins/losses
-        if winner == 'Tie':
-            draws += 1
-        elif winner == my_role:
-            wins += 1
-        elif winner:
-            losses += 1
-        
-        # Count deck usage
-        my_deck = match.player1_deck if my_role == 'player1' else match.player2_deck
-        if my_deck and my_deck.team:
-            team_name = my_deck.team.name
-            deck_usage[team_name] = deck_usage.get(team_name, 0) + 1
-    
+
+    # Rolled up by stats.finalize_match as matches finish — one row, one query.
+    row = PlayerStats.objects.filter(user=user).first() or PlayerStats(user=user)
+
+    total_matches = row.matches
+    wins = row.wins
+    losses = row.losses
+    draws = row.draws
+
     # Win percentage
     win_percentage = round((wins / total_matches * 100), 1) if total_matches > 0 else 0
-    
+
     # Deck usage percentages
     deck_stats = []
-    for team_name, count in sorted(deck_usage.items(), key=lambda x: x[1], reverse=True):
+    for team_name, count in sorted(row.deck_usage.items(), key=lambda x: x[1], reverse=True):
         percentage = round((count / total_matches * 100), 1) if total_matches > 0 else 0
         deck_stats.append({
             'team': team_name,
             'count': count,
             'percentage': percentage,
         })
-    
+
     # Recent 5 matches
-    recent_matches = []
-    for match in completed_matches[:5]:
-        state = match.state or {}
-        winner = state.get('winner')
-        exit_by = state.get('exit_by')
-        my_role = 'player1' if match.player1 == user else 'player2'
-        opp_role = 'player2' if my_role == 'player1' else 'player1'
-        opponent = match.player2 if my_role == 'player1' else match.player1
-        
-        if winner == 'Tie':
-            result = 'Draw'
-            result_class = 'draw'
-        elif winner == my_role:
-            result = 'Win'
-            result_class = 'win'
-        else:
-            result = 'Loss'
-            result_class = 'loss'
-        
-        my_deck = match.player1_deck if my_role == 'player1' else match.player2_deck
-        
-        recent_matches.append({
-            'code': match.code,
-            'opponent': opponent.username if opponent else 'Unknown',
-            'result': result,
-            'result_class': result_class,
-            'my_score': state['scores'].get(my_role, 0) if state.get('scores') else 0,
-            'opp_score': state['scores'].get(opp_role, 0) if state.get('scores') else 0,
-            'deck_team': my_deck.team.name if my_deck and my_deck.team else 'Unknown',
-            'date': match.created_at,
-            'exited': exit_by == my_role,
-        })
-    
+    recent_matches = [dict(match, date=parse_datetime(match['date'])) for match in row.recent]
+
     context = {
         'user': user,
         'total_matches': total_matches,
@@ -2472,38 +2019,24 @@ def profile(request):
     return render(request, 'profile.html', context)
 
 
-from django.contrib.auth.models import User
-from django.db.models import Count, Q
-from django.shortcuts import render
 
-from .models import GameRoom
 
 
 def leaderboard(request):
-    leaderboard = []
-
-    for user in User.objects.all():
-        wins = (
-            GameRoom.objects.filter(status="completed")
-            .filter(
-                Q(player1=user, state__winner="player1") |
-                Q(player2=user, state__winner="player2")
-            )
-            .count()
-        )
-
-        leaderboard.append({
-            "user": user,
-            "wins": wins,
-        })
+    # Totals are kept in PlayerStats as matches finish — one paginated, indexed read.
+    page = stats.leaderboard_page(request.GET.get("page"))
 
-    leaderboard.sort(key=lambda x: x["wins"], reverse=True)
+    leaderboard = [
+        {"user": row.user, "wins": row.wins, "position": position}
+        for position, row in enumerate(page, start=page.start_index())
+    ]
 
-    for i, row in enumerate(leaderboard, start=1):
-        row["position"] = i
+    my_rank = stats.rank_of(request.user) if request.user.is_authenticated else None
 
     return render(request, "leaderboard.html", {
-        "leaderboard": leaderboard
+        "leaderboard": leaderboard,
+        "page": page,
+        "my_rank": my_rank,
     })
 def landing(request):
     return render(request, 'landing.html')
\ No newline at end of file
@@ -0,0 +1,144 @@
+"""
+Write-behind persistence for GameRoom.state.
+
+The cache is the live copy of a match; GameRoom.state is only the durable
+fallback. Instead of saving the row inside the request on every innings
+transition / game over / boost recalculation, game_cache queues the committed
+state here and a background thread writes it out:
+
+  - states are coalesced per room (only the newest revision is kept),
+  - pending rooms are flushed with one bulk_update per batch,
+  - nothing waits longer than STATE_FLUSH_INTERVAL seconds,
+  - a full batch wakes the flusher early,
+  - whatever is left is flushed at interpreter exit,
+  - a room stays in pending() until its row is actually written, so a DB
+    fallback read never sees an older state than the queue holds.
+
+The queue is per process. A worker that is killed (SIGKILL, OOM, crash)
+rather than shut down loses whatever it had not flushed: at most
+STATE_FLUSH_INTERVAL seconds of saves, which the cache still holds for
+GAME_TTL. Set STATE_FLUSH_INTERVAL=0 to save inline instead.
+
+    enqueue(code, state)   # after a successful cache write
+    is_inline()            # enqueue writes synchronously (interval <= 0)
+    pending(code)          # newest queued state, or None
+    discard(code)          # someone just wrote the row synchronously
+    flush()                # write everything now (shutdown, tests, commands)
+"""
+import atexit
+import logging
+import threading
+
+from django.conf import settings
+from django.db import close_old_connections
+
+from .match_state import dumps, loads
+
+logger = logging.getLogger(__name__)
+
+
+def _interval():
+    return getattr(settings, 'STATE_FLUSH_INTERVAL', 1.0)
+
+
+def _batch_size():
+    return getattr(settings, 'STATE_FLUSH_BATCH', 100)
+
+
+_lock = threading.Lock()
+_wake = threading.Event()
+_dirty = {}            # room code -> (revision, msgpack payload)
+_thread = None
+
+
+def is_inline():
+    """True when STATE_FLUSH_INTERVAL <= 0, i.e. enqueue() writes the row itself."""
+    return _interval() <= 0
+
+
+def enqueue(room_code, state):
+    """Queue `state` for saving. Older revisions never replace newer ones."""
+    if is_inline():
+        # Write-behind disabled — save inline like before.
+        _write({room_code: (state.revision, dumps(state))})
+        return
+
+    with _lock:
+        queued = _dirty.get(room_code)
+        if queued is None or state.revision >= queued[0]:
+            # Snapshot now: the caller keeps using (and mutating) its state.
+            _dirty[room_code] = (state.revision, dumps(state))
+        backlog = len(_dirty)
+    _ensure_thread()
+    if backlog >= _batch_size():
+        _wake.set()
+
+
+def pending(room_code):
+    """The newest state queued for `room_code` that is not in the DB yet."""
+    with _lock:
+        queued = _dirty.get(room_code)
+    return loads(queued[1]) if queued else None
+
+
+def discard(room_code):
+    """Drop a queued state, e.g. because the caller just saved the row itself."""
+    with _lock:
+        _dirty.pop(room_code, None)
+
+
+def flush():
+    """Write every pending state now. Returns how many rooms were saved."""
+    with _lock:
+        batch = dict(_dirty)
+    if not batch or not _write(batch):
+        return 0
+    with _lock:
+        for code, queued in batch.items():
+            # Only what was written: a newer revision queued meanwhile stays.
+            if _dirty.get(code) is queued:
+                del _dirty[code]
+    return len(batch)
+
+
+def _write(batch):
+    """bulk_update every room in `batch`. False if it failed (the caller keeps them queued)."""
+    from .models import GameRoom
+
+    codes = list(batch)
+    size = _batch_size()
+    try:
+        for i in range(0, len(codes), size):
+            chunk = codes[i:i + size]
+            rooms = list(GameRoom.objects.filter(code__in=chunk).only('id', 'code'))
+            for room in rooms:
+                room.state = loads(batch[room.code][1]).to_json()
+            GameRoom.objects.bulk_update(rooms, ['state'], batch_size=size)
+    except Exception as e:
+        logger.warning(f'Write-behind flush failed ({len(batch)} rooms): {e}')
+        return False
+    return True
+
+
+def _run():
+    while True:
+        _wake.wait(_interval())
+        _wake.clear()
+        try:
+            flush()
+        finally:
+            # Long-lived thread — don't hold on to a dead/stale connection.
+            close_old_connections()
+
+
+def _ensure_thread():
+    global _thread
+    if _thread is not None and _thread.is_alive():
+        return
+    with _lock:
+        if _thread is None or not _thread.is_alive():
+            _thread = threading.Thread(target=_run, name='s7-write-behind', daemon=True)
+            _thread.start()
+
+
+atexit.register(flush)